@@ -26,9 +26,13 @@ another inference.  The model supplies content; this script supplies form.
 
 import argparse
 import base64
+import concurrent.futures
+import hashlib
+import io
 import json
 import os
 import re
+import shutil
 import sys
 
 from datetime import datetime
@@ -352,8 +356,27 @@ FLATTEN_EXTENSIONS = (".srt", ".vtt")
 SUPPORTED_EXTENSIONS = sorted(list(NATIVE_MIME_TYPES) + list(FLATTEN_EXTENSIONS))
 
 
-def flatten_subtitles(filename):
-    """Flatten an .srt/.vtt subtitle file into "[HH:MM:SS] text" lines.
+# The flattened text of each subtitle file is cached in --cache-dir, keyed by
+# the SHA-256 of the file's content, so re-running on the same inputs skips
+# the flattening.  (Other files are just base64-encoded, which is no slower
+# than reading a cached copy would be, so they are not cached.)  Bump this
+# whenever the flattening changes, so that old cache entries are not used.
+PREPROCESS_VERSION = 1
+
+# Files are read (and hashed) this many bytes at a time.
+READ_CHUNK_BYTES = 256 * 1024
+
+
+def hash_file(filename):
+    h = hashlib.sha256()
+    with open(filename, "rb") as fp:
+        for chunk in iter(lambda: fp.read(READ_CHUNK_BYTES), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def iter_subtitle_lines(fp):
+    """Yield the cues of an .srt/.vtt subtitle file as "[HH:MM:SS] text" lines.
 
     The cue numbers and the "-->" end times are noise for the model, but the
     start timestamps are load-bearing: the prompt uses them to work out the
@@ -362,38 +385,85 @@ def flatten_subtitles(filename):
 
     time_re = re.compile(r"^(?:(\d{2}):)?(\d{2}):(\d{2})[,.]\d+\s*-->")
 
-    out = []
     timestamp = None
     text = []
 
-    def flush():
-        if text:
-            out.append("[%s] %s" % (timestamp or "??:??:??", " ".join(text)))
-        del text[:]
+    for line in fp:
+        line = line.strip()
+        match = time_re.match(line)
+        if match:
+            if text:
+                yield "[%s] %s" % (timestamp or "??:??:??", " ".join(text))
+                text = []
+            timestamp = "%s:%s:%s" % (match.group(1) or "00",
+                                      match.group(2), match.group(3))
+        elif not line:
+            if text:
+                yield "[%s] %s" % (timestamp or "??:??:??", " ".join(text))
+                text = []
+        elif line.isdigit() and not text:
+            # Subtitle cue number; skip it.
+            pass
+        elif line.startswith("WEBVTT") or line.startswith("NOTE "):
+            pass
+        else:
+            text.append(line)
+
+    if text:
+        yield "[%s] %s" % (timestamp or "??:??:??", " ".join(text))
+
+
+def write_flattened_subtitles(filename, out):
+    """Flatten a subtitle file into the text file object "out", one cue at a
+    time."""
 
     with open(filename, "r", encoding="utf-8-sig", errors="replace") as fp:
-        for line in fp:
-            line = line.strip()
-            match = time_re.match(line)
-            if match:
-                flush()
-                timestamp = "%s:%s:%s" % (match.group(1) or "00",
-                                          match.group(2), match.group(3))
-            elif not line:
-                flush()
-            elif line.isdigit() and not text:
-                # Subtitle cue number; skip it.
-                pass
-            elif line.startswith("WEBVTT") or line.startswith("NOTE "):
-                pass
-            else:
-                text.append(line)
-    flush()
+        first = True
+        for line in iter_subtitle_lines(fp):
+            if not first:
+                out.write("\n")
+            out.write(line)
+            first = False
 
-    return "\n".join(out)
 
+def flatten_subtitles(filename):
+    """Flatten an .srt/.vtt subtitle file into "[HH:MM:SS] text" lines."""
+
+    out = io.StringIO()
+    write_flattened_subtitles(filename, out)
+    return out.getvalue()
+
+
+def preprocess_document(filename, writer, cache_dir, log):
+    """Return the preprocessed form of a document, as written by writer().
+
+    If cache_dir is set, the result is cached there by the document's content
+    hash (and read back from there on later runs).
+    """
+
+    if not cache_dir:
+        out = io.StringIO()
+        writer(filename, out)
+        return out.getvalue()
+
+    key = "%s-%s-v%d" % (hash_file(filename), writer.__name__,
+                         PREPROCESS_VERSION)
+    path = os.path.join(cache_dir, key)
+
+    if os.path.exists(path):
+        log("Using cached preprocessed form of %s" % filename)
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as out:
+            writer(filename, out)
+        os.replace(tmp, path)
 
-def load_document(label, filename, log):
+    with open(path, "r", encoding="utf-8") as fp:
+        return fp.read()
+
+
+def load_document(label, filename, log, cache_dir=None):
     """Load one source document into a content part for the Responses API.
 
     Returns a dict shaped for the API: either an "input_file" part carrying
@@ -407,7 +477,8 @@ def load_document(label, filename, log):
     size = os.path.getsize(filename)
 
     if ext in FLATTEN_EXTENSIONS:
-        text = flatten_subtitles(filename).strip()
+        text = preprocess_document(filename, write_flattened_subtitles,
+                                   cache_dir, log).strip()
         if not text:
             raise ValueError('No text could be extracted from "%s"' % filename)
         log("Read %s (%s, flattened to %d characters of text)"
@@ -582,6 +653,59 @@ def numeric_columns(table):
 
     return out
 
+
+# Bump this whenever a renderer's output changes, so that documents cached
+# by an older version are not used.
+RENDER_VERSION = 1
+
+
+def compile_layout(minutes, pretty_date):
+    """Compile the minutes into the layout that both renderers draw.
+
+    The layout is a list of (kind, value) elements, in document order:
+
+      ("title", [line, ...])
+      ("logistics" / "attendance" / "absent", text)
+      ("heading" / "paragraph" / "subheading", text)
+      ("bullets", [{"text": ..., "subbullets": [...]}, ...])
+      ("table", {"columns": [...], "rows": [[...], ...], "right": [...]})
+
+    Everything the .docx and the .pdf have in common -- the wording of the
+    fixed lines, the attendance placeholders, which table columns are
+    right-aligned -- is decided here, once.  The layout is plain JSON-able
+    data, so it can be hashed (see render_documents()) and handed to another
+    process.
+    """
+
+    layout = [
+        ("title", [DOC_TITLE, pretty_date]),
+        ("logistics", "Logistics: Start Time: %s | Adjournment Time: %s"
+                      % (minutes["start_time"], minutes["adjournment_time"])),
+        ("attendance", "Attendance:  %s"
+                       % format_names(minutes["attendees"], "[ATTENDEES]")),
+        ("absent", "Absent:  %s"
+                   % format_names(minutes["absentees"], "[ABSENTEES]")),
+    ]
+
+    for section in minutes["sections"]:
+        layout.append(("heading", section["heading"]))
+
+        for block in section["blocks"]:
+            kind = block["type"]
+            if kind in ("paragraph", "subheading"):
+                layout.append((kind, block["text"]))
+            elif kind == "bullets":
+                layout.append((kind, block["bullets"]))
+            elif kind == "table" and block["table"]:
+                table = block["table"]
+                layout.append((kind, {
+                    "columns": table["columns"],
+                    "rows": table["rows"],
+                    "right": sorted(numeric_columns(table)),
+                }))
+
+    return layout
+
 #############################################################################
 #
 # .docx rendering
@@ -625,7 +749,7 @@ def _docx_bullets(document, bullets):
 def _docx_table(document, table):
     columns = table["columns"]
     rows = table["rows"]
-    right = numeric_columns(table)
+    right = set(table["right"])
 
     doc_table = document.add_table(rows=1, cols=len(columns))
     doc_table.style = "Table Grid"
@@ -659,7 +783,7 @@ def _docx_table(document, table):
     document.add_paragraph()
 
 
-def render_docx(minutes, pretty_date, filename):
+def render_docx(layout, filename):
     document = docx.Document()
 
     for section in document.sections:
@@ -672,39 +796,29 @@ def render_docx(minutes, pretty_date, filename):
     normal.font.name = DOCX_FONT
     normal.font.size = Pt(10.5)
 
-    # Title block
-    _docx_para(document, DOC_TITLE, size=13, bold=True,
-               align=WD_ALIGN_PARAGRAPH.CENTER, space_after=0)
-    _docx_para(document, pretty_date, size=13, bold=True,
-               align=WD_ALIGN_PARAGRAPH.CENTER, space_after=18)
-
-    # Logistics and attendance
-    _docx_para(document, "Logistics: Start Time: %s | Adjournment Time: %s"
-               % (minutes["start_time"], minutes["adjournment_time"]),
-               space_after=12)
-    _docx_para(document, "Attendance:  %s"
-               % format_names(minutes["attendees"], "[ATTENDEES]"),
-               space_after=6)
-    _docx_para(document, "Absent:  %s"
-               % format_names(minutes["absentees"], "[ABSENTEES]"),
-               space_after=12)
-
-    for section in minutes["sections"]:
-        heading = _docx_para(document, section["heading"], size=17,
-                             space_after=6)
-        heading.paragraph_format.space_before = Pt(14)
-        heading.runs[0].font.color.rgb = RGBColor(0, 0, 0)
-
-        for block in section["blocks"]:
-            kind = block["type"]
-            if kind == "paragraph":
-                _docx_para(document, block["text"])
-            elif kind == "subheading":
-                _docx_para(document, block["text"], size=12.5, space_after=4)
-            elif kind == "bullets":
-                _docx_bullets(document, block["bullets"])
-            elif kind == "table" and block["table"]:
-                _docx_table(document, block["table"])
+    for kind, value in layout:
+        if kind == "title":
+            for index, line in enumerate(value):
+                last = index == len(value) - 1
+                _docx_para(document, line, size=13, bold=True,
+                           align=WD_ALIGN_PARAGRAPH.CENTER,
+                           space_after=18 if last else 0)
+        elif kind in ("logistics", "absent"):
+            _docx_para(document, value, space_after=12)
+        elif kind == "attendance":
+            _docx_para(document, value, space_after=6)
+        elif kind == "heading":
+            heading = _docx_para(document, value, size=17, space_after=6)
+            heading.paragraph_format.space_before = Pt(14)
+            heading.runs[0].font.color.rgb = RGBColor(0, 0, 0)
+        elif kind == "paragraph":
+            _docx_para(document, value)
+        elif kind == "subheading":
+            _docx_para(document, value, size=12.5, space_after=4)
+        elif kind == "bullets":
+            _docx_bullets(document, value)
+        elif kind == "table":
+            _docx_table(document, value)
 
     document.save(filename)
 
@@ -781,7 +895,7 @@ def _pdf_bullets(bullets):
 def _pdf_table(table, width):
     columns = table["columns"]
     rows = table["rows"]
-    right = numeric_columns(table)
+    right = set(table["right"])
 
     data = [[Paragraph(_pdf_escape(name),
                        PDF_STYLES["cell-head-right" if index in right
@@ -816,54 +930,100 @@ def _pdf_table(table, width):
     return pdf_table
 
 
-def render_pdf(minutes, pretty_date, filename):
+def render_pdf(layout, filename):
+    title = dict(layout)["title"]
+
     document = SimpleDocTemplate(
         filename, pagesize=letter,
         leftMargin=inch, rightMargin=inch,
         topMargin=inch, bottomMargin=inch,
-        title="%s - %s" % (DOC_TITLE, pretty_date))
+        title=" - ".join(title))
 
     width = document.width
 
-    story = [
-        Paragraph(_pdf_escape(DOC_TITLE), PDF_STYLES["title"]),
-        Paragraph(_pdf_escape(pretty_date), PDF_STYLES["title"]),
-        Spacer(1, 24),
-        Paragraph(_pdf_escape("Logistics: Start Time: %s | Adjournment Time: %s"
-                              % (minutes["start_time"],
-                                 minutes["adjournment_time"])),
-                  PDF_STYLES["body"]),
-        Spacer(1, 6),
-        Paragraph(_pdf_escape("Attendance:  %s"
-                              % format_names(minutes["attendees"],
-                                             "[ATTENDEES]")),
-                  PDF_STYLES["body"]),
-        Paragraph(_pdf_escape("Absent:  %s"
-                              % format_names(minutes["absentees"],
-                                             "[ABSENTEES]")),
-                  PDF_STYLES["body"]),
-    ]
+    story = []
+
+    for kind, value in layout:
+        if kind == "title":
+            story.extend(Paragraph(_pdf_escape(line), PDF_STYLES["title"])
+                         for line in value)
+            story.append(Spacer(1, 24))
+        elif kind == "logistics":
+            story.append(Paragraph(_pdf_escape(value), PDF_STYLES["body"]))
+            story.append(Spacer(1, 6))
+        elif kind in ("attendance", "absent", "paragraph"):
+            story.append(Paragraph(_pdf_escape(value), PDF_STYLES["body"]))
+        elif kind in ("heading", "subheading"):
+            story.append(Paragraph(_pdf_escape(value), PDF_STYLES[kind]))
+        elif kind == "bullets":
+            story.extend(_pdf_bullets(value))
+            story.append(Spacer(1, 4))
+        elif kind == "table":
+            story.append(_pdf_table(value, width))
+            story.append(Spacer(1, 10))
 
-    for section in minutes["sections"]:
-        story.append(Paragraph(_pdf_escape(section["heading"]),
-                               PDF_STYLES["heading"]))
+    document.build(story)
 
-        for block in section["blocks"]:
-            kind = block["type"]
-            if kind == "paragraph":
-                story.append(Paragraph(_pdf_escape(block["text"]),
-                                       PDF_STYLES["body"]))
-            elif kind == "subheading":
-                story.append(Paragraph(_pdf_escape(block["text"]),
-                                       PDF_STYLES["subheading"]))
-            elif kind == "bullets":
-                story.extend(_pdf_bullets(block["bullets"]))
-                story.append(Spacer(1, 4))
-            elif kind == "table" and block["table"]:
-                story.append(_pdf_table(block["table"], width))
-                story.append(Spacer(1, 10))
+#############################################################################
+#
+# Rendering both documents
+#
+#############################################################################
+
+RENDERERS = {
+    ".docx": render_docx,
+    ".pdf": render_pdf,
+}
 
-    document.build(story)
+
+def render_documents(layout, filenames, cache_dir, log):
+    """Render the layout to each of filenames (.docx and/or .pdf).
+
+    The documents are rendered in parallel, in separate processes.  If
+    cache_dir is set, the rendered documents are cached there by the hash of
+    the layout, so re-rendering minutes that have not changed (e.g., going
+    back to an earlier version of an edited --from-json file) just copies the
+    cached documents.
+    """
+
+    key = None
+    if cache_dir:
+        text = json.dumps([RENDER_VERSION, layout], sort_keys=True)
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    todo = []
+    for filename in filenames:
+        ext = os.path.splitext(filename)[1].lower()
+        if not key:
+            todo.append((filename, ext, filename))
+            continue
+
+        cached = os.path.join(cache_dir, "render-%s%s" % (key, ext))
+        if os.path.exists(cached):
+            shutil.copyfile(cached, filename)
+            log("Wrote %s (unchanged; copied from cache)" % filename)
+        else:
+            todo.append((filename, ext, cached))
+
+    if not todo:
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=len(todo)) as executor:
+        futures = []
+        for filename, ext, target in todo:
+            # Render to a temporary file, so that an interrupted render never
+            # leaves a partial document in the cache.
+            tmp = "%s.tmp%s" % (target, ext)
+            futures.append((filename, target, tmp,
+                            executor.submit(RENDERERS[ext], layout, tmp)))
+
+        for filename, target, tmp, future in futures:
+            future.result()
+            os.replace(tmp, target)
+            if target != filename:
+                shutil.copyfile(target, filename)
+            log("Wrote %s" % filename)
 
 #############################################################################
 #
@@ -933,6 +1093,13 @@ def setup_cli():
                         help="Read the inputs and assemble the prompt, but do "
                              "not call OpenAI or write any output documents")
 
+    parser.add_argument("--cache-dir", default=".fac-meeting-notes-cache",
+                        help="Directory to cache flattened subtitle "
+                             "files and rendered output documents in "
+                             "(default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or write the cache")
+
     parser.add_argument("--quiet", action="store_true",
                         help="Suppress progress messages")
 
@@ -951,6 +1118,8 @@ def main():
         if not args.quiet:
             print(message)
 
+    cache_dir = None if args.no_cache else args.cache_dir
+
     if args.from_json:
         with open(args.from_json, "r") as fp:
             minutes = json.load(fp)
@@ -964,7 +1133,8 @@ def main():
             ("TECHNOLOGY UPDATE DOCUMENT", args.technology_update),
         ]
 
-        documents = [(label, filename, load_document(label, filename, log))
+        documents = [(label, filename,
+                      load_document(label, filename, log, cache_dir))
                      for label, filename in specs]
 
         attached = sum(os.path.getsize(filename)
@@ -1011,11 +1181,8 @@ def main():
     docx_filename = os.path.join(args.outdir, basename + ".docx")
     pdf_filename = os.path.join(args.outdir, basename + ".pdf")
 
-    render_docx(minutes, pretty_date, docx_filename)
-    log("Wrote %s" % docx_filename)
-
-    render_pdf(minutes, pretty_date, pdf_filename)
-    log("Wrote %s" % pdf_filename)
+    layout = compile_layout(minutes, pretty_date)
+    render_documents(layout, [docx_filename, pdf_filename], cache_dir, log)
 
 
 if __name__ == "__main__":
@@ -4,9 +4,13 @@ import os
 import sys
 import re
 import json
-import io
 import time
 import uuid
+import hashlib
+import sqlite3
+import queue
+import tempfile
+import concurrent.futures
 import unicodedata
 from datetime import datetime, timezone
 from dotenv import load_dotenv
@@ -57,7 +61,12 @@ DISCOVERY_CACHE_VERSION = 2
 DRIVE_FILE_FIELDS = "id, name, mimeType, webViewLink, parents, modifiedTime, driveId, trashed"
 BATCH_STATE_VERSION = 1
 BATCH_STATE_FILENAME = "openai-analysis-batches.json"
+ANALYSIS_STORE_VERSION = 1
+ANALYSIS_STORE_FILENAME = "analysis-store.sqlite3"
+MARKDOWN_RENDER_VERSION = 1
+FOLDER_ID_RE = re.compile(r'folders/([a-zA-Z0-9_-]+)')
 BATCH_INPUT_DIRNAME = "batch-inputs"
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
 BATCH_ENDPOINT = "/v1/responses"
 BATCH_COMPLETION_WINDOW = "24h"
 BATCH_SKIP_FILE_STATUSES = {
@@ -266,6 +275,10 @@ def setup_cli_args():
                                  default='old',
                                  metavar='NAMES',
                                  help='Comma-delimited case-insensitive Google Drive folder names to skip (default: old)')
+    tools.argparser.add_argument('--drive-workers',
+                                 type=int,
+                                 default=8,
+                                 help='Number of Google Drive folders to list concurrently during discovery (default: 8)')
     tools.argparser.add_argument('--skip-discovery', action='store_true', help='Skip GDrive discovery and load from cache instead')
     tools.argparser.add_argument('--skip-analysis', action='store_true', help='Perform discovery and save to cache, but skip analysis')
     analysis_mode = tools.argparser.add_mutually_exclusive_group()
@@ -280,13 +293,17 @@ def setup_cli_args():
                                  type=int,
                                  default=500,
                                  help='Maximum number of PDF files to submit in one OpenAI analysis batch')
+    tools.argparser.add_argument('--submit-workers',
+                                 type=int,
+                                 default=8,
+                                 help='Number of PDF files to download and upload to OpenAI concurrently when submitting a batch (default: 8)')
     tools.argparser.add_argument('--retry-analysis-error-codes',
                                  metavar='CODES',
                                  help='Comma-delimited OpenAI error codes/reasons to retry, e.g. context_length_exceeded')
     tools.argparser.add_argument('--allow-concurrent-analysis-batches',
                                  action='store_true',
                                  help='Allow submitting a new OpenAI analysis batch while previous batches are uncollected')
-    tools.argparser.add_argument('--state-dir', default='analysis-results', help='Directory to store/load individual analysis results')
+    tools.argparser.add_argument('--state-dir', default='analysis-results', help='Directory to store/load analysis results and OpenAI batch state')
     tools.argparser.add_argument('--model', default='gpt-5.4-mini', help='OpenAI model to use for analysis')
     tools.argparser.add_argument('--pdf-detail',
                                  choices=['low', 'high'],
@@ -324,6 +341,10 @@ def setup_cli_args():
         tools.argparser.error("--skip-analysis cannot be combined with batch analysis modes")
     if args.analysis_batch_size <= 0:
         tools.argparser.error("--analysis-batch-size must be greater than 0")
+    if args.drive_workers <= 0:
+        tools.argparser.error("--drive-workers must be greater than 0")
+    if args.submit_workers <= 0:
+        tools.argparser.error("--submit-workers must be greater than 0")
 
     # --debug also implies --verbose
     if args.debug:
@@ -343,7 +364,7 @@ def parse_comma_delimited_values(text):
     }
 
 def extract_folder_id(url):
-    match = re.search(r'folders/([a-zA-Z0-9_-]+)', url)
+    match = FOLDER_ID_RE.search(url)
     if match:
         return match.group(1)
     match = re.search(r'id=([a-zA-Z0-9_-]+)', url)
@@ -436,97 +457,172 @@ def create_google_drive_cache(root_id, root_url=None):
         'updated_at_utc': utc_timestamp(),
         'folders': {},
         'pdfs': {},
+        'children': {},
     }
 
+# The cache keeps a parent ID -> set of child IDs (folders and PDFs)
+# index so that walking a subtree only touches the items in that
+# subtree.  The index is derived from the items' "parents", so it is
+# not saved; it is rebuilt when the cache is loaded.
+def index_google_drive_cache(cache):
+    children = {}
+    for items in (cache['folders'], cache['pdfs']):
+        for item_id, item in items.items():
+            for parent in item.get('parents', []):
+                children.setdefault(parent, set()).add(item_id)
+    cache['children'] = children
+
+def link_cached_item(cache, item):
+    for parent in item.get('parents', []):
+        cache['children'].setdefault(parent, set()).add(item['id'])
+
+def unlink_cached_item(cache, item):
+    for parent in item.get('parents', []):
+        siblings = cache['children'].get(parent)
+        if siblings is None:
+            continue
+        siblings.discard(item['id'])
+        if not siblings:
+            del cache['children'][parent]
+
+def remove_cached_item(cache, item_id):
+    for items in (cache['folders'], cache['pdfs']):
+        item = items.pop(item_id, None)
+        if item:
+            unlink_cached_item(cache, item)
+
 def cache_contains_parent(cache, file):
     return any(parent in cache['folders'] for parent in file.get('parents', []))
 
 def add_folder_to_cache(cache, file):
-    cache['folders'][file['id']] = normalize_drive_file(file)
+    old = cache['folders'].get(file['id'])
+    if old:
+        unlink_cached_item(cache, old)
+
+    folder = normalize_drive_file(file)
+    cache['folders'][folder['id']] = folder
+    link_cached_item(cache, folder)
     if file['id'] == cache['root_id']:
         cache['drive_id'] = file.get('driveId')
 
 def add_pdf_to_cache(cache, file):
+    old = cache['pdfs'].get(file['id'])
+    if old:
+        unlink_cached_item(cache, old)
+
     pdf = normalize_drive_file(file)
     parent_id = pdf.get('parents', [cache['root_id']])[0]
     pdf['parentFolderLink'] = f"https://drive.google.com/drive/folders/{parent_id}"
     cache['pdfs'][pdf['id']] = pdf
+    link_cached_item(cache, pdf)
 
 def remove_folder_subtree_from_cache(cache, folder_id):
-    removed_folders = {folder_id}
-
-    changed = True
-    while changed:
-        changed = False
-        for cached_folder_id, folder in list(cache['folders'].items()):
-            if cached_folder_id in removed_folders:
+    removed = {folder_id}
+    stack = [folder_id]
+    while stack:
+        parent = stack.pop()
+        for child_id in cache['children'].get(parent, ()):
+            if child_id in removed:
                 continue
-            if any(parent in removed_folders for parent in folder.get('parents', [])):
-                removed_folders.add(cached_folder_id)
-                changed = True
-
-    for cached_folder_id in removed_folders:
-        if cached_folder_id != cache['root_id']:
-            cache['folders'].pop(cached_folder_id, None)
+            removed.add(child_id)
+            if child_id in cache['folders']:
+                stack.append(child_id)
 
-    for pdf_id, pdf in list(cache['pdfs'].items()):
-        if any(parent in removed_folders for parent in pdf.get('parents', [])):
-            cache['pdfs'].pop(pdf_id, None)
+    for item_id in removed:
+        if item_id != cache['root_id']:
+            remove_cached_item(cache, item_id)
 
 def prune_cache_to_root(cache):
     reachable = {cache['root_id']}
-    changed = True
-
-    while changed:
-        changed = False
-        for folder_id, folder in cache['folders'].items():
-            if folder_id in reachable:
-                continue
-            if any(parent in reachable for parent in folder.get('parents', [])):
-                reachable.add(folder_id)
-                changed = True
-
-    for folder_id in list(cache['folders'].keys()):
-        if folder_id not in reachable:
-            cache['folders'].pop(folder_id, None)
-
-    for pdf_id, pdf in list(cache['pdfs'].items()):
-        if not any(parent in reachable for parent in pdf.get('parents', [])):
-            cache['pdfs'].pop(pdf_id, None)
-
-def scan_folder_tree(service, folder_id, cache, folder_name=None):
-    files = list_files_in_folder(service, folder_id, folder_name)
-    for file in files:
-        if file.get('mimeType') == Google.mime_types['folder']:
-            if should_skip_drive_folder(file):
-                log.info(f"Skipping Google Drive folder {format_folder_for_log(file['id'], file.get('name'))}")
-                remove_folder_subtree_from_cache(cache, file['id'])
-                continue
-            add_folder_to_cache(cache, file)
-            scan_folder_tree(service, file['id'], cache, file.get('name'))
-        elif file.get('mimeType') == Google.mime_types['pdf']:
-            add_pdf_to_cache(cache, file)
-
-def full_drive_discovery(service, root_id, root_url=None):
+    stack = [cache['root_id']]
+    while stack:
+        parent = stack.pop()
+        for child_id in cache['children'].get(parent, ()):
+            if child_id in cache['folders'] and child_id not in reachable:
+                reachable.add(child_id)
+                stack.append(child_id)
+
+    for folder_id in [folder_id for folder_id in cache['folders']
+                      if folder_id not in reachable]:
+        remove_cached_item(cache, folder_id)
+
+    for pdf_id in [pdf_id for pdf_id, pdf in cache['pdfs'].items()
+                   if not any(parent in reachable for parent in pdf.get('parents', []))]:
+        remove_cached_item(cache, pdf_id)
+
+# Recursively list the folders in "folders" (a list of (folder ID,
+# folder name) tuples) and everything below them into the cache.
+#
+# Google API service objects are not thread safe, so "services" is a
+# queue.Queue of Drive service objects: each listing borrows one.
+# Folders are listed concurrently (one listing per service), and every
+# listing's results are applied to the cache in this thread as soon as
+# that listing is done, so the cache itself needs no locking.
+def scan_folder_tree(services, cache, folders):
+    def _list(folder_id, folder_name):
+        service = services.get()
+        try:
+            return list_files_in_folder(service, folder_id, folder_name)
+        finally:
+            services.put(service)
+
+    scanned = set()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.drive_workers) as executor:
+        pending = set()
+        for folder_id, folder_name in folders:
+            if folder_id not in scanned:
+                scanned.add(folder_id)
+                pending.add(executor.submit(_list, folder_id, folder_name))
+
+        while pending:
+            done, pending = concurrent.futures.wait(pending,
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                for file in future.result():
+                    if file.get('mimeType') == Google.mime_types['folder']:
+                        if should_skip_drive_folder(file):
+                            log.info(f"Skipping Google Drive folder {format_folder_for_log(file['id'], file.get('name'))}")
+                            remove_folder_subtree_from_cache(cache, file['id'])
+                            continue
+                        add_folder_to_cache(cache, file)
+                        if file['id'] not in scanned:
+                            scanned.add(file['id'])
+                            pending.add(executor.submit(_list, file['id'], file.get('name')))
+                    elif file.get('mimeType') == Google.mime_types['pdf']:
+                        add_pdf_to_cache(cache, file)
+
+def full_drive_discovery(services, root_id, root_url=None):
     log.info(f"Performing full Google Drive discovery from folder ID: {root_id}...")
     cache = create_google_drive_cache(root_id, root_url)
 
-    root = get_file_metadata(service, root_id)
-    if not root:
-        raise RuntimeError(f"Could not read root folder metadata for {root_id}")
-    add_folder_to_cache(cache, root)
+    service = services.get()
+    try:
+        root = get_file_metadata(service, root_id)
+        if not root:
+            raise RuntimeError(f"Could not read root folder metadata for {root_id}")
+        add_folder_to_cache(cache, root)
+    finally:
+        services.put(service)
+
+    scan_folder_tree(services, cache, [(root_id, root.get('name'))])
 
-    scan_folder_tree(service, root_id, cache, root.get('name'))
-    cache['change_page_token'] = get_start_page_token(service, cache.get('drive_id'))
+    service = services.get()
+    try:
+        cache['change_page_token'] = get_start_page_token(service, cache.get('drive_id'))
+    finally:
+        services.put(service)
     cache['updated_at_utc'] = utc_timestamp()
     return cache
 
 def remove_changed_item_from_cache(cache, file_id):
     if file_id in cache['folders']:
         remove_folder_subtree_from_cache(cache, file_id)
-    cache['pdfs'].pop(file_id, None)
+    remove_cached_item(cache, file_id)
 
-def apply_file_change_to_cache(service, cache, file):
+# Apply one Drive change to the cache.  Folders that newly appear in
+# the tree are added to "new_folders" (a dictionary of folder ID ->
+# name) so that the caller can scan them all at once.
+def apply_file_change_to_cache(cache, file, new_folders):
     file_id = file['id']
 
     if file.get('trashed'):
@@ -548,7 +644,7 @@ def apply_file_change_to_cache(service, cache, file):
         if is_in_tree:
             add_folder_to_cache(cache, file)
             if not was_tracked:
-                scan_folder_tree(service, file_id, cache, file.get('name'))
+                new_folders[file_id] = file.get('name')
         elif was_tracked:
             remove_folder_subtree_from_cache(cache, file_id)
         return
@@ -557,10 +653,10 @@ def apply_file_change_to_cache(service, cache, file):
         if cache_contains_parent(cache, file):
             add_pdf_to_cache(cache, file)
         else:
-            cache['pdfs'].pop(file_id, None)
+            remove_cached_item(cache, file_id)
         return
 
-    cache['pdfs'].pop(file_id, None)
+    remove_cached_item(cache, file_id)
 
 def list_drive_changes_page(service, page_token, drive_id=None):
     kwargs = {
@@ -577,46 +673,59 @@ def list_drive_changes_page(service, page_token, drive_id=None):
     httpref = service.changes().list(**kwargs)
     return Google.call_api(httpref, log)
 
-def refresh_google_drive_cache(service, cache):
+def refresh_google_drive_cache(services, cache):
     page_token = cache.get('change_page_token')
     if not page_token:
         log.info("Google Drive cache has no change token; full discovery is required.")
         return None
 
     changes_seen = 0
+    new_folders = {}
     log.info("Refreshing Google Drive cache from Drive change log...")
 
-    while page_token:
-        try:
-            results = list_drive_changes_page(service, page_token, cache.get('drive_id'))
-        except HttpError as e:
-            if e.resp.status == 410:
-                log.info("Google Drive change token expired; full discovery is required.")
-                return None
-            raise
+    service = services.get()
+    try:
+        while page_token:
+            try:
+                results = list_drive_changes_page(service, page_token, cache.get('drive_id'))
+            except HttpError as e:
+                if e.resp.status == 410:
+                    log.info("Google Drive change token expired; full discovery is required.")
+                    return None
+                raise
 
-        if not results:
-            return None
+            if not results:
+                return None
 
-        for change in results.get('changes', []):
-            changes_seen += 1
-            file_id = change.get('fileId')
-            if not file_id:
-                continue
+            for change in results.get('changes', []):
+                changes_seen += 1
+                file_id = change.get('fileId')
+                if not file_id:
+                    continue
 
-            if change.get('removed'):
-                remove_changed_item_from_cache(cache, file_id)
-                continue
+                if change.get('removed'):
+                    remove_changed_item_from_cache(cache, file_id)
+                    continue
 
-            file = change.get('file')
-            if file:
-                apply_file_change_to_cache(service, cache, file)
-            else:
-                remove_changed_item_from_cache(cache, file_id)
+                file = change.get('file')
+                if file:
+                    apply_file_change_to_cache(cache, file, new_folders)
+                else:
+                    remove_changed_item_from_cache(cache, file_id)
 
-        page_token = results.get('nextPageToken')
-        if results.get('newStartPageToken'):
-            cache['change_page_token'] = results['newStartPageToken']
+            page_token = results.get('nextPageToken')
+            if results.get('newStartPageToken'):
+                cache['change_page_token'] = results['newStartPageToken']
+    finally:
+        services.put(service)
+
+    # Scan the folders that were added to the tree (and are still in
+    # it after all the changes were applied).
+    new_folders = [(folder_id, name) for folder_id, name in new_folders.items()
+                   if folder_id in cache['folders']]
+    if new_folders:
+        log.info(f"Scanning {len(new_folders)} new Google Drive folders...")
+        scan_folder_tree(services, cache, new_folders)
 
     prune_cache_to_root(cache)
     cache['updated_at_utc'] = utc_timestamp()
@@ -632,23 +741,23 @@ def sort_pdfs_for_analysis(pdfs):
         key=lambda pdf: ((pdf.get('name') or '').casefold(), pdf.get('id') or '')
     )
 
+# Download a Drive file straight to a (uniquely-named) temporary file,
+# one chunk at a time, so that large PDFs never have to fit in memory.
 @retry.Retry(predicate=Google.retry_errors)
 def download_file(service, file_id, file_name):
+    fd, local_path = tempfile.mkstemp(prefix=f"{file_id}-", suffix=".pdf")
     try:
-        httpref = service.files().get_media(fileId=file_id, supportsAllDrives=True)
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, httpref)
-        done = False
-        while done is False:
-            status, done = downloader.next_chunk()
-        fh.seek(0)
-
-        local_path = f"/tmp/{file_id}.pdf"
-        with open(local_path, "wb") as f:
-            f.write(fh.read())
+        with os.fdopen(fd, "wb") as f:
+            httpref = service.files().get_media(fileId=file_id, supportsAllDrives=True)
+            downloader = MediaIoBaseDownload(f, httpref, chunksize=DOWNLOAD_CHUNK_SIZE)
+            done = False
+            while done is False:
+                status, done = downloader.next_chunk()
         return local_path
     except Exception as e:
         log.error(f"Error downloading file {file_id} ({file_name}): {e}")
+        if os.path.exists(local_path):
+            os.remove(local_path)
         return None
 
 def build_openai_response_body(openai_file_id, lyrics_mode=LYRICS_MODE_VERBATIM_FIRST):
@@ -781,6 +890,10 @@ def sanitize_markdown_text(value):
     if value is None:
         return ""
     text = str(value)
+    # Printable strings have no control (or other "C" category)
+    # characters, so there is nothing to strip.
+    if text.isprintable():
+        return text
     return "".join(
         char
         for char in text
@@ -821,58 +934,109 @@ def format_markdown_lyrics(lyrics):
 
     return "\n\n".join(formatted_stanzas)
 
+def render_song_markdown(title, song):
+    parts = [f"## {one_line_markdown_text(title)}\n\n"]
+
+    if song.get('lyrics'):
+        heading = "Lyrics" if song.get('lyrics_type') == 'verbatim' else "Lyric Summary"
+        parts.append(f"### {heading}\n")
+        if song.get('lyrics_type') == 'verbatim':
+            parts.append(f"{format_markdown_lyrics(song['lyrics'])}\n\n")
+        else:
+            parts.append(f"{normalize_multiline_text(song['lyrics'])}\n\n")
+    elif song.get('lyrics_summary'):
+        parts.append("### Lyric Summary\n")
+        parts.append(f"{normalize_multiline_text(song['lyrics_summary'])}\n\n")
+
+    parts.append("### Metadata\n")
+    parts.append(f"- **Composer:** {one_line_markdown_text(song.get('composer'))}\n")
+    parts.append(f"- **Date:** {one_line_markdown_text(song.get('publication_date'))}\n")
+    parts.append(f"- **Publisher:** {one_line_markdown_text(song.get('publisher'))}\n\n")
+
+    if song.get('musician_notes'):
+        parts.append("### Musician Notes\n")
+        parts.append(f"{normalize_multiline_text(song['musician_notes'])}\n\n")
+
+    parts.append("### Arrangements & Variations\n")
+    folder_groups = {}
+    for arr in song['arrangements']:
+        # Extract folder ID from link
+        match = FOLDER_ID_RE.search(arr['folder_link'])
+        folder_id = match.group(1) if match else arr['folder_link']
+        folder_groups.setdefault(folder_id, []).append(arr)
+
+    for folder_id, arrs in folder_groups.items():
+        if len(arrs) > 1:
+            parts.append(f"- **Folder:** {markdown_link('Link to Folder', arrs[0]['folder_link'])}\n")
+            for arr in arrs:
+                parts.append(f"  - {one_line_markdown_text(arr['description'])}: {markdown_link('PDF Link', arr['file_link'])}\n")
+        else:
+            arr = arrs[0]
+            parts.append(
+                f"- {one_line_markdown_text(arr['description'])}: "
+                f"{markdown_link('PDF Link', arr['file_link'])} "
+                f"(in {markdown_link('folder', arr['folder_link'])})\n"
+            )
+    parts.append("\n---\n\n")
+    return "".join(parts)
+
+# The rendered markdown of each song is saved in the analysis store,
+# along with a hash of the song data it was rendered from.  Only the
+# songs whose data changed since the last run are rendered again, and
+# if nothing changed at all, the output file is not rewritten.
+def song_markdown_hash(song):
+    text = f"{MARKDOWN_RENDER_VERSION}:{json_column(song)}"
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
 def generate_markdown(songs, output_file):
-    sorted_titles = sorted(songs.keys())
+    conn = get_analysis_store(args.state_dir)
+    output_key = os.path.abspath(output_file)
+    previous = {
+        title: (song_hash, markdown)
+        for title, song_hash, markdown in conn.execute(
+            'SELECT title, song_hash, markdown FROM markdown_sections WHERE output_file=?',
+            (output_key,)
+        )
+    }
 
-    with open(output_file, "w", encoding="utf-8") as f:
+    sections = []
+    changed = []
+    for title in sorted(songs.keys()):
+        song_hash = song_markdown_hash(songs[title])
+        cached = previous.get(title)
+        if cached and cached[0] == song_hash:
+            sections.append(cached[1])
+            continue
+
+        markdown = render_song_markdown(title, songs[title])
+        sections.append(markdown)
+        changed.append((output_key, title, song_hash, markdown))
+
+    removed = [(output_key, title) for title in previous if title not in songs]
+    if not changed and not removed and os.path.exists(output_file):
+        log.info(f"No songs changed; {output_file} is up to date.")
+        return
+
+    log.info(
+        f"Rendered {len(changed)} changed of {len(songs)} songs "
+        f"({len(removed)} removed)."
+    )
+    tmp_output_file = f"{output_file}.tmp"
+    with open(tmp_output_file, "w", encoding="utf-8") as f:
         f.write("# Musician Score Index\n\n")
-        for title in sorted_titles:
-            song = songs[title]
-            f.write(f"## {one_line_markdown_text(title)}\n\n")
-
-            if song.get('lyrics'):
-                heading = "Lyrics" if song.get('lyrics_type') == 'verbatim' else "Lyric Summary"
-                f.write(f"### {heading}\n")
-                if song.get('lyrics_type') == 'verbatim':
-                    f.write(f"{format_markdown_lyrics(song['lyrics'])}\n\n")
-                else:
-                    f.write(f"{normalize_multiline_text(song['lyrics'])}\n\n")
-            elif song.get('lyrics_summary'):
-                f.write("### Lyric Summary\n")
-                f.write(f"{normalize_multiline_text(song['lyrics_summary'])}\n\n")
-
-            f.write("### Metadata\n")
-            f.write(f"- **Composer:** {one_line_markdown_text(song.get('composer'))}\n")
-            f.write(f"- **Date:** {one_line_markdown_text(song.get('publication_date'))}\n")
-            f.write(f"- **Publisher:** {one_line_markdown_text(song.get('publisher'))}\n\n")
-
-            if song.get('musician_notes'):
-                f.write("### Musician Notes\n")
-                f.write(f"{normalize_multiline_text(song['musician_notes'])}\n\n")
-
-            f.write("### Arrangements & Variations\n")
-            folder_groups = {}
-            for arr in song['arrangements']:
-                # Extract folder ID from link
-                match = re.search(r'folders/([a-zA-Z0-9_-]+)', arr['folder_link'])
-                folder_id = match.group(1) if match else arr['folder_link']
-                if folder_id not in folder_groups:
-                    folder_groups[folder_id] = []
-                folder_groups[folder_id].append(arr)
-
-            for folder_id, arrs in folder_groups.items():
-                if len(arrs) > 1:
-                    f.write(f"- **Folder:** {markdown_link('Link to Folder', arrs[0]['folder_link'])}\n")
-                    for arr in arrs:
-                        f.write(f"  - {one_line_markdown_text(arr['description'])}: {markdown_link('PDF Link', arr['file_link'])}\n")
-                else:
-                    arr = arrs[0]
-                    f.write(
-                        f"- {one_line_markdown_text(arr['description'])}: "
-                        f"{markdown_link('PDF Link', arr['file_link'])} "
-                        f"(in {markdown_link('folder', arr['folder_link'])})\n"
-                    )
-            f.write("\n---\n\n")
+        f.writelines(sections)
+    os.replace(tmp_output_file, output_file)
+
+    with conn:
+        conn.executemany(
+            'INSERT OR REPLACE INTO markdown_sections '
+            '(output_file, title, song_hash, markdown) VALUES (?, ?, ?, ?)',
+            changed
+        )
+        conn.executemany(
+            'DELETE FROM markdown_sections WHERE output_file=? AND title=?',
+            removed
+        )
 
 def one_line_markdown_text(value):
     if value is None:
@@ -1085,9 +1249,11 @@ def save_google_drive_cache(cache, cache_file):
 
     cache_dir = os.path.dirname(os.path.abspath(cache_file))
     os.makedirs(cache_dir, exist_ok=True)
+    # The children index is rebuilt when the cache is loaded
+    data = {key: value for key, value in cache.items() if key != 'children'}
     tmp_cache_file = f"{cache_file}.tmp"
     with open(tmp_cache_file, 'w') as f:
-        json.dump(cache, f, indent=2, sort_keys=True)
+        json.dump(data, f, indent=2, sort_keys=True)
     os.replace(tmp_cache_file, cache_file)
 
 def load_google_drive_cache(cache_file):
@@ -1101,18 +1267,147 @@ def load_google_drive_cache(cache_file):
         raise ValueError(
             f"Unsupported Google Drive cache schema version: {cache.get('schema_version')}"
         )
+    index_google_drive_cache(cache)
     return cache
 
-def get_cached_analysis(file_id, state_dir):
-    cache_path = os.path.join(state_dir, f"{file_id}.json")
-    if os.path.exists(cache_path):
-        with open(cache_path, 'r') as f:
+#-------------------------------------------------------------------
+# Analysis store
+#
+# Per-file analysis results and the OpenAI batch state are kept in a
+# single SQLite database in the state directory, with one JSON row per
+# item:
+#
+#   analyses           -> one row per Drive file ID
+#   batch_files        -> batch_state['files'], one row per Drive file ID
+#   file_error_history -> batch_state['file_error_history'], one row per
+#                         Drive file ID
+#   batches            -> batch_state['batches'], one row per batch ID
+#   markdown_sections  -> rendered markdown of each song (see
+#                         generate_markdown())
+#   meta               -> everything else (schema version, timestamps)
+#
+# Saving the batch state only writes the rows that changed since it was
+# loaded (or last saved), in a single transaction.
+#
+# Older versions of this script kept one {state_dir}/{file_id}.json per
+# analysis and the batch state in {state_dir}/openai-analysis-batches.json.
+# Those files are imported the first time the store is opened; they
+# are left in place (but are no longer read or written) afterwards.
+
+ANALYSIS_STORE_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)',
+    'CREATE TABLE IF NOT EXISTS analyses (file_id TEXT PRIMARY KEY, data TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS batch_files (key TEXT PRIMARY KEY, data TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS file_error_history (key TEXT PRIMARY KEY, data TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS batches (key TEXT PRIMARY KEY, data TEXT NOT NULL)',
+    ('CREATE TABLE IF NOT EXISTS markdown_sections ('
+     'output_file TEXT NOT NULL, title TEXT NOT NULL, '
+     'song_hash TEXT NOT NULL, markdown TEXT NOT NULL, '
+     'PRIMARY KEY (output_file, title))'),
+]
+
+# Batch state key -> table holding it
+BATCH_STATE_TABLES = {
+    'files': 'batch_files',
+    'file_error_history': 'file_error_history',
+    'batches': 'batches',
+}
+
+analysis_stores = {}
+
+# The JSON of each batch state row as of the last load/save, keyed by
+# (table, key), so that saving can skip unchanged rows.
+saved_batch_state_rows = None
+
+def get_analysis_store(state_dir):
+    conn = analysis_stores.get(state_dir)
+    if conn:
+        return conn
+
+    os.makedirs(state_dir, exist_ok=True)
+    store_path = os.path.join(state_dir, ANALYSIS_STORE_FILENAME)
+    conn = sqlite3.connect(store_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    with conn:
+        for sql in ANALYSIS_STORE_SCHEMA:
+            conn.execute(sql)
+
+    row = conn.execute("SELECT value FROM meta WHERE key='schema_version'").fetchone()
+    if row is None:
+        migrate_json_state_to_store(conn, state_dir)
+    elif int(row[0]) != ANALYSIS_STORE_VERSION:
+        raise ValueError(f"Unsupported analysis store schema version: {row[0]}")
+
+    analysis_stores[state_dir] = conn
+    return conn
+
+def json_column(value):
+    return json.dumps(value, sort_keys=True, separators=(',', ':'))
+
+def migrate_json_state_to_store(conn, state_dir):
+    analyses = []
+    for filename in sorted(os.listdir(state_dir)):
+        if not filename.endswith('.json') or filename == BATCH_STATE_FILENAME:
+            continue
+        with open(os.path.join(state_dir, filename), 'r') as f:
             data = json.load(f)
+        normalize_analysis_timestamp(data)
+        analyses.append((filename[:-len('.json')], json_column(data)))
+
+    state = None
+    state_path = get_batch_state_path(state_dir)
+    if os.path.exists(state_path):
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+        if not isinstance(state, dict):
+            raise ValueError("OpenAI batch state must be a JSON object")
+        if state.get('schema_version') != BATCH_STATE_VERSION:
+            raise ValueError(
+                f"Unsupported OpenAI batch state schema version: {state.get('schema_version')}"
+            )
+
+    with conn:
+        conn.executemany('INSERT OR REPLACE INTO analyses (file_id, data) VALUES (?, ?)',
+                         analyses)
+        if state:
+            write_batch_state_rows(conn, state)
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                     (str(ANALYSIS_STORE_VERSION),))
+
+    if analyses or state:
+        log.info(
+            f"Imported {len(analyses)} cached analyses"
+            f"{' and the OpenAI batch state' if state else ''} "
+            f"from JSON files in {state_dir} into {ANALYSIS_STORE_FILENAME}"
+        )
+
+def get_cached_analyses(state_dir):
+    conn = get_analysis_store(state_dir)
+    analyses = {}
+    normalized = []
+    for file_id, text in conn.execute('SELECT file_id, data FROM analyses'):
+        data = json.loads(text)
         if normalize_analysis_timestamp(data):
-            with open(cache_path, 'w') as f:
-                json.dump(data, f, indent=2)
-        return data
-    return None
+            normalized.append((json_column(data), file_id))
+        analyses[file_id] = data
+
+    if normalized:
+        with conn:
+            conn.executemany('UPDATE analyses SET data=? WHERE file_id=?', normalized)
+    return analyses
+
+def get_cached_analysis(file_id, state_dir):
+    conn = get_analysis_store(state_dir)
+    row = conn.execute('SELECT data FROM analyses WHERE file_id=?', (file_id,)).fetchone()
+    if row is None:
+        return None
+
+    data = json.loads(row[0])
+    if normalize_analysis_timestamp(data):
+        with conn:
+            conn.execute('UPDATE analyses SET data=? WHERE file_id=?',
+                         (json_column(data), file_id))
+    return data
 
 def get_error_object(error):
     if not isinstance(error, dict):
@@ -1296,10 +1591,6 @@ def cached_analysis_reanalysis_reason(cached_data, pdf):
     )
 
 def save_cached_analysis(file_id, data, state_dir, pdf=None):
-    if not os.path.exists(state_dir):
-        os.makedirs(state_dir)
-
-    cache_path = os.path.join(state_dir, f"{file_id}.json")
     data['cached_at_utc'] = utc_timestamp()
     data.pop('cached_at', None)
     if pdf:
@@ -1308,8 +1599,10 @@ def save_cached_analysis(file_id, data, state_dir, pdf=None):
             data['source_modified_time_utc'] = source_modified_time_utc
     data['analysis_model'] = args.model
     data['pdf_detail'] = args.pdf_detail
-    with open(cache_path, 'w') as f:
-        json.dump(data, f, indent=2)
+    conn = get_analysis_store(state_dir)
+    with conn:
+        conn.execute('INSERT OR REPLACE INTO analyses (file_id, data) VALUES (?, ?)',
+                     (file_id, json_column(data)))
 
 def save_failed_analysis(file_id, error, state_dir, pdf, status):
     data = {
@@ -1330,9 +1623,10 @@ def save_failed_analysis(file_id, error, state_dir, pdf, status):
 
 def build_songs_from_cached_analysis(found_pdfs):
     songs = {}
+    cached_analyses = get_cached_analyses(args.state_dir)
     for pdf in found_pdfs:
         file_id = pdf['id']
-        cached_data = get_cached_analysis(file_id, args.state_dir)
+        cached_data = cached_analyses.get(file_id)
         if not cached_data:
             continue
         try:
@@ -1440,25 +1734,60 @@ def rebuild_file_error_history_from_requests(state):
 
     return changed
 
-def load_batch_state(state_dir):
-    state_path = get_batch_state_path(state_dir)
-    if not os.path.exists(state_path):
-        return create_batch_state()
+def write_batch_state_rows(conn, state, saved_rows=None):
+    """Write the batch state rows that differ from "saved_rows" (a
+    dictionary of (table, key) -> JSON; None means write everything),
+    and delete the rows that are no longer in the state.  Returns the
+    new (table, key) -> JSON dictionary.  The caller must be in a
+    transaction."""
+    rows = {}
+    for state_key, table in BATCH_STATE_TABLES.items():
+        upserts = []
+        for key, value in state.get(state_key, {}).items():
+            text = json_column(value)
+            rows[(table, key)] = text
+            if saved_rows is None or saved_rows.get((table, key)) != text:
+                upserts.append((key, text))
+        conn.executemany(f'INSERT OR REPLACE INTO {table} (key, data) VALUES (?, ?)',
+                         upserts)
+
+    if saved_rows is None:
+        deletes = []
+        for table in BATCH_STATE_TABLES.values():
+            for (key,) in conn.execute(f'SELECT key FROM {table}'):
+                if (table, key) not in rows:
+                    deletes.append((table, key))
+    else:
+        deletes = [table_key for table_key in saved_rows if table_key not in rows]
+    for table, key in deletes:
+        conn.execute(f'DELETE FROM {table} WHERE key=?', (key,))
 
-    log.info(f"Loading OpenAI batch state from {state_path}...")
-    with open(state_path, 'r') as f:
-        state = json.load(f)
+    for key in ('generated_at_utc', 'updated_at_utc'):
+        if key in state:
+            conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                         (f'batch_state_{key}', state[key]))
+    return rows
 
-    if not isinstance(state, dict):
-        raise ValueError("OpenAI batch state must be a JSON object")
-    if state.get('schema_version') != BATCH_STATE_VERSION:
-        raise ValueError(
-            f"Unsupported OpenAI batch state schema version: {state.get('schema_version')}"
+def load_batch_state(state_dir):
+    global saved_batch_state_rows
+
+    conn = get_analysis_store(state_dir)
+    state = create_batch_state()
+    rows = {}
+    for state_key, table in BATCH_STATE_TABLES.items():
+        for key, text in conn.execute(f'SELECT key, data FROM {table}'):
+            state[state_key][key] = json.loads(text)
+            rows[(table, key)] = text
+    for key, value in conn.execute("SELECT key, value FROM meta WHERE key LIKE 'batch_state_%'"):
+        state[key[len('batch_state_'):]] = value
+    saved_batch_state_rows = rows
+
+    if rows:
+        log.info(
+            f"Loaded OpenAI batch state from {ANALYSIS_STORE_FILENAME} "
+            f"({len(state['batches'])} batches, {len(state['files'])} files)"
         )
 
-    state.setdefault('files', {})
-    state.setdefault('file_error_history', {})
-    state.setdefault('batches', {})
     changed = False
     if normalize_batch_state_statuses(state):
         log.info("Normalized retryable statuses in OpenAI batch state.")
@@ -1471,14 +1800,14 @@ def load_batch_state(state_dir):
     return state
 
 def save_batch_state(state, state_dir):
-    os.makedirs(state_dir, exist_ok=True)
+    global saved_batch_state_rows
+
     state['schema_version'] = BATCH_STATE_VERSION
     state['updated_at_utc'] = utc_timestamp()
-    state_path = get_batch_state_path(state_dir)
-    tmp_state_path = f"{state_path}.tmp"
-    with open(tmp_state_path, 'w') as f:
-        json.dump(state, f, indent=2, sort_keys=True)
-    os.replace(tmp_state_path, state_path)
+    conn = get_analysis_store(state_dir)
+    with conn:
+        saved_batch_state_rows = write_batch_state_rows(conn, state,
+                                                        saved_batch_state_rows)
 
 def compact_utc_timestamp_for_filename():
     return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
@@ -1521,6 +1850,18 @@ def get_drive_service(phase_label):
         log.error(f"Authentication failed for {phase_label}: {e}")
         return None
 
+# Google API service objects are not thread safe, so return a
+# queue.Queue of "count" Drive service objects for worker threads to
+# borrow.
+def get_drive_services(phase_label, count):
+    drive_services = queue.Queue()
+    for _ in range(count):
+        service = get_drive_service(phase_label)
+        if not service:
+            return None
+        drive_services.put(service)
+    return drive_services
+
 def pdf_state_snapshot(pdf):
     return {
         'drive_file_id': pdf['id'],
@@ -1623,9 +1964,10 @@ def choose_pdfs_for_batch_submission(found_pdfs, batch_state):
     skipped_answered = 0
     skipped_retry_filter = 0
 
+    cached_analyses = get_cached_analyses(args.state_dir)
     for pdf in found_pdfs:
         file_id = pdf['id']
-        cached_data = get_cached_analysis(file_id, args.state_dir)
+        cached_data = cached_analyses.get(file_id)
         if cached_data:
             try:
                 if is_cached_analysis_fresh(cached_data, pdf):
@@ -1718,7 +2060,62 @@ def write_batch_input_file(requests):
 
     return path
 
-def submit_analysis_batch(client, service, found_pdfs):
+# Download one PDF from Drive and upload it to OpenAI.  Returns a
+# (file record, batch request) tuple, or None if the PDF could not be
+# prepared.  This runs in a worker thread: "services" is a queue.Queue
+# of Drive service objects (which are not thread safe), and the OpenAI
+# client is shared.
+def prepare_batch_request(client, services, pdf, lyrics_mode, submitted_at_utc, label):
+    file_id = pdf['id']
+    log.info(
+        f"Preparing batch request ({label}): "
+        f"{pdf['name']} ({file_id}); lyrics mode: {lyrics_mode}..."
+    )
+    local_path = None
+    openai_file = None
+    try:
+        service = services.get()
+        try:
+            local_path = download_file(service, file_id, pdf['name'])
+        finally:
+            services.put(service)
+        if not local_path:
+            log.warning(f"Skipping {pdf['name']} ({file_id}); download failed.")
+            return None
+
+        log.info(f"Uploading {local_path} to OpenAI for batch analysis...")
+        with open(local_path, "rb") as f:
+            openai_file = client.files.create(
+                file=f,
+                purpose="user_data"
+            )
+
+        custom_id = f"{file_id}-{uuid.uuid4().hex[:8]}"
+        file_record = pdf_state_snapshot(pdf)
+        file_record.update({
+            'custom_id': custom_id,
+            'openai_file_id': openai_file.id,
+            'status': 'submitted',
+            'submitted_at_utc': submitted_at_utc,
+            'lyrics_mode': lyrics_mode,
+        })
+        batch_request = {
+            'custom_id': custom_id,
+            'method': 'POST',
+            'url': BATCH_ENDPOINT,
+            'body': build_openai_response_body(openai_file.id, lyrics_mode),
+        }
+        return file_record, batch_request
+    except Exception as e:
+        log.error(f"Could not prepare batch request for {pdf['name']} ({file_id}): {e}")
+        if openai_file:
+            delete_openai_file(client, openai_file.id, "PDF")
+        return None
+    finally:
+        if local_path and os.path.exists(local_path):
+            os.remove(local_path)
+
+def submit_analysis_batch(client, services, found_pdfs):
     try:
         batch_state = load_batch_state(args.state_dir)
     except Exception as e:
@@ -1755,51 +2152,25 @@ def submit_analysis_batch(client, service, found_pdfs):
     batch_input_file = None
     created_batch_id = None
 
-    for analysis_index, pdf in enumerate(candidates, start=1):
-        file_id = pdf['id']
-        lyrics_mode = get_lyrics_mode_for_batch_submission(batch_state, pdf)
-        log.info(
-            f"Preparing batch request ({analysis_index} of {len(candidates)}): "
-            f"{pdf['name']} ({file_id}); lyrics mode: {lyrics_mode}..."
-        )
-        local_path = None
-        openai_file = None
-        try:
-            local_path = download_file(service, file_id, pdf['name'])
-            if not local_path:
-                log.warning(f"Skipping {pdf['name']} ({file_id}); download failed.")
-                continue
-
-            log.info(f"Uploading {local_path} to OpenAI for batch analysis...")
-            with open(local_path, "rb") as f:
-                openai_file = client.files.create(
-                    file=f,
-                    purpose="user_data"
-                )
-
-            custom_id = f"{file_id}-{uuid.uuid4().hex[:8]}"
-            file_record = pdf_state_snapshot(pdf)
-            file_record.update({
-                'custom_id': custom_id,
-                'openai_file_id': openai_file.id,
-                'status': 'submitted',
-                'submitted_at_utc': submitted_at_utc,
-                'lyrics_mode': lyrics_mode,
-            })
-            file_records.append(file_record)
-            batch_requests.append({
-                'custom_id': custom_id,
-                'method': 'POST',
-                'url': BATCH_ENDPOINT,
-                'body': build_openai_response_body(openai_file.id, lyrics_mode),
-            })
-        except Exception as e:
-            log.error(f"Could not prepare batch request for {pdf['name']} ({file_id}): {e}")
-            if openai_file:
-                delete_openai_file(client, openai_file.id, "PDF")
-        finally:
-            if local_path and os.path.exists(local_path):
-                os.remove(local_path)
+    # Download and upload several PDFs at once.  Each worker streams
+    # its PDF to a temporary file and deletes it once it is uploaded,
+    # so at most one PDF per worker is on local disk at a time.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.submit_workers) as executor:
+        futures = [
+            executor.submit(prepare_batch_request, client, services, pdf,
+                            get_lyrics_mode_for_batch_submission(batch_state, pdf),
+                            submitted_at_utc,
+                            f"{analysis_index} of {len(candidates)}")
+            for analysis_index, pdf in enumerate(candidates, start=1)
+        ]
+
+        # Keep the requests in candidate order
+        for future in futures:
+            result = future.result()
+            if result:
+                file_record, batch_request = result
+                file_records.append(file_record)
+                batch_requests.append(batch_request)
 
     if not batch_requests:
         log.info("No batch requests were prepared successfully.")
@@ -2101,20 +2472,8 @@ def main():
             log.error("Error: --google-drive-root-url is required for discovery (unless --skip-discovery is used).")
             return
 
-        apis = {
-            'drive' : { 'scope'       : Google.scopes['drive'],
-                        'api_name'    : 'drive',
-                        'api_version' : 'v3', },
-        }
-
-        try:
-            services = GoogleAuth.service_oauth_login(apis,
-                                                      app_json=args.app_id,
-                                                      user_json=args.user_credentials,
-                                                      log=log)
-            service = services['drive']
-        except Exception as e:
-            log.error(f"Authentication failed: {e}")
+        drive_services = get_drive_services("discovery", args.drive_workers)
+        if not drive_services:
             return
 
         root_id = extract_folder_id(args.google_drive_root_url)
@@ -2132,10 +2491,10 @@ def main():
                 log.warning(f"Could not use Google Drive cache {args.google_drive_cache}: {e}")
 
         if cache:
-            cache = refresh_google_drive_cache(service, cache)
+            cache = refresh_google_drive_cache(drive_services, cache)
 
         if not cache:
-            cache = full_drive_discovery(service, root_id, args.google_drive_root_url)
+            cache = full_drive_discovery(drive_services, root_id, args.google_drive_root_url)
 
         save_google_drive_cache(cache, args.google_drive_cache)
         found_pdfs = get_found_pdfs_from_cache(cache)
@@ -2162,10 +2521,10 @@ def main():
             return
 
         if args.submit_analysis_batch:
-            service = get_drive_service("batch submission")
-            if not service:
+            drive_services = get_drive_services("batch submission", args.submit_workers)
+            if not drive_services:
                 return
-            if not submit_analysis_batch(client, service, found_pdfs):
+            if not submit_analysis_batch(client, drive_services, found_pdfs):
                 return
             log.info("Done!")
             return
@@ -2194,6 +2553,7 @@ def main():
                 return
 
         log.info(f"Starting analysis of {len(found_pdfs)} PDFs...")
+        cached_analyses = get_cached_analyses(args.state_dir)
         songs = {}
         skipped_retry_filter = 0
 
@@ -2202,7 +2562,7 @@ def main():
             log.info(f"Processing ({analysis_index} of {len(found_pdfs)}): {pdf['name']} ({file_id})...")
 
             # Check local persistent cache
-            cached_data = get_cached_analysis(file_id, args.state_dir)
+            cached_data = cached_analyses.get(file_id)
             use_cache = False
             data = None
 
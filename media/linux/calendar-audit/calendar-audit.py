@@ -19,6 +19,7 @@ sys.path.insert(0, moddir)
 import ECC
 import Google
 import GoogleAuth
+import ECCUploader
 
 import json
 import time
@@ -26,7 +27,6 @@ import tempfile
 import datetime
 
 from oauth2client import tools
-from apiclient.http import MediaFileUpload
 from google.api_core import retry
 
 from pprint import pprint
@@ -201,25 +201,11 @@ def write_temp_json_file(activities, log):
 
 def upload_to_google(service, filename, folder_id, log):
     try:
-        log.info('Uploading file to google "{file}"'
-                 .format(file=filename))
-        metadata = {
-            'name'     : filename,
-            'mimeType' : Google.mime_types['json'],
-            'parents'  : [ folder_id ],
-            'supportsTeamDrives' : True,
-        }
-        media = MediaFileUpload(filename,
+        ECCUploader.upload_file(service, filename,
                                 mimetype=Google.mime_types['json'],
-                                resumable=True)
-        http = service.files().create(body=metadata,
-                                      media_body=media,
-                                      supportsTeamDrives=True,
-                                      fields='id')
-        response = Google.call_api(http, log)
-
-        log.info('Successfully uploaded file: "{filename}" (ID: {id})'
-                 .format(filename=filename, id=response['id']))
+                                folder_id=folder_id,
+                                name=filename,
+                                log=log)
         return
 
     except Exception as e:
@@ -227,8 +213,6 @@ def upload_to_google(service, filename, folder_id, log):
         log.error(e)
         raise e
 
-    log.error("Google upload failed!")
-
 
 ####################################################################
 
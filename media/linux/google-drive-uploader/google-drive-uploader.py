@@ -28,6 +28,7 @@ sys.path.insert(0, moddir)
 
 import ECC
 import Google
+import ECCUploader
 
 import argparse
 
@@ -57,14 +58,16 @@ def google_login(args, log):
 
 #===================================================================
 
-def gd_upload_file(drive, dest_folder_id, upload_filename, log):
-    data = {
-        'parents' : [ {'id' : dest_folder_id } ],
-    }
-    file = drive.CreateFile(data)
-    file.SetContentFile(upload_filename)
+def gd_upload_file(service, dest_folder_id, upload_filename, log):
+    mime_type, _ = mimetypes.guess_type(upload_filename)
+    if mime_type is None:
+        mime_type = 'application/octet-stream'
+
     try:
-        file.Upload()
+        file = ECCUploader.upload_file(service, upload_filename,
+                                       mimetype=mime_type,
+                                       folder_id=dest_folder_id,
+                                       log=log)
     except Exception as e:
         if 'File not found' in str(e):
             log.critical(f"ID {dest_folder_id} does not appear to be a folder")
@@ -150,9 +153,10 @@ def main():
     check_cli_args(args, log)
 
     gauth, drive = google_login(args, log)
+    service = ECCUploader.pydrive_service(drive)
     for f in args.files:
         log.info("Uploading file: {f}".format(f=f))
-        gd_upload_file(drive, args.dest, f, log)
+        gd_upload_file(service, args.dest, f, log)
 
     log.info("Finished uploading files")
 
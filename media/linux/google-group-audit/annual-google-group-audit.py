@@ -26,12 +26,24 @@
 # sheet is
 # https://docs.google.com/spreadsheets/d/1agrM5f6IMefyfrpLU7H_VyDDNo6Jun1B0DQTu1zHvlY/edit.
 #
+# The per-group / per-shared-drive queries are run concurrently (see
+# --workers), and each group's results are appended to a checkpoint
+# file as soon as that group is finished.  If this script is
+# interrupted, just run it again: groups that are already in the
+# checkpoint file will not be queried again.  The checkpoint file is
+# removed once the final CSV has been written, so the next audit
+# starts fresh; delete it by hand to restart an interrupted audit
+# from scratch.
+#
 # Enjoy.
 
 
 import os
 import csv
 import sys
+import json
+import queue
+import concurrent.futures
 
 # We assume that there is a "ecc-python-modules" sym link in this
 # directory that points to the directory with ECC.py and friends.
@@ -65,6 +77,8 @@ guser_cred_file = 'user-credentials.json'
 verbose = True
 debug = False
 logfile = "log.txt"
+checkpoint = 'groups-listing-checkpoint.jsonl'
+workers = 8
 
 ####################################################################
 #
@@ -136,6 +150,101 @@ def query_shared_drive_for_reader(service, drive, address, log):
 
 #-------------------------------------------------------------------
 
+# Get the list of email addresses that are members of a Google Shared
+# Drive itself (vs. permissions on individual files in the drive).
+#
+# This only needs to be done once per drive: any group that is a
+# member of the drive can read every file in it, so we don't need to
+# issue per-file queries for that group / drive pair.
+#
+# Returns None if we can't read the drive's permissions.
+@retry.Retry(predicate=Google.retry_errors)
+def find_shared_drive_members(service, drive, log):
+    log.debug(f"Getting members of Google Shared Drive: {drive['name']} ({drive['id']})")
+
+    members = set()
+    page_token = None
+    try:
+        while True:
+            response = (service
+                        .permissions()
+                        .list(fileId=drive['id'],
+                              pageToken=page_token,
+                              supportsAllDrives=True,
+                              useDomainAdminAccess=True,
+                              fields='nextPageToken,permissions(emailAddress)')
+                        .execute())
+            for permission in response.get('permissions', []):
+                if 'emailAddress' in permission:
+                    members.add(permission['emailAddress'].lower())
+
+            page_token = response.get('nextPageToken', None)
+            if page_token is None:
+                break
+    except googleapiclient.errors.HttpError as e:
+        # Any other error is raised so that @retry can try again
+        if e.resp.status not in [403, 404]:
+            raise
+        log.error(f"Got permission denied getting members of {drive['name']} ({drive['id']}) -- will query files instead")
+        return None
+
+    log.debug(f"Found {len(members)} members of {drive['name']} ({drive['id']})")
+    return members
+
+#-------------------------------------------------------------------
+
+# Check all the Google Shared Drives for a single group.
+#
+# "services" is a queue of Google Drive service objects.  Google API
+# service objects are not thread safe, so each worker thread takes
+# one from the queue for the duration of this group, and then puts it
+# back.
+def audit_group(services, shared_drives, drive_members, group, log):
+    address = group['email']
+
+    num_drives = 0
+    num_files = 0
+    drives_found = list()
+
+    service = services.get()
+    try:
+        for drive in shared_drives:
+            # If the group is a member of the drive itself, we already
+            # know the answer (and don't know how many files it can
+            # see -- but that number is not important).
+            members = drive_members.get(drive['id'])
+            if members is not None and address.lower() in members:
+                num_drives += 1
+                drives_found.append(drive)
+                continue
+
+            # Remember: we're only bothering to get the first 10 files
+            # in the drive that this group has access to (no need to
+            # get *all* files -- we really only care if there are >0
+            # files; we get the first 10 files just as a matter of
+            # course).
+            contents = query_shared_drive_for_reader(service, drive,
+                                                     address, log)
+            if len(contents) > 0:
+                num_drives += 1
+                num_files += len(contents)
+                drives_found.append(drive)
+    finally:
+        services.put(service)
+
+    if num_drives == 0:
+        log.info(f"Did not find any Google Shared Drives readable by {address}")
+    else:
+        log.info(f"Found {num_drives} Google Shared Drives / {num_files} files readable by {address}")
+
+    return {
+        'num files' : num_files,
+        'num drives' : num_drives,
+        'drives found' : drives_found,
+    }
+
+#-------------------------------------------------------------------
+
 @retry.Retry(predicate=Google.retry_errors)
 def find_all_groups(service, log):
     groups = list()
@@ -193,6 +302,52 @@ def write_csv(groups, log_type, log):
 
     log.info(f"Wrote {log_type}: {filename}")
 
+#-------------------------------------------------------------------
+
+# The checkpoint file is append-only JSON lines: one line per group
+# that has been completely audited.  Only the drive IDs are saved;
+# they are looked up in the current list of shared drives when the
+# checkpoint is read back in.
+def read_checkpoint(filename, shared_drives, log):
+    results = dict()
+    if not os.path.exists(filename):
+        return results
+
+    drives_by_id = { drive['id'] : drive for drive in shared_drives }
+    with open(filename) as fp:
+        for line in fp:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A partial line from an interrupted write; that group
+                # will just be audited again.
+                log.warning(f"Ignoring corrupt line in checkpoint file {filename}")
+                continue
+
+            drives_found = [drives_by_id[id] for id in entry['drive ids']
+                            if id in drives_by_id]
+            results[entry['email']] = {
+                'num files' : entry['num files'],
+                'num drives' : len(drives_found),
+                'drives found' : drives_found,
+            }
+
+    log.info(f"Read {len(results)} already-audited groups from checkpoint file {filename}")
+    return results
+
+def append_checkpoint(fp, group):
+    entry = {
+        'email' : group['email'],
+        'num files' : group['drives']['num files'],
+        'drive ids' : [drive['id'] for drive in group['drives']['drives found']],
+    }
+    fp.write(json.dumps(entry) + '\n')
+    fp.flush()
+    os.fsync(fp.fileno())
+
 
 ####################################################################
 #
@@ -224,6 +379,15 @@ def setup_cli_args():
     tools.argparser.add_argument('--logfile',
                                  default=logfile,
                                  help='Store verbose/debug logging to the specified file')
+    global checkpoint
+    tools.argparser.add_argument('--checkpoint',
+                                 default=checkpoint,
+                                 help='File to save progress in (and resume from, if it already exists)')
+    global workers
+    tools.argparser.add_argument('--workers',
+                                 type=int,
+                                 default=workers,
+                                 help='Number of groups to audit concurrently')
 
     global args
     args = tools.argparser.parse_args()
@@ -281,52 +445,74 @@ def main():
     shared_drives = find_all_google_shared_drives(service_drive, log)
     log.info(f"Found {len(shared_drives)} Google Shared Drives")
 
+    # Pick up where a prior (interrupted) run left off
+    done = read_checkpoint(args.checkpoint, shared_drives, log)
+    todo = list()
+    for group in groups:
+        if group['email'] in done:
+            group['drives'] = done[group['email']]
+        else:
+            todo.append(group)
+    log.info(f"{len(todo)} Google Groups left to audit")
+
     log.warning("=================================================================")
     log.warning("This may take a LONG time to run!")
     log.warning("It may take an hour or three")
     log.warning("=================================================================")
 
-    # For each of the Google Groups, check each shared drive and see
-    # if that Group has read access (which is the lowest access) to
-    # any files in that Google Shared Drive.
-    for group in groups:
-        num_drives = 0
-        num_files = 0
-        drives_found = list()
-        for drive in shared_drives:
-            # Remember: we're only bothering to get the first 10 files
-            # in the drive that this group has access to (no need to
-            # get *all* files -- we really only care if there are >0
-            # files; we get the first 10 files just as a matter of
-            # course).
-            contents = query_shared_drive_for_reader(service_drive, drive,
-                                                     group['email'], log)
-            if len(contents) > 0:
-                num_drives += 1
-                num_files += len(contents)
-                drives_found.append(drive)
-
-        group['drives'] = {
-            'num files' : num_files,
-            'num drives' : num_drives,
-            'drives found' : drives_found,
-        }
-        if num_files == 0:
-            log.info(f"Did not find any Google Shared Drives readable by {group['email']}")
-        else:
-            log.info(f"Found {num_drives} Google Shared Drives / {num_files} files readable by {group['email']}")
-
-        # Write out the results to a CSV as we go along.  This process
-        # takes a long time, so write out partial results as we go
-        # along, just in case something happens and this script aborts
-        # before it is able to complete the entire
+    # Google API service objects are not thread safe, so make one
+    # Drive service object for each worker thread.
+    drive_api = { 'drive' : apis['drive'] }
+    drive_services = queue.Queue()
+    drive_services.put(service_drive)
+    for _ in range(args.workers - 1):
+        s = GoogleAuth.service_oauth_login(drive_api,
+                                           app_json=args.app_id,
+                                           user_json=args.user_credentials,
+                                           log=log)
+        drive_services.put(s['drive'])
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+        # Get the members of each Google Shared Drive once, up front.
+        def _get_members(drive):
+            service = drive_services.get()
+            try:
+                return find_shared_drive_members(service, drive, log)
+            finally:
+                drive_services.put(service)
+
+        drive_members = dict()
+        if todo:
+            for drive, members in zip(shared_drives,
+                                      executor.map(_get_members, shared_drives)):
+                drive_members[drive['id']] = members
+
+        # For each of the remaining Google Groups, check each shared
+        # drive and see if that Group has read access (which is the
+        # lowest access) to any files in that Google Shared Drive.
+        futures = { executor.submit(audit_group, drive_services,
+                                    shared_drives, drive_members,
+                                    group, log) : group
+                    for group in todo }
+
+        # Save each group's results to the checkpoint file as soon as
+        # it is done.  This process takes a long time, so save
+        # results as we go along, just in case something happens and
+        # this script aborts before it is able to complete the entire
         # (num_groups*num_drives) examination process.
-        write_csv(groups, "partial results", log)
+        with open(args.checkpoint, 'a') as fp:
+            for future in concurrent.futures.as_completed(futures):
+                group = futures[future]
+                group['drives'] = future.result()
+                append_checkpoint(fp, group)
 
-    # Write out the final results.  This should be no different than
-    # the last CSV we wrote, but emit something slightly different for
-    # the log message.
+    # Write out the final results.
     write_csv(groups, "final results", log)
 
+    # The audit is complete; don't let the next audit pick up these
+    # results.
+    os.remove(args.checkpoint)
+    log.info(f"Removed checkpoint file {args.checkpoint}")
+
 if __name__ == '__main__':
     main()
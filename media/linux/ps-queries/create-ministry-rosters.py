@@ -2,6 +2,11 @@
 
 import sys
 import os
+import json
+import queue
+import hashlib
+import threading
+import concurrent.futures
 
 import logging.handlers
 import logging
@@ -18,18 +23,17 @@ sys.path.insert(0, moddir)
 
 import ECC
 import Google
+import ECCUploader
+import ECCXlsxWriter
 import ParishSoftv2 as ParishSoft
 import GoogleAuth
 import googleapiclient
-from google.api_core import retry
 
 from datetime import datetime
 from datetime import timedelta
 
 from oauth2client import tools
-from googleapiclient.http import MediaFileUpload
 
-from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment
 
 from pprint import pprint
@@ -40,6 +44,11 @@ from pprint import pformat
 gapp_id         = 'client_id.json'
 guser_cred_file = 'user-credentials.json'
 
+# Number of processes that write XLSX files, and number of threads
+# that upload them to Google
+xlsx_workers    = os.cpu_count() or 1
+upload_workers  = 4
+
 ministry_sheets = [
     {
         'ministry' : '100-Parish Pastoral Council',
@@ -426,7 +435,68 @@ workgroups = [
 
 ####################################################################
 
-def write_xlsx(members, ministry_name, name, want_birthday, log):
+# Flatten a PS Member into the values that go in each column of its
+# roster row(s).  This is done up front (in the main process) because:
+#
+# - the result is small and cheap to send to the XLSX generation
+#   processes (PS Members are large, and refer to their Families,
+#   which refer to all their Members, ...)
+# - "py ministry role" is overwritten on the Member for each
+#   ministry, so it has to be captured for this roster right now
+# - it's exactly the data that we hash to see if a roster changed
+def roster_entry(m, want_birthday):
+    def _nonempty(values):
+        return [ value for value in values
+                 if value is not None and len(value.strip()) > 0 ]
+
+    # Each Member may take several rows (e.g., the address is on
+    # multiple rows), so make a list of values for each column.
+    cols = list()
+
+    # The name will take 1 row
+    cols.append(_nonempty([m['py friendly name LF']]))
+
+    # The address will take multiple rows
+    f = m['py family']
+    val = '{cs}, {state} {zip}'.format(cs=f['primaryCity'],
+                                       state=f['primaryState'],
+                                       zip=f['primaryPostalCode'])
+    cols.append(_nonempty([f['primaryAddress1'],
+                           f['primaryAddress2'],
+                           val]))
+
+    # The phone / email may be more than 1 row
+    values = list()
+    phones = ParishSoft.get_member_public_phones(m)
+    for phone in phones:
+        values.append('{ph} {type}'.format(ph=phone['number'], type=phone['type']))
+
+    # If we have any preferred emails, list them all
+    email = ParishSoft.get_member_public_email(m)
+    if email is not None:
+        values.append(email)
+    cols.append(_nonempty(values))
+
+    # The birthday will only be 1 row
+    if want_birthday:
+        values = list()
+        key = 'birthdate'
+        if key in m and m[key] is not None:
+            values.append(f'{m[key].strftime("%B")} {m[key].day}')
+        cols.append(_nonempty(values))
+
+    # Role
+    cols.append(_nonempty([m['py ministry role']]))
+
+    return {
+        # 'Name' will be "Last,First..."
+        'sort key' : m['display_FullName'] + " " + str(m['memberDUID']),
+        'columns'  : cols,
+    }
+
+#-------------------------------------------------------------------
+
+def write_xlsx(entries, ministry_name, name, want_birthday, log):
     # Make the microseconds be 0, just for simplicity
     now = datetime.now()
     us = timedelta(microseconds=now.microsecond)
@@ -441,198 +511,314 @@ def write_xlsx(members, ministry_name, name, want_birthday, log):
     filename_base = filename_base.replace("/", "-")
     filename = (f'{filename_base} members as of {timestamp}.xlsx')
 
-    # Put the members in a sortable form (they're currently sorted by MID)
-    sorted_members = dict()
-    for m in members:
-        # 'Name' will be "Last,First..."
-        sorted_members[m['display_FullName'] + " " + str(m['memberDUID'])] = m
-
-    wb = Workbook()
-    ws = wb.active
-
     # Title rows + set column widths
-    title_font = Font(color='FFFF00')
-    title_fill = PatternFill(fgColor='0000FF', fill_type='solid')
-    title_align = Alignment(horizontal='center')
+    styles = {
+        'title' : {
+            'font'      : Font(color='FFFF00'),
+            'fill'      : PatternFill(fgColor='0000FF', fill_type='solid'),
+        },
+        'heading' : {
+            'font'      : Font(color='FFFF00'),
+            'fill'      : PatternFill(fgColor='0000FF', fill_type='solid'),
+            'alignment' : Alignment(horizontal='center'),
+        },
+    }
 
-    last_col = 'D'
-    if want_birthday:
-        last_col = 'E'
-
-    row = 1
-    ws.merge_cells(f'A{row}:{last_col}{row}')
-    cell = f'A{row}'
-    ws[cell] = f'Ministry: {ministry_name}'
-    ws[cell].fill = title_fill
-    ws[cell].font = title_font
-
-    row = row + 1
-    ws.merge_cells(f'A{row}:{last_col}{row}')
-    cell = f'A{row}'
-    ws[cell] = f'Last updated: {now}'
-    ws[cell].fill = title_fill
-    ws[cell].font = title_font
-
-    row = row + 1
-    ws.merge_cells(f'A{row}:{last_col}{row}')
-    cell = f'A{row}'
-    ws[cell] = ''
-    ws[cell].fill = title_fill
-    ws[cell].font = title_font
-
-    row = row + 1
-    columns = [(f'A{row}', 'Member name', 30),
-               (f'B{row}', 'Address', 30),
-               (f'C{row}', 'Phone / email', 50)]
-
-    role = 'D'
+    columns = [('Member name', 30),
+               ('Address', 30),
+               ('Phone / email', 50)]
     if want_birthday:
-        columns.append((f'D{row}', 'Birthday', 30))
-        role = 'E'
-    columns.append((f'{role}{row}', 'Role', 20))
+        columns.append(('Birthday', 30))
+    columns.append(('Role', 20))
+    num_cols = len(columns)
 
-    for cell,value,width in columns:
-        ws[cell] = value
-        ws[cell].fill = title_fill
-        ws[cell].font = title_font
-        ws[cell].alignment = title_align
-        ws.column_dimensions[cell[0]].width = width
+    xlsx = ECCXlsxWriter.XlsxWriter(filename, styles)
 
-    # Freeze the title row
-    row = row + 1
-    ws.freeze_panes = ws[f'A{row}']
+    # Freeze the title rows
+    ws = xlsx.add_sheet(column_widths=[ width for _, width in columns ],
+                        freeze_panes='A5')
 
-    #---------------------------------------------------------------------
-
-    def _append(row, col, value):
-        if value is None or len(value.strip()) == 0:
-            return row
+    ws.append([f'Ministry: {ministry_name}'], style='title', merge_to=num_cols)
+    ws.append([f'Last updated: {now}'], style='title', merge_to=num_cols)
+    ws.append([''], style='title', merge_to=num_cols)
+    ws.append([ value for value, _ in columns ], style='heading')
 
-        _ = ws.cell(row=row, column=col, value=value)
-        return row + 1
+    #---------------------------------------------------------------------
 
     # Data rows
-    for name in sorted(sorted_members):
-        m = sorted_members[name]
-        # The name will take 1 row
-        _ = ws.cell(row=row, column=1, value=m['py friendly name LF'])
-
-        # The address will take multiple rows
-        col = 2
-        last_row = row
-        f = m['py family']
-        last_row = _append(col=col, row=last_row, value=f['primaryAddress1'])
-        last_row = _append(col=col, row=last_row, value=f['primaryAddress2'])
-        val = '{cs}, {state} {zip}'.format(cs=f['primaryCity'],
-                                           state=f['primaryState'],
-                                           zip=f['primaryPostalCode'])
-        last_row = _append(col=col, row=last_row, value=val)
-        addr_last_row = last_row
-        email_last_row = last_row
-
-        # The phone / email may be more than 1 row
-        col = 3
-        last_row = row
-        phones = ParishSoft.get_member_public_phones(m)
-        for phone in phones:
-            val = '{ph} {type}'.format(ph=phone['number'], type=phone['type'])
-            last_row = _append(col=col, row=last_row, value=val)
-
-        # If we have any preferred emails, list them all
-        email = ParishSoft.get_member_public_email(m)
-        if email is not None:
-            last_row = _append(col=col, row=last_row, value=email)
-            email_last_row = last_row
-
-        # The birthday will only be 1 row
-        if want_birthday:
-            col = 4
-            key = 'birthdate'
-            if key in m and m[key] is not None:
-                birthday = f'{m[key].strftime("%B")} {m[key].day}'
-                _append(col=col, row=row, value=birthday)
-
-        # Role
-        col += 1
-        _append(col=col, row=row, value=m['py ministry role'])
-
-        # Between the address / phone+email, find the real last row
-        last_row = max(email_last_row, addr_last_row)
-        row = last_row + 1
+    for entry in sorted(entries, key=lambda entry: entry['sort key']):
+        cols = entry['columns']
+        num_rows = max(1, max(len(values) for values in cols))
+        for i in range(num_rows):
+            ws.append([ values[i] if i < len(values) else None
+                        for values in cols ])
 
     #---------------------------------------------------------------------
 
-    wb.save(filename)
+    xlsx.save()
     log.info(f'Wrote {filename}')
 
     return filename
 
 #-------------------------------------------------------------------
 
-@retry.Retry(predicate=Google.retry_errors)
 def upload_overwrite(filename, google, file_id, log):
     # Strip the trailing ".xlsx" off the Google Sheet name
     gsheet_name = filename
     if gsheet_name.endswith('.xlsx'):
         gsheet_name = gsheet_name[:-5]
-    mime_type = Google.mime_types['sheet']
-    #mime_type = Google.mime_types['xlsx']
 
     try:
         log.info(f'Uploading file update to Google file ID "{file_id}"')
-        metadata = {
-            'name'     : gsheet_name,
-            'mimeType' : Google.mime_types['sheet'],
-            'supportsAllDrives' : True,
-            }
-        media = MediaFileUpload(filename,
-                                mimetype=Google.mime_types['xlsx'],
-                                resumable=True)
-        file = google.files().update(body=metadata,
-                                     fileId=file_id,
-                                     media_body=media,
-                                     supportsAllDrives=True,
-                                     fields='id').execute()
+        file = ECCUploader.upload_file(google, filename,
+                                       mimetype=Google.mime_types['xlsx'],
+                                       google_mimetype=Google.mime_types['sheet'],
+                                       file_id=file_id,
+                                       name=gsheet_name,
+                                       log=log)
         log.debug(f'Successfully updated file: "{filename}" (ID: {file["id"]})')
 
     except Exception as e:
         # When errors occur, we do want to log them.  But we'll re-raise them to
-        # let an upper-level error handler handle them (e.g., retry.Retry() may
-        # actually re-invoke this function if it was a retry-able Google API
-        # error).
+        # let an upper-level error handler handle them.
         log.error('Google file update failed for some reason:')
         log.error(e)
         raise e
 
 #-------------------------------------------------------------------
 
-def _create_roster(ps_members, ministry_name, sheet_name,
-                   birthday, gsheet_id, google, log):
-    members = [ x for x in ps_members.values() ]
+# The roster manifest is a JSON file that records, for each Google
+# Sheet roster, a hash of the data that went into it the last time it
+# was uploaded.  If the hash of the current data for a roster is the
+# same, the roster has not changed, and we skip generating / uploading
+# it.
+#
+# NOTE: This means that the "members as of" timestamp in a roster's
+# name / "Last updated" row is when its data last changed (not when
+# this script last ran).
+
+def load_manifest(filename, force, log):
+    rosters = dict()
+    if not force and os.path.exists(filename):
+        try:
+            with open(filename) as fp:
+                rosters = json.load(fp)
+        except ValueError as e:
+            log.warning(f"Ignoring corrupt roster manifest {filename}: {e}")
+
+    return {
+        'filename' : filename,
+        'rosters'  : rosters,
+    }
+
+def save_manifest(manifest):
+    filename = manifest['filename']
+    tmp_filename = f'{filename}.tmp'
+    with open(tmp_filename, 'w') as fp:
+        json.dump(manifest['rosters'], fp, indent=4, sort_keys=True)
+    os.replace(tmp_filename, filename)
+
+# Hash everything that write_xlsx() puts in the roster.
+def roster_hash(entries, ministry_name, sheet_name, want_birthday):
+    data = [ ministry_name, sheet_name, want_birthday,
+             sorted(entries, key=lambda entry: entry['sort key']) ]
+    s = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(s.encode('utf-8')).hexdigest()
+
+#-------------------------------------------------------------------
+
+# Rosters are made in a pipeline:
+#
+# 1. The main process figures out the members of each roster and
+#    makes a "job" for each roster whose data has changed.
+# 2. A pool of processes writes the XLSX files (CPU bound).
+# 3. A pool of threads uploads the XLSX files to Google (network
+#    bound).
+#
+# Steps 2 and 3 are connected by a bounded queue, so that XLSX
+# generation doesn't get too far ahead of the uploads (and fill the
+# disk with temp XLSX files).
+
+def _add_roster_job(ps_members, ministry_name, sheet_name,
+                    birthday, gsheet_id, manifest, jobs, log):
+    entries = [ roster_entry(m, birthday) for m in ps_members.values() ]
+
+    # If the data for this roster has not changed since we last
+    # uploaded it, there's nothing to do
+    data_hash = roster_hash(entries, ministry_name, sheet_name, birthday)
+    if manifest['rosters'].get(gsheet_id) == data_hash:
+        log.info(f"Roster data unchanged; skipping: {sheet_name}")
+        return
 
-    # Make an xlsx
-    filename = write_xlsx(members=members,
-                          ministry_name=sheet_name,
-                          name=ministry_name,
-                          want_birthday=birthday, log=log)
-    log.debug(f"Wrote temp XLSX file: {filename}")
+    jobs.append({
+        'entries'       : entries,
+        'ministry_name' : ministry_name,
+        'sheet_name'    : sheet_name,
+        'birthday'      : birthday,
+        'gsheet_id'     : gsheet_id,
+        'hash'          : data_hash,
+    })
+
+# A Logger passed to a worker process is re-created there by name
+# only, without any handlers, so anything logged to it would be lost.
+# Instead, the XLSX worker processes log to this handler, and the log
+# records are returned with the result and logged by the main process.
+class _RecordListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = list()
+
+    def emit(self, record):
+        # The records are pickled back to the main process, so format
+        # the message (and any exception) now
+        record.msg  = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        self.records.append(record)
+
+# Runs in an XLSX worker process.  Returns a tuple: (XLSX filename, or
+# None if it could not be written, list of log records)
+def _generate_roster(job, level):
+    handler = _RecordListHandler()
+    log = logging.getLogger('ECC.roster-worker')
+    log.handlers  = [ handler ]
+    log.propagate = False
+    log.setLevel(level)
 
-    # Upload the xlsx to Google
-    upload_overwrite(filename=filename, google=google, file_id=gsheet_id,
-                     log=log)
-    log.debug("Uploaded XLSX file to Google")
+    try:
+        filename = write_xlsx(entries=job['entries'],
+                              ministry_name=job['sheet_name'],
+                              name=job['ministry_name'],
+                              want_birthday=job['birthday'], log=log)
+    except Exception:
+        log.exception(f"Failed to write XLSX for roster {job['sheet_name']}")
+        filename = None
+
+    return filename, handler.records
+
+def _upload_rosters(uploads, services, manifest, manifest_lock, errors, log):
+    # Google API service objects are not thread safe, so each upload
+    # thread takes its own
+    google = services.get()
+
+    while True:
+        job = uploads.get()
+        if job is None:
+            break
+
+        filename = job['filename']
+        try:
+            upload_overwrite(filename=filename, google=google,
+                             file_id=job['gsheet_id'], log=log)
+            log.debug(f"Uploaded XLSX file to Google: {filename}")
+
+            # Record that this roster is up to date
+            with manifest_lock:
+                manifest['rosters'][job['gsheet_id']] = job['hash']
+                save_manifest(manifest)
+        except Exception:
+            # upload_overwrite() already logged the error.  Keep going
+            # with the rest of the rosters; main() will exit with an
+            # error at the end.
+            errors.append(job['sheet_name'])
+
+        # Remove the temp local XLSX file
+        try:
+            os.unlink(filename)
+            log.debug("Unlinked temp XLSX file")
+        except Exception as e:
+            log.info("Failed to unlink temp XLSX file!")
+            log.error(e)
+
+    services.put(google)
+
+# "services" is a queue of Google Drive service objects, one for each
+# upload thread.  Returns a list of the names of the rosters that
+# failed to be written or uploaded.
+def build_rosters(jobs, services, manifest, num_xlsx_workers,
+                  num_upload_workers, log):
+    if len(jobs) == 0:
+        log.info("No rosters have changed")
+        return []
+
+    log.info(f"Making {len(jobs)} rosters")
+
+    uploads       = queue.Queue(maxsize=2 * num_upload_workers)
+    manifest_lock = threading.Lock()
+    errors        = list()
+
+    threads = [ threading.Thread(target=_upload_rosters,
+                                 args=(uploads, services, manifest,
+                                       manifest_lock, errors, log))
+                for _ in range(num_upload_workers) ]
+
+    # Only keep a window of jobs in flight; more are submitted as XLSX
+    # files are handed off to the upload threads (which blocks when the
+    # upload queue is full).
+    pending = dict()
+    todo    = iter(jobs)
+    window  = 2 * num_xlsx_workers
+
+    def _submit(executor):
+        for job in todo:
+            future = executor.submit(_generate_roster, job,
+                                     log.getEffectiveLevel())
+            pending[future] = job
+            if len(pending) >= window:
+                break
 
-    # Remove the temp local XLSX file
     try:
-        os.unlink(filename)
-        log.debug("Unlinked temp XLSX file")
-    except Exception as e:
-        log.info("Failed to unlink temp XLSX file!")
-        log.error(e)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=num_xlsx_workers) as executor:
+            # Submitting the first jobs starts the worker processes.
+            # Start the upload threads after that so that we don't
+            # fork while other threads are running.
+            _submit(executor)
+            for thread in threads:
+                thread.start()
+
+            while len(pending) > 0:
+                done, _ = concurrent.futures.wait(pending,
+                                                  return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    job = pending.pop(future)
+                    try:
+                        job['filename'], records = future.result()
+                    except Exception as e:
+                        # E.g., the worker process died
+                        log.error(f"Failed to write XLSX for roster {job['sheet_name']}: {e}")
+                        job['filename'], records = None, []
+
+                    for record in records:
+                        log.handle(record)
+
+                    if job['filename'] is None:
+                        # Keep going with the rest of the rosters;
+                        # main() will exit with an error at the end.
+                        errors.append(job['sheet_name'])
+                        continue
+
+                    log.debug(f"Wrote temp XLSX file: {job['filename']}")
+                    uploads.put(job)
+
+                _submit(executor)
+
+    finally:
+        # Tell the upload threads that there's nothing more coming,
+        # and wait for them to finish what's already in the queue
+        for thread in threads:
+            if thread.is_alive():
+                uploads.put(None)
+        for thread in threads:
+            if thread.ident is not None:
+                thread.join()
+
+    return errors
 
 #-------------------------------------------------------------------
 
-def create_ministry_roster(ps_members, ps_ministries, ministry_sheet, google, log):
+def create_ministry_roster(ps_members, ps_ministries, ministry_sheet, manifest, jobs, log):
     log.info(f"Making ministry roster for: {ministry_sheet}")
     gsheet_id = ministry_sheet['gsheet_id']
     birthday  = ministry_sheet['birthday']
@@ -683,8 +869,8 @@ def create_ministry_roster(ps_members, ps_ministries, ministry_sheet, google, lo
     if members is None or len(members) == 0:
         log.info(f"No members in ministry: {sheet_name} -- writing empty sheet")
 
-    _create_roster(members, name, sheet_name,
-                   birthday, gsheet_id, google, log)
+    _add_roster_job(members, name, sheet_name,
+                    birthday, gsheet_id, manifest, jobs, log)
 
     # Are there any sub-sheets to create?
     key = 'role sheets'
@@ -702,12 +888,12 @@ def create_ministry_roster(ps_members, ps_ministries, ministry_sheet, google, lo
         gsheet_id = role_sheet['gsheet_id']
         name = role_sheet['name']
         sheet_name = name
-        _create_roster(role_members, name, sheet_name,
-                    birthday, gsheet_id, google, log)
+        _add_roster_job(role_members, name, sheet_name,
+                        birthday, gsheet_id, manifest, jobs, log)
 
 #-------------------------------------------------------------------
 
-def create_workgroup_roster(ps_members, ps_mem_workgroups, workgroup_sheet, google, log):
+def create_workgroup_roster(ps_members, ps_mem_workgroups, workgroup_sheet, manifest, jobs, log):
     log.info(f"Making roster for Member Workgroup: {workgroup_sheet}")
     gsheet_id = workgroup_sheet['gsheet_id']
     birthday  = workgroup_sheet['birthday']
@@ -755,8 +941,8 @@ def create_workgroup_roster(ps_members, ps_mem_workgroups, workgroup_sheet, goog
     if members is None or len(members) == 0:
         log.info(f"No members in ministry: {sheet_name} -- writing empty sheet")
 
-    _create_roster(members, wg_name, wg_name,
-                   birthday, gsheet_id, google, log)
+    _add_roster_job(members, wg_name, wg_name,
+                    birthday, gsheet_id, manifest, jobs, log)
 
 ####################################################################
 
@@ -775,6 +961,22 @@ def setup_cli_args():
                                  default='.',
                                  help='Directory to cache the ParishSoft data')
 
+    tools.argparser.add_argument('--manifest',
+                                 help='JSON file recording the data last uploaded to each roster (default: roster-manifest.json in the ParishSoft cache dir)')
+    tools.argparser.add_argument('--force',
+                                 action='store_true',
+                                 default=False,
+                                 help='Regenerate and upload all rosters, even if their data has not changed')
+
+    tools.argparser.add_argument('--xlsx-workers',
+                                 type=int,
+                                 default=xlsx_workers,
+                                 help=f'Number of processes to write XLSX rosters (default: {xlsx_workers})')
+    tools.argparser.add_argument('--upload-workers',
+                                 type=int,
+                                 default=upload_workers,
+                                 help=f'Number of concurrent uploads to Google (default: {upload_workers})')
+
     global gapp_id
     tools.argparser.add_argument('--app-id',
                                  default=gapp_id,
@@ -793,6 +995,9 @@ def setup_cli_args():
     with open(args.ps_api_keyfile) as fp:
         args.api_key = fp.read().strip()
 
+    if args.manifest is None:
+        args.manifest = os.path.join(args.ps_cache_dir, 'roster-manifest.json')
+
     return args
 
 ####################################################################
@@ -824,21 +1029,44 @@ def main():
                                               app_json=args.app_id,
                                               user_json=args.user_credentials,
                                               log=log)
-    google = services['drive']
 
+    # Google API service objects are not thread safe, so make one
+    # Drive service object for each upload thread.
+    drive_services = queue.Queue()
+    drive_services.put(services['drive'])
+    for _ in range(args.upload_workers - 1):
+        s = GoogleAuth.service_oauth_login(apis,
+                                           app_json=args.app_id,
+                                           user_json=args.user_credentials,
+                                           log=log)
+        drive_services.put(s['drive'])
+
+    manifest = load_manifest(args.manifest, args.force, log)
+
+    jobs = list()
     for sheet in ministry_sheets:
         create_ministry_roster(ps_members=members,
                                ps_ministries=ministries,
                                ministry_sheet=sheet,
-                               google=google,
+                               manifest=manifest,
+                               jobs=jobs,
                                log=log)
 
     for sheet in workgroups:
         create_workgroup_roster(ps_members=members,
                                 ps_mem_workgroups=member_workgroups,
                                 workgroup_sheet=sheet,
-                                google=google,
+                                manifest=manifest,
+                                jobs=jobs,
                                 log=log)
 
+    errors = build_rosters(jobs, drive_services, manifest,
+                           num_xlsx_workers=args.xlsx_workers,
+                           num_upload_workers=args.upload_workers,
+                           log=log)
+    if len(errors) > 0:
+        log.error(f"Failed to upload {len(errors)} rosters: {', '.join(errors)}")
+        exit(1)
+
 if __name__ == '__main__':
     main()
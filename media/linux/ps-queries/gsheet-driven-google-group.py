@@ -11,6 +11,11 @@ This script downloads the sheet, finds the row with the most recently-past date,
 and sets the membership of the Google Group to the comma-delimited list of email
 addresses on that row.
 
+The parsed, date-sorted schedule from each Google Sheet is cached locally
+(see --cache-dir), along with the sheet's Google Drive version number.  On
+each run, the sheet's version is checked first; the sheet is only
+re-downloaded if it has been modified since it was cached.
+
 For any email address that is added to the group, they get a "You have been
 added!" email notifying them of that fact.  Similarly, for any email address
 that is removed from the group, they get a "You have been removed" email.
@@ -22,6 +27,7 @@ import sys
 import csv
 import json
 import time
+import bisect
 import argparse
 import httplib2
 import datetime
@@ -58,6 +64,7 @@ guser_cred_file = 'user-credentials-ppc-feedback.json'
 verbose         = True
 debug           = False
 logfile         = None
+cache_dir       = 'gsheet-cache'
 
 groups = [
     {
@@ -225,7 +232,9 @@ def google_group_find_members(google, google_group, log):
 
     return group_members
 
-# Find the row from the spreadsheet that pertains to now
+# Find the row from the spreadsheet that pertains to now.  The sheet
+# data is sorted by date, so binary search its list of dates for the
+# last row that is on or before today.
 def find_desired(sheet_data, log):
     today   = datetime.datetime.now().date()
     desired = {
@@ -233,15 +242,15 @@ def find_desired(sheet_data, log):
         'emails' : '',
     }
 
-    for row in sheet_data:
-        if row['date'] > desired['date'] and row['date'] <= today:
-            desired = row
+    index = bisect.bisect_right(sheet_data['dates'], today)
+    if index > 0:
+        desired = sheet_data['rows'][index - 1]
 
     log.debug(f"Found desired: {desired}")
     return desired
 
 # Download the data from Google Sheet, and convert all the dates to
-# Python datetime.date's
+# Python datetime.date's.  The result is sorted by date.
 def download_google_sheet(google, gfile, log):
     log.info(f"Downloading Sheet {gfile}...")
 
@@ -253,7 +262,7 @@ def download_google_sheet(google, gfile, log):
 
     csv_content = _download_csv_sheet()
 
-    out       = list()
+    out       = dict()
     fakefile  = StringIO(csv_content.decode('utf-8'))
     csvreader = csv.reader(fakefile)
     for row in csvreader:
@@ -272,14 +281,71 @@ def download_google_sheet(google, gfile, log):
 
         try:
             date = dateutil_parse(date_str).date()
-            out.append({
-                'date'   : dateutil_parse(date_str).date(),
-                'emails' : email_str,
-            })
         except Exception as e:
             log.warning(f'Cannot parse date "{date_str}"; skipping')
+            continue
+
+        # If the same date is listed more than once, the first row
+        # wins.
+        if date not in out:
+            out[date] = {
+                'date'   : date,
+                'emails' : email_str,
+            }
+
+    return [ out[date] for date in sorted(out) ]
+
+@retry.Retry(predicate=Google.retry_errors)
+def get_google_sheet_version(google, gfile, log):
+    response = google.files().get(fileId=gfile,
+                                  fields='version,modifiedTime',
+                                  supportsAllDrives=True).execute()
+    log.debug(f"Sheet {gfile} is version {response['version']}, modified {response['modifiedTime']}")
+    return response['version']
+
+# The sheet data used by find_desired(): the rows sorted by date, and
+# the list of just their dates (for binary searching).
+def _sheet_data(rows):
+    return {
+        'rows'  : rows,
+        'dates' : [ row['date'] for row in rows ],
+    }
+
+# Return the sorted sheet data (see _sheet_data()), either from the
+# local cache (if the Google Sheet has not changed since it was
+# cached) or by downloading the Google Sheet (and then updating the
+# cache).
+def get_google_sheet_data(google, gfile, cache_dir, log):
+    version  = get_google_sheet_version(google, gfile, log)
+    filename = os.path.join(cache_dir, f'{gfile}.json')
+
+    if os.path.exists(filename):
+        try:
+            with open(filename) as fp:
+                cache = json.load(fp)
+            if cache['version'] == version:
+                log.info(f"Sheet {gfile} has not changed; using cached data")
+                return _sheet_data([ { 'date'   : datetime.date.fromisoformat(date),
+                                       'emails' : emails }
+                                     for date, emails in cache['schedule'] ])
+        except (ValueError, KeyError) as e:
+            log.warning(f"Ignoring corrupt cache file {filename}: {e}")
+
+    rows = download_google_sheet(google, gfile, log)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    cache = {
+        'version'  : version,
+        'schedule' : [ [ row['date'].isoformat(), row['emails'] ]
+                       for row in rows ],
+    }
+    tmp_filename = f'{filename}.tmp'
+    with open(tmp_filename, 'w') as fp:
+        json.dump(cache, fp)
+    os.replace(tmp_filename, filename)
+    log.debug(f"Wrote cache file {filename}")
 
-    return out
+    return _sheet_data(rows)
 
 ####################################################################
 #
@@ -318,6 +384,9 @@ def setup_cli_args():
     tools.argparser.add_argument('--logfile',
                                  default=logfile,
                                  help='Store verbose/debug logging to the specified file')
+    tools.argparser.add_argument('--cache-dir',
+                                 default=cache_dir,
+                                 help='Directory in which to cache the parsed Google Sheet data')
 
     global args
     args = tools.argparser.parse_args()
@@ -361,7 +430,8 @@ def main():
 
     for item in groups:
         log.info(f"Synchronizing: {item['name']}")
-        sheet_data = download_google_sheet(service_drive, item['gsheet_id'], log)
+        sheet_data = get_google_sheet_data(service_drive, item['gsheet_id'],
+                                           args.cache_dir, log)
         desired    = find_desired(sheet_data, log)
         current    = google_group_find_members(service_admin, item['group'], log)
 
@@ -30,14 +30,14 @@ sys.path.insert(0, moddir)
 
 import ECC
 import Google
+import ECCUploader
+import ECCXlsxWriter
 
 from pydrive2.auth import GoogleAuth
 from pydrive2.drive import GoogleDrive
 
 import openpyxl
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
+from openpyxl.styles import Font, PatternFill
 
 ###########################################################
 
@@ -309,20 +309,14 @@ def compute_deltas(log, depts):
 
 # Writes the deltas to an XLSX
 def write_to_xlsx(log, fields, depts, filename, timestamp_first, timestamp_last):
-    wb = Workbook()
-    ws = wb.active
-
-    # Reserve some blank rows for the titles
     titles = [
         'Ricoh printer counts by department',
         # "None" renders the timestamp in the local timezone, and
         # ctime() puts it in a pleasing human-readable format.
         f'{timestamp_first.astimezone(None).ctime()} through {timestamp_last.astimezone(None).ctime()}',
     ]
-    for i in range(len(titles) + 1):
-        ws.append([])
 
-    # Add a row of the column names
+    # Make a row of the column names
     column_names = [ 'Department', 'Name', 'Start', 'End' ]
     first_dept = list(depts.values())[0]
     item = first_dept['deltas']
@@ -337,18 +331,14 @@ def write_to_xlsx(log, fields, depts, filename, timestamp_first, timestamp_last)
             if field == 'bwTotal' or field == 'colorTotal':
                 column_names.append(f'% of overall {field}')
 
-    ws.append(column_names)
-
-    # Get the last row number.  The next row is the first row of data.
-    for row in ws.rows:
-        # row is a tuple of cells
-        cell = row[0]
-        last_row = cell.row
-    first_data_row = last_row + 1
+    # The titles are followed by a blank row and then the column
+    # names.  The next row is the first row of data.
+    first_data_row = len(titles) + 2 + 1
     last_data_row = first_data_row + len(depts.keys()) - 1
 
-    # Now add a row for each set of delta data
+    # Now make a row for each set of delta data
     row = first_data_row
+    rows = list()
     percentage_cols = list()
     for dept_id in sorted(depts.keys()):
         item  = depts[dept_id]
@@ -374,56 +364,48 @@ def write_to_xlsx(log, fields, depts, filename, timestamp_first, timestamp_last)
                     value = f'={col_letter}{row}/sum({col_letter}{first_data_row}:{col_letter}{last_data_row})'
                     data.append(value)
 
-                    col_letter = chr(ord('A') + len(data) - 1)
-                    if col_letter not in percentage_cols:
-                        percentage_cols.append(col_letter)
+                    col = len(data) - 1
+                    if col not in percentage_cols:
+                        percentage_cols.append(col)
 
-        ws.append(data)
+        rows.append(data)
         row += 1
 
-    # automatically adjusts the width of every column to fit the data in it
-    dims = dict()
-    for row in ws.rows:
-        for cell in row:
-            if cell.value:
-                dims[cell.column_letter] = max((dims.get(cell.column_letter, 0), len(str(cell.value))))+.5
-    for col, value in dims.items():
-        ws.column_dimensions[col].width = value
-
-    # Get the last column letter
-    for cell in ws[1]:
-        last_col = cell.column_letter
-
-    # Get the last row number
-    for row in ws.rows:
-        # row is a tuple of cells
-        cell = row[0]
-        last_row = cell.row
-
-    # Set the title rows to a nice value
-    for row, title in enumerate(titles):
-        ws.merge_cells(f'A{row+1}:{last_col}{row+1}')
-        ws[f'A{row+1}'] = title
-
-    # Set the first several rows to be a specific font/color
-    title_font = Font(color='FAFAF9')
-    title_fill = PatternFill(fgColor='228B22', fill_type='solid')
-    title_align = Alignment(horizontal='center')
-
-    # Set the two percentage columns to have "Percent" formats
-    for col in percentage_cols:
-        for row in range(first_data_row, last_row + 1):
-            address = f'{col}{row}'
-            ws[address].style = 'Percent'
+    # Size the width of every column to fit the data in it (the
+    # titles are merged across all the columns, so they don't count)
+    widths = [ 0 ] * len(column_names)
+    for data in [ column_names ] + rows:
+        for col, value in enumerate(data):
+            if value:
+                widths[col] = max(widths[col], len(str(value)) + .5)
+
+    # Set the title rows to be a specific font/color, and the two
+    # percentage columns to have "Percent" formats
+    styles = {
+        'title' : {
+            'font'      : Font(color='FAFAF9'),
+            'fill'      : PatternFill(fgColor='228B22', fill_type='solid'),
+        },
+        'percentage' : {
+            'number_format' : '0%',
+        },
+    }
+
+    xlsx = ECCXlsxWriter.XlsxWriter(filename, styles)
+    ws = xlsx.add_sheet(column_widths=widths)
 
     # We color all the title rows, the blank row after the titles, and
     # the row with all the column headings
-    for row in ws.iter_rows(min_row=1, max_row=len(titles) + 2):
-        for cell in row:
-            cell.fill = title_fill
-            cell.font = title_font
+    for title in titles:
+        ws.append([ title ], style='title', merge_to=len(column_names))
+    ws.append([ None ] * len(column_names), style='title')
+    ws.append(column_names, style='title')
 
-    wb.save(filename)
+    percentage_styles = { col : 'percentage' for col in percentage_cols }
+    for data in rows:
+        ws.append(data, styles=percentage_styles)
+
+    xlsx.save()
     log.info(f"Wrote {filename}")
 
 ###########################################################
@@ -512,15 +494,13 @@ def upload_to_google(drive, timestamp, args, log):
     basename = os.path.basename(args.xlsx)
     if basename.endswith('.xlsx'):
         basename = basename[:-5]
-    metadata = {
-        'title'    : basename,
-        'mimeType' : Google.mime_types['xlsx'],
-        'parents'  : [ {'id': year_folder['id'] } ],
-    }
-
-    file = drive.CreateFile(metadata)
-    file.SetContentFile(args.xlsx)
-    file.Upload({'convert' : True})
+    service = ECCUploader.pydrive_service(drive)
+    file = ECCUploader.upload_file(service, args.xlsx,
+                                   mimetype=Google.mime_types['xlsx'],
+                                   google_mimetype=Google.mime_types['sheet'],
+                                   folder_id=year_folder['id'],
+                                   name=basename,
+                                   log=log)
 
     log.info(f'Successfully uploaded Google file: "{basename}" (ID: {file["id"]})')
 
@@ -21,6 +21,7 @@ sys.path.insert(0, moddir)
 
 import ECC
 import Google
+import ECCUploader
 
 import re
 import time
@@ -137,15 +138,16 @@ def google_login():
 def google_upload_file(drive, dest_folder, upload_filename):
     log.debug(f'Uploading GTD file "{upload_filename}" (parent: {dest_folder["id"]})')
     basename = os.path.basename(upload_filename)
-    metadata = {
-        'title'    : basename,
-        'mimeType' : Google.mime_types['mp3'],
-        'parents'  : [ {'id': dest_folder['id']} ],
-    }
 
-    file = drive.CreateFile(metadata)
-    file.SetContentFile(upload_filename)
-    file.Upload()
+    # Save the resumable upload state in the data dir so that if we
+    # die in the middle of uploading a large MP3, the next run picks
+    # up where this one left off.
+    service = ECCUploader.pydrive_service(drive)
+    file = ECCUploader.upload_file(service, upload_filename,
+                                   mimetype=Google.mime_types['mp3'],
+                                   folder_id=dest_folder['id'],
+                                   state_dir=os.path.join(args.data_dir, 'uploads'),
+                                   log=log)
 
     log.debug(f'Successfully uploaded GTD file: "{basename}" (ID: {file["id"]})')
 
@@ -284,7 +286,7 @@ def google_upload_files(drive, shared_drive, scanned_files):
             gtdfile.folder_webviewlink = folder['alternateLink']
 
             uploaded_file = google_upload_file(drive, folder, src_filename)
-            gtdfile.file_webviewlink = uploaded_file['alternateLink']
+            gtdfile.file_webviewlink = uploaded_file['webViewLink']
 
             log.info(f"Uploaded {file.filename} to GTD successfully")
 
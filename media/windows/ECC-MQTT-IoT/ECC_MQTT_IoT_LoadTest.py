@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+
+"""
+    Load generator / benchmark for the ECC MQTT IoT listener (ECC_MQTT_IoT_SQLite.py).
+
+    This routine will feed synthetic temperature / humidity sensor messages to the listener's
+    on_message handler at a configurable rate and number of sensors, and report the sustained
+    number of messages per second recorded, the commit latency, and the database growth.  It
+    does not need any real sensors; by default, the messages are passed directly to the
+    listener's on_message handler in this process, so it does not need an MQTT broker either.
+    If a broker address is specified, the messages are instead published to the broker (e.g.,
+    a local Mosquitto) and received by the listener's handlers through a subscribed client, as
+    they are in production.
+
+    The database (and log) are written to a scratch directory, which is left in place after
+    the run so that the results can be examined.
+
+    Examples:
+
+        python ECC_MQTT_IoT_LoadTest.py --sensors 50 --rate 2000 --duration 30
+        python ECC_MQTT_IoT_LoadTest.py --messages 100000 --rate 0 --log_level INFO
+        python ECC_MQTT_IoT_LoadTest.py --broker 127.0.0.1 --rate 500 --duration 60
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# Parse the command line arguments for the load to generate
+parser = argparse.ArgumentParser(description='''Epiphany Catholic Church MQTT IoT Listener load generator.
+                                            This routine will feed synthetic sensor messages to the
+                                            listener and report the message throughput, commit latency,
+                                            and database growth.''')
+parser.add_argument("--sensors", type=int, default=20,
+                    help="number of simulated sensors")
+parser.add_argument("--rate", type=float, default=1000,
+                    help="messages per second to generate, across all sensors (0 for as fast as possible)")
+parser.add_argument("--duration", type=float, default=10,
+                    help="seconds to generate messages for (ignored if --messages is specified)")
+parser.add_argument("--messages", type=int, default=None,
+                    help="total number of messages to generate")
+parser.add_argument("--work_dir", default=None,
+                    help="directory for the database and log (default is a new temporary directory)")
+parser.add_argument("--db_batch_size", type=int, default=500,
+                    help="listener database batch size")
+parser.add_argument("--db_batch_seconds", type=float, default=1.0,
+                    help="listener database batch time, in seconds")
+parser.add_argument("--log_level", default="DEBUG", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                    help="listener log level (the listener logs at DEBUG in production)")
+parser.add_argument("--show_output", action="store_true",
+                    help="show the listener's console output (one line per message)")
+parser.add_argument("--report_interval", type=float, default=5,
+                    help="seconds between progress reports")
+parser.add_argument("-b", "--broker", default=None,
+                    help="MQTT broker address; if specified, messages are published through the broker "
+                         "instead of being passed directly to the listener")
+parser.add_argument("--port", type=int, default=1883,
+                    help="MQTT broker port")
+parser.add_argument("-c", "--credentials_file_path", default=None,
+                    help="MQTT user/pass credentials filename path, if the broker requires it")
+
+args = parser.parse_args()
+
+work_dir = args.work_dir or tempfile.mkdtemp(prefix="ECCMQTTIoT-loadtest-")
+os.makedirs(work_dir, exist_ok=True)
+database_file_path = os.path.join(work_dir, "ECCTempHum.sqlite3")
+log_file_path = os.path.join(work_dir, "ECCMQTTIoT.log")
+
+# Keep a handle on the real console; the listener redirects stderr to its log when it is
+# imported, and stdout is discarded while the test runs (unless --show_output).
+console = sys.__stdout__
+
+# The listener parses its own command line (and sets up its logging) when it is imported,
+# so give it the settings for this run
+listener_argv = [sys.argv[0],
+                 "-d", database_file_path,
+                 "-l", log_file_path,
+                 "--db_batch_size", str(args.db_batch_size),
+                 "--db_batch_seconds", str(args.db_batch_seconds)]
+if args.broker:
+    listener_argv += ["-b", args.broker]
+if args.credentials_file_path:
+    listener_argv += ["-c", args.credentials_file_path]
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+saved_argv = sys.argv
+sys.argv = listener_argv
+import ECC_MQTT_IoT_SQLite as listener
+sys.argv = saved_argv
+
+listener.logger.setLevel(args.log_level)
+
+
+class TimedDatabaseWriter(listener.DatabaseWriter):
+    """
+    The listener's database writer, timing each batch written and committed, and the time
+    each message waited from being received to being committed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commit_times = []
+        self.message_latencies = []
+        self.messages_committed = 0
+        self.last_commit = None
+
+    def write_partition_batch(self, month, batch):
+        start = time.perf_counter()
+        super().write_partition_batch(month, batch)
+        self.commit_times.append(time.perf_counter() - start)
+
+        committed = datetime.utcnow()
+        self.message_latencies.extend((committed - msg_time).total_seconds()
+                                      for topic, mqtt_msg, msg_time in batch)
+        self.messages_committed += len(batch)
+        self.last_commit = time.monotonic()
+
+
+class SyntheticMessage(object):
+    """
+    Stand-in for a Paho MQTT message, as passed to the on_message handler.
+    """
+
+    def __init__(self, payload):
+        self.topic = "ECCTempHum"
+        self.qos = 0
+        self.payload = payload
+
+
+def sensor_payload(sensor_idx):
+    """
+    Return a synthetic message payload for the passed sensor, in the format published by the
+    current sensor code (sensor readings, followed by the sensor ID data).
+    """
+
+    temperature = random.uniform(60, 80)
+    humidity = random.uniform(30, 60)
+    return (F"field1={temperature - (100 - humidity) / 5:.2f}"
+            F"&field2={temperature:.2f}"
+            F"&field3={humidity:.2f}"
+            F"&field4={random.uniform(3.3, 4.2):.2f}"
+            F"&field5={random.uniform(50, 100):.2f}"
+            F"&field6={random.randint(-90, -40)}"
+            F"&field7=ECCLT{sensor_idx:03d}"
+            F"&field8=Load test {sensor_idx}"
+            F"&field9=02:00:00:00:{sensor_idx // 256:02X}:{sensor_idx % 256:02X}"
+            F"&field10=v03.10").encode("utf-8")
+
+
+def database_bytes():
+    """
+    Return the total size of the database partitions written by this run (including any
+    write-ahead logs).
+    """
+
+    total = 0
+    for month, partition in listener.list_partitions(database_file_path, [work_dir]):
+        for path in (partition, partition + "-wal"):
+            if os.path.exists(path):
+                total += os.path.getsize(path)
+    return total
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def connect_broker():
+    """
+    Connect a subscriber client, using the listener's handlers, and a publisher client to the
+    broker.
+    :return:    subscriber client, publisher client
+    """
+
+    import paho.mqtt.client as mqtt
+
+    clients = []
+    for on_connect in (listener.on_connect, None):
+        mqttc = mqtt.Client()
+        if on_connect:
+            mqttc.on_connect = on_connect
+            mqttc.on_message = listener.on_message
+            mqttc.on_subscribe = listener.on_subscribe
+        if args.credentials_file_path:
+            mqtt_user, mqtt_pass = listener.get_credentials()
+            mqttc.username_pw_set(mqtt_user, password=mqtt_pass)
+        mqttc.connect(args.broker, args.port, 60)
+        mqttc.loop_start()
+        clients.append(mqttc)
+
+    # Give the subscriber time to subscribe before publishing
+    time.sleep(2)
+    return clients
+
+
+def report_progress(writer, stop_event, stats):
+    last_time = time.monotonic()
+    last_committed = 0
+    while not stop_event.wait(args.report_interval):
+        now = time.monotonic()
+        committed = writer.messages_committed
+        backlog = writer.messages.qsize()
+        stats["max_backlog"] = max(stats["max_backlog"], backlog)
+        print(F"  {listener.recvd_message_cnt} received, "
+              F"{(committed - last_committed) / (now - last_time):.0f} messages/s committed, "
+              F"{backlog} waiting, "
+              F"database {database_bytes() / 1048576:.1f} MB",
+              file=console, flush=True)
+        last_time = now
+        last_committed = committed
+
+
+def main():
+    print(F"ECC MQTT IoT listener load test, listener version {listener.eccmqtt_iot_version}", file=console)
+    print(F"  work directory:  {work_dir}", file=console)
+    print(F"  sensors:         {args.sensors}", file=console)
+    print(F"  rate:            {args.rate or 'unlimited'} messages/s", file=console)
+    print(F"  batch size/time: {args.db_batch_size} / {args.db_batch_seconds}s", file=console)
+    print(F"  log level:       {args.log_level}", file=console)
+    print(F"  via:             {'broker ' + args.broker if args.broker else 'on_message (in process)'}",
+          file=console, flush=True)
+
+    # The listener's main() would normally set these up
+    listener.recvd_message_cnt = 0
+    listener.database_records_written = 0
+    listener.received_msg = False
+    writer = TimedDatabaseWriter(database_file_path, args.db_batch_size, args.db_batch_seconds)
+    listener.db_writer = writer
+
+    if args.messages is not None:
+        total_messages = args.messages
+    elif args.rate:
+        total_messages = int(args.rate * args.duration)
+    else:
+        sys.exit("--messages must be specified if --rate is 0")
+
+    db_bytes_start = database_bytes()
+    stats = {"max_backlog": 0}
+    stop_event = threading.Event()
+    progress = threading.Thread(target=report_progress, args=(writer, stop_event, stats), daemon=True)
+
+    if args.show_output:
+        output = contextlib.nullcontext(sys.stdout)
+    else:
+        output = open(os.devnull, "w")
+    with output as out, contextlib.redirect_stdout(out):
+        writer.start()
+        if args.broker:
+            subscriber, publisher = connect_broker()
+
+        progress.start()
+        start = time.monotonic()
+        for msg_idx in range(total_messages):
+            # Pace the messages to the requested rate
+            if args.rate:
+                ahead = start + msg_idx / args.rate - time.monotonic()
+                if ahead > 0.001:
+                    time.sleep(ahead)
+
+            if msg_idx % 1000 == 0:
+                stats["max_backlog"] = max(stats["max_backlog"], writer.messages.qsize())
+
+            payload = sensor_payload(msg_idx % args.sensors)
+            if args.broker:
+                publisher.publish("ECCTempHum", payload, qos=0)
+            else:
+                listener.on_message(None, None, SyntheticMessage(payload))
+        sent_time = time.monotonic() - start
+
+        if args.broker:
+            # Wait for the broker to deliver the messages published (some may be dropped at
+            # QoS 0 if the broker's queue fills), then stop the clients
+            received = -1
+            while received != listener.recvd_message_cnt:
+                received = listener.recvd_message_cnt
+                time.sleep(2)
+            publisher.loop_stop()
+            publisher.disconnect()
+            subscriber.loop_stop()
+            subscriber.disconnect()
+
+        # Write whatever is still waiting, and close the database
+        writer.stop()
+        stop_event.set()
+
+    elapsed = (writer.last_commit or time.monotonic()) - start
+    db_growth = database_bytes() - db_bytes_start
+    rows = sum(row[0] for row in listener.query_partitions("SELECT count(*) FROM ECCTempHum"))
+
+    print("\nResults:", file=console)
+    print(F"  messages sent:           {total_messages} in {sent_time:.1f}s "
+          F"({total_messages / max(0.001, sent_time):.0f} messages/s offered)", file=console)
+    print(F"  messages received:       {listener.recvd_message_cnt}", file=console)
+    print(F"  messages committed:      {writer.messages_committed} in {elapsed:.1f}s "
+          F"({writer.messages_committed / max(0.001, elapsed):.0f} messages/s sustained)", file=console)
+    print(F"  records written:         {listener.database_records_written} "
+          F"({rows} sensor readings in the database)", file=console)
+    print(F"  maximum backlog:         {stats['max_backlog']} messages "
+          F"({writer.messages_dropped} dropped with the backlog full)", file=console)
+    print(F"  batches committed:       {len(writer.commit_times)} "
+          F"(average {writer.messages_committed / max(1, len(writer.commit_times)):.0f} messages)",
+          file=console)
+    print(F"  batch write+commit time: "
+          F"median {percentile(writer.commit_times, 50) * 1000:.1f}ms, "
+          F"95% {percentile(writer.commit_times, 95) * 1000:.1f}ms, "
+          F"max {max(writer.commit_times, default=0) * 1000:.1f}ms", file=console)
+    print(F"  received to committed:   "
+          F"median {percentile(writer.message_latencies, 50) * 1000:.1f}ms, "
+          F"95% {percentile(writer.message_latencies, 95) * 1000:.1f}ms, "
+          F"max {max(writer.message_latencies, default=0) * 1000:.1f}ms", file=console)
+    print(F"  database growth:         {db_growth / 1048576:.2f} MB "
+          F"({db_growth / max(1, writer.messages_committed):.0f} bytes/message)", file=console)
+    print(F"  database / log:          {work_dir}", file=console, flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -73,6 +73,30 @@
     added to a new table in the database, but only if the data changes from the
     last-recorded information.
             Modified by DK Fowler ... 18-Dec-2020           --- v02.30
+
+    Moved all database writes to a single background writer thread.  The MQTT message
+    callback now only queues the received message; the writer thread keeps one connection
+    to the database open (in WAL mode), remembers which tables already exist, re-uses the
+    INSERT statement for each table, and commits received messages in batches (bounded by
+    both a maximum number of messages and a maximum wait time).  The batch limits can be
+    specified as arguments.  The periodic database size check / archival is now done by the
+    writer thread, which closes its connection before the database file is archived.
+            Modified ... 19-Oct-2026                        --- v02.40
+
+    Sensor ID data is now compared against an in-memory copy of the last values recorded for
+    each sensor (read from the database, with a parameterized query using the primary key
+    index, only the first time a sensor is seen), so the check is made for every message
+    without querying the database.
+            Modified ... 19-Oct-2026                        --- v02.41
+
+    Changed the database storage to one database per month (a "partition"), named
+    {db filename}-YYYY-MM.{db extension} for the month (in UTC) the messages were received.
+    This replaces the database size check and archival by renaming.  Partitions older than
+    the specified number of months are moved to an archive directory by a background thread;
+    since the writer thread only ever writes to the current month's partition, this does not
+    interrupt recording of new messages.  Added a query_partitions routine to run a query
+    across the partitions (including archived ones) for a range of dates.
+            Modified ... 19-Oct-2026                        --- v02.50
 """
 
 import paho.mqtt.client as mqtt
@@ -87,6 +111,13 @@ import os
 import atexit
 import sys
 import argparse
+import queue
+import threading
+import glob
+import re
+import shutil
+import itertools
+from urllib.request import pathname2url
 
 from concurrent import futures
 
@@ -97,8 +128,8 @@ import sqlite3
 from sqlite3 import Error
 
 # Define version
-eccmqtt_iot_version = "02.30"
-eccmqtt_iot_date = "18-Dec-2020"
+eccmqtt_iot_version = "02.50"
+eccmqtt_iot_date = "19-Oct-2026"
 
 gzip_in_progress = False
 done_flag = False  # flag to indicate when GZIP in progress completes
@@ -112,7 +143,8 @@ parser = argparse.ArgumentParser(description='''Epiphany Catholic Church MQTT Io
 parser.add_argument("-l", "-log", "--log_file_path", default="ECCMQTTIoT.log",
                     help="log filename path")
 parser.add_argument("-d", "-db", "--database_file_path", default="ECCTempHum.sqlite3",
-                    help="IoT Temperature / Humidity SQLite3 database filename path")
+                    help="IoT Temperature / Humidity SQLite3 database filename path (a database "
+                         "is created for each month, with -YYYY-MM added to the filename)")
 parser.add_argument("-c", "--credentials_file_path", default="ECCMQTTIoT_Credentials.txt",
                     help="default MQTT user/pass credentials filename path")
 parser.add_argument("-b", "--mqtt_broker", default="127.0.0.1",
@@ -129,6 +161,19 @@ parser.add_argument("-a", "--max_log_archives", default=9,
                     help="default maximum number of log archive files to keep")
 parser.add_argument("-z", "--archive_log_size", default=1073741824,
                     help="default maximum log size, in bytes, prior to archival")
+parser.add_argument("--db_keep_months", type=int, default=12,
+                    help="default number of monthly databases (including the current month) to keep "
+                         "before moving them to the database archive directory")
+parser.add_argument("--db_archive_dir", default=None,
+                    help="default database archive directory (default is an 'archive' directory "
+                         "alongside the database)")
+parser.add_argument("--db_batch_size", type=int, default=500,
+                    help="default maximum number of messages written to the database per commit")
+parser.add_argument("--db_batch_seconds", type=float, default=1.0,
+                    help="default maximum time, in seconds, a received message waits to be committed")
+parser.add_argument("--db_max_backlog", type=int, default=100000,
+                    help="default maximum number of received messages waiting to be written to the "
+                         "database; messages received beyond this are dropped (and logged)")
 parser.add_argument("-v", "-ver", "--version", action="store_true",
                     help="display application version information")
 
@@ -258,6 +303,206 @@ class GZipRotator(logging.handlers.RotatingFileHandler):
                     logger.error(err_str)
 
 
+class DatabaseWriter(threading.Thread):
+    """
+    Background thread that owns the (single) connection to the SQLite3 database.
+
+    The MQTT message callback only queues each received message via put(); this thread
+    parses the queued messages and writes them to the database, committing in batches of
+    up to batch_size messages, or after batch_seconds, whichever comes first.  The
+    connection is opened in WAL mode so that other readers of the database do not block
+    the listener (and vice versa).  Tables known to exist and the INSERT statement for
+    each table are remembered for as long as the connection is open.
+
+    Each message is written to the monthly partition of the database for the month it was
+    received in.  Only the current month's partition is kept open; when the month changes,
+    the writer switches to the new partition and starts archival of old partitions in the
+    background.
+
+    A message that cannot be parsed or written is logged and skipped.  Any other error ends
+    the thread (see run); the main loop then exits the listener, rather than continuing to
+    receive messages that would never be written.
+    """
+
+    def __init__(self, db_file, batch_size, batch_seconds, max_backlog=0):
+        super().__init__(name='db-writer', daemon=True)
+        self.db_file = db_file  # base database filename; see partition_db_path
+        self.batch_size = max(1, batch_size)
+        self.batch_seconds = batch_seconds
+        self.messages = queue.Queue(maxsize=max(0, max_backlog))
+        self.messages_dropped = 0
+        self.error = None  # exception that ended the thread, if any
+        self.conn = None
+        self.partition = None  # filename of the open partition
+        self.tables = {}  # table name: (field datatype dictionary, INSERT statement)
+        self.sensor_values = {}  # table name: {sensor name: last values recorded}
+        self.archive_executor = futures.ThreadPoolExecutor(max_workers=1)
+
+    def put(self, topic, mqtt_msg, msg_time):
+        # Never block the MQTT network loop; if the writer has fallen this far behind, drop
+        # the message and raise the alarm in the log
+        try:
+            self.messages.put_nowait((topic, mqtt_msg, msg_time))
+        except queue.Full:
+            self.messages_dropped += 1
+            if self.messages_dropped == 1 or (self.messages_dropped % 1000) == 0:
+                logger.error(F"Database writer backlog full ({self.messages.maxsize} messages); "
+                             F"{self.messages_dropped} messages dropped so far")
+                print(F"Database writer backlog full ({self.messages.maxsize} messages); "
+                      F"{self.messages_dropped} messages dropped so far")
+
+    def stop(self):
+        # Write whatever is still queued, then close the database and end the thread
+        self.messages.put(None)
+        self.join()
+
+    def open(self, partition):
+        self.partition = partition
+        self.conn = create_connection(partition)
+
+        # Check to ensure we have a valid db connection...if not, abort
+        if self.conn is None:
+            logger.error("No connection established to database...aborting.")
+            print(F"No connection established to database...aborting.")
+            sys.exit(1)
+
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.tables = {}
+        self.sensor_values = {}
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+            self.partition = None
+
+    def prepare_table(self, table_idx, db_table):
+        """
+        Create the passed table the first time it is used (if it does not already exist in
+        the database), and return its field datatype dictionary and INSERT statement.
+        """
+
+        prepared = self.tables.get(db_table)
+        if prepared is not None:
+            return prepared
+
+        # Construct the SQL create-table statement...
+        create_table_sql_str, fields_dict = \
+            construct_create_table_sql(db_table, field_names[table_idx])
+
+        # Have a valid db connection; see if the table exists
+        if check_if_table_exists(self.conn, db_table, self.partition):
+            logger.debug(F"Table {db_table} already exists...continuing processing...")
+        else:
+            print(F"Table {db_table} does not exist...creating...")
+            logger.info(F"Table {db_table} does not exist...creating...")
+            create_tbl_status = create_table_from_string(self.conn,
+                                                         db_table,
+                                                         create_table_sql_str)
+            if not create_tbl_status:
+                logger.error(F"Error creating table {db_table}...aborting...")
+                print(F"Error creating table {db_table}...aborting...")
+                sys.exit(1)
+
+        prepared = (fields_dict, construct_insert_table_sql(db_table, fields_dict.keys()))
+        self.tables[db_table] = prepared
+        return prepared
+
+    def run(self):
+        try:
+            self.write_messages()
+        except BaseException as e:
+            # This includes the sys.exit calls for fatal database errors, which (in this
+            # thread) would otherwise end only the thread
+            self.error = e
+            logger.exception(F"Database writer stopped after an error, {e!r}...")
+            print(F"Database writer stopped after an error, {e!r}...")
+            try:
+                self.close()
+            except sqlite3.Error:
+                pass
+
+    def write_messages(self):
+        stopping = False
+        while not stopping:
+            item = self.messages.get()
+            if item is None:
+                break
+
+            # Collect more messages until the batch is full, or the first message in the
+            # batch has waited long enough
+            batch = [item]
+            deadline = time.monotonic() + self.batch_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.messages.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self.write_batch(batch)
+
+        self.close()
+        self.archive_executor.shutdown(wait=True)
+
+    def write_batch(self, batch):
+        # A batch is normally all in one month, but split it (and commit each part to its
+        # own partition) if it spans the end of a month
+        for month, month_batch in itertools.groupby(batch, key=lambda item: partition_month(item[2])):
+            self.write_partition_batch(month, list(month_batch))
+
+    def write_partition_batch(self, month, batch):
+        global database_records_written
+
+        partition = partition_db_path(self.db_file, month)
+        if partition != self.partition:
+            self.close()
+            self.open(partition)
+            logger.info(F"Writing to database partition {partition}")
+            print(F"Writing to database partition {partition}")
+
+            # Move partitions that are now too old to the archive directory; this is done in
+            # the background, and never involves the (current) partition being written.
+            f = self.archive_executor.submit(archive_old_partitions, self.db_file, month)
+            f.add_done_callback(archive_done)
+
+        records_written_before = database_records_written
+
+        for topic, mqtt_msg, msg_time in batch:
+            try:
+                record_status = add_db_record(self, topic, mqtt_msg, msg_time)
+            except Exception as e:
+                # e.g., a malformed message payload; skip the message
+                logger.exception(F"Error occurred processing message received at {msg_time}, "
+                                 F"payload {mqtt_msg!r}, {e}...skipping it")
+                print(F"Error occurred processing message received at {msg_time}, {e}...skipping it")
+                continue
+
+            if not record_status:
+                logger.error(f"Error occurred on attempt to record message received at {msg_time} to database...")
+
+        try:
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.error(F"Error committing {len(batch)} messages to database, {e}")
+            print(F"Error committing {len(batch)} messages to database, {e}")
+            self.conn.rollback()
+            database_records_written = records_written_before
+            # The last sensor ID values may include values from the batch just rolled back;
+            # forget them, so they are re-read from the database as each sensor is next seen
+            self.sensor_values = {}
+            return
+
+        # Every 100 records, output a message
+        if (database_records_written // 100) > (records_written_before // 100):
+            print(F"{database_records_written} records added to database")
+            logger.info(F"{database_records_written} records added to database")
+
+
 # Set the number of backup copies of the log to maintain
 max_log_archives = args.max_log_archives  # default is 9 archives if not specified
 # Set the maximum size in bytes at which the log is archived
@@ -302,6 +547,26 @@ ECCMQTTIoT_last_notice = args.last_notice_file_path
 # Default last notification silence time, in minutes (default is 24 hours / 1 day)
 ECCMQTTIoT_notice_silence = args.last_notice_silence_time
 
+# Number of monthly database partitions to keep (including the current month); older ones
+# are moved to the archive directory
+ECCMQTTIoT_db_keep_months = max(1, args.db_keep_months)
+
+# Location of archived monthly database partitions
+ECCMQTTIoT_db_archive_dir = args.db_archive_dir
+if ECCMQTTIoT_db_archive_dir is None:
+    ECCMQTTIoT_db_archive_dir = os.path.join(os.path.dirname(ECCMQTTIoT_database), "archive")
+
+# Database writer batch limits; received messages are committed once this many are waiting,
+# or once the oldest has waited this many seconds, whichever comes first
+ECCMQTTIoT_db_batch_size = args.db_batch_size
+ECCMQTTIoT_db_batch_seconds = args.db_batch_seconds
+
+# Maximum number of received messages waiting for the database writer
+ECCMQTTIoT_db_max_backlog = args.db_max_backlog
+
+# Database writer thread (started in main)
+db_writer = None
+
 # Define database fields
 field_names = [['recordWrittenUTC',  # field names for sensor readings
                 'dewPointF',
@@ -320,8 +585,6 @@ field_names = [['recordWrittenUTC',  # field names for sensor readings
 
 
 def main():
-    # Global to define the database archival threshold
-    global max_db_file_size_bytes
     # Counter for received messages
     global recvd_message_cnt
     # Counter for database records written
@@ -329,14 +592,12 @@ def main():
     # Flag to indicate a received message on the channel during the timer
     global received_msg
     received_msg = False
-    global sensor_recvd_message_cnt
+    # Database writer thread
+    global db_writer
 
-    max_db_file_size_bytes = 1073741824  # Maximum database file size in bytes before archival; 1GB at 4K cluster size
     recvd_message_cnt = 0
     database_records_written = 0
 
-    sensor_recvd_message_cnt = {}  # dictionary to hold individual sensor message counts
-
     now = datetime.now()
     date_now_str = now.strftime("%Y-%m-%d %H:%M:%S")
     print(F"*** Initiating ECC MQTT IoT listener, {date_now_str} ***")
@@ -351,10 +612,19 @@ def main():
     logger.info(F"Connectivity timer:         {args.timer_check}")
     logger.info(F"GMail credentials filename: {args.gmail_credentials_file_path}")
     logger.info(F"Notice silence time:        {args.last_notice_silence_time}")
-
-    # Before connecting to the MQTT broker, check the existing database size (if it exists).  If
-    # the size exceeds the designated threshold, archive it so a new database will be created.
-    check_database_size()
+    logger.info(F"Database months kept:       {ECCMQTTIoT_db_keep_months}")
+    logger.info(F"Database archive directory: {ECCMQTTIoT_db_archive_dir}")
+    logger.info(F"Database batch size:        {args.db_batch_size}")
+    logger.info(F"Database batch time:        {args.db_batch_seconds}")
+    logger.info(F"Database maximum backlog:   {args.db_max_backlog}")
+
+    # Start the database writer thread; received messages are queued to it by the
+    # on_message callback.  (The writer also archives old database partitions.)
+    db_writer = DatabaseWriter(ECCMQTTIoT_database,
+                               ECCMQTTIoT_db_batch_size,
+                               ECCMQTTIoT_db_batch_seconds,
+                               ECCMQTTIoT_db_max_backlog)
+    db_writer.start()
 
     # Get the MQTT credentials from the specified location...
     mqtt_user, mqtt_pass = get_credentials()
@@ -393,16 +663,23 @@ def main():
     # mqttc.subscribe("ECCTempHum", 0)
 
     # Loop forever, keeping the connection alive and waiting for messaged published to the channel
+    # (or until the database writer thread stops because of an error)
     try:
         mqttc.loop_start()
 
-        while True:
+        while db_writer.is_alive():
             time.sleep(.1)
 
     except (KeyboardInterrupt, SystemExit):
         print(F"Ctrl-C interrupt!")
         return
 
+    # The database writer has stopped, so messages can no longer be recorded; exit (the exit
+    # handler prints the summary) so that the listener can be restarted
+    logger.error(F"Database writer stopped ({db_writer.error!r})...exiting...")
+    print(F"Database writer stopped ({db_writer.error!r})...exiting...")
+    sys.exit(1)
+
 
 def on_connect(mqttc, obj, flags, rc):
     if rc == 0:
@@ -440,9 +717,7 @@ def on_disconnect(mqttc, obj, msg):
 
 def on_message(mqttc, obj, msg):
     global recvd_message_cnt
-    global database_records_written
     global received_msg
-    global sensor_recvd_message_cnt
 
     # Set a flag to indicate we've received a message during the timer execution
     received_msg = True
@@ -451,23 +726,12 @@ def on_message(mqttc, obj, msg):
     logger.debug(F"Topic: {msg.topic}  QoS: {str(msg.qos)},  {str(msg.payload)}")
     print(F"Topic: {msg.topic}  QoS: {str(msg.qos)},  {str(msg.payload)}")
 
-    # After every 1000 records, check the database size and if it exceeds the designated
-    # threshold, archive it.
-    if (recvd_message_cnt % 1000) == 0:
-        check_database_size()
-
     recvd_message_cnt += 1
 
-    # Received message on subscribed channel...add it to the database.
-    add_db_record(msg.topic, msg.payload, msg_time)
-
-    if not add_db_record:
-        logger.error(f"Error occurred on attempt to record last message to database...")
-
-    # Check the database records written count; every 100 records, output a message
-    if ((database_records_written % 100) == 0) and (database_records_written != 0):
-        print(F"{database_records_written} records added to database")
-        logger.info(F"{database_records_written} records added to database")
+    # Received message on subscribed channel...queue it for the database writer thread, which
+    # parses it and adds it to the database.  (This keeps the MQTT network loop from waiting
+    # on the database.)
+    db_writer.put(msg.topic, msg.payload, msg_time)
 
 
 def on_subscribe(mqttc, obj, mid, granted_qos):
@@ -560,7 +824,7 @@ def connectivity_check(mqttc):
     timer.start()
 
 
-def add_db_record(topic, mqtt_msg, msg_time):
+def add_db_record(writer, topic, mqtt_msg, msg_time):
     """
         This routine will attempt to add a new database record to the specified SQLite
         database by parsing the MQTT message payload received.  It will first check for
@@ -572,25 +836,24 @@ def add_db_record(topic, mqtt_msg, msg_time):
         table used to store these.
             Written by DK Fowler ... 18-Dec-2020
 
+        Modified to be called from the database writer thread, using its connection and
+        prepared tables; the record is committed by the writer with the rest of its batch.
+            Modified ... 19-Oct-2026
+
+        Modified to check the sensor ID data for changes on every message, against the
+        writer's in-memory copy of the last values recorded for the sensor.
+            Modified ... 19-Oct-2026
+
+    :param writer:          DatabaseWriter thread object (connection, prepared tables)
     :param topic:           MQTT topic to which the message containing data is published
     :param mqtt_msg:        MQTT message payload (unparsed)
     :param msg_time:        time the message was received by the listener in UTC
     :return:                True if successful in adding record, else False
     """
 
-    global sensor_recvd_message_cnt
-
     insert_record_status = False  # assume failure
-    check_sensor_id_freq = 144
-
-    # Attempt to get a connection to the db.  If it doesn't exist, we create it.
-    conn = create_connection(ECCMQTTIoT_database)
 
-    # Check to ensure we have a valid db connection...if not, abort
-    if conn is None:
-        logger.error("No connection established to database...aborting.")
-        print(F"No connection established to database...aborting.")
-        sys.exit(1)
+    conn = writer.conn
 
     # Sample message payload for the latest sensor looks like:
     # field1=47.10&field2=73.45&field3=39.17&field4=3.41&field5=93.53
@@ -617,88 +880,49 @@ def add_db_record(topic, mqtt_msg, msg_time):
         db_table = ['ECCTempHum',
                     'ECCTempHumSensor']
 
-    create_table_sql_str = []
-    table_fields_dict = []
     for table_idx, data_table in enumerate(db_table):
-        # Construct the SQL create-table statement...
-        sql_str, fields_dict = \
-            construct_create_table_sql(data_table,
-                                       field_names[table_idx])
-        create_table_sql_str.insert(table_idx, sql_str)
-        table_fields_dict.append(fields_dict)
-
-        # Have a valid db connection; see if the table exists
-        if check_if_table_exists(conn, data_table, ECCMQTTIoT_database):
-            logger.debug(F"Table {data_table} already exists...continuing processing...")
-        else:
-            print(F"Table {data_table} does not exist...creating...")
-            logger.info(F"Table {data_table} does not exist...creating...")
-            create_tbl_status = create_table_from_string(conn,
-                                                         data_table,
-                                                         create_table_sql_str[table_idx])
-            if not create_tbl_status:
-                logger.error(F"Error creating table {data_table}...aborting...")
-                print(F"Error creating table {data_table}...aborting...")
-                sys.exit(1)
+        # Create the table if this is the first use of it, and get its fields
+        # and INSERT statement
+        fields_dict, sql_insert = writer.prepare_table(table_idx, data_table)
 
         if table_idx == 0:
             insert_data = field_values[:7]
             # First 7 fields are sensor data
             insert_record_status = create_database_record(conn,
                                                           data_table,
-                                                          table_fields_dict[table_idx],
+                                                          fields_dict,
                                                           insert_data,
-                                                          msg_time)
+                                                          msg_time,
+                                                          sql_insert)
         else:
-            # Since the sensor ID data shouldn't change very frequently,
-            # check it only once per day or so.  We do this by checking the
-            # message count; since the sensors report on average about every
-            # 10 minutes, we should see about 6 per hour * 24 hours, or 144
-            # messages per day.  (The data list 'insert_data[0]' should contain
-            # the sensor name.)
-
             # Last 4 fields of the message are sensor ID, MAC, location, software
-            # version
+            # version.  (The data list 'insert_data[0]' should contain the sensor
+            # name.)
             insert_data = field_values[6:]
 
-            # Maintain a list of counters by sensor name; if we haven't created
-            # the counter yet, then do so and initialize to 0; else, increment it
-            try:
-                if sensor_recvd_message_cnt[insert_data[0]] in \
-                        sensor_recvd_message_cnt.keys():
-                    sensor_recvd_message_cnt[insert_data[0]] += 1
-                else:
-                    sensor_recvd_message_cnt[insert_data[0]] = 0
-            except KeyError as e:           # handle empty dictionary
-                sensor_recvd_message_cnt[insert_data[0]] = 0
-
-            if ((sensor_recvd_message_cnt[insert_data[0]] %
-                 check_sensor_id_freq) != 0) and \
-                    (sensor_recvd_message_cnt[insert_data[0]] != 0):
-                break
-
             # Before attempting to insert a record into the sensor ID/location
             # table, check to see if any of the information has changed since
             # the most-recently-written record for this sensor.  If not, skip
-            # the insert.
-
+            # the insert.  The last values recorded for each sensor are kept in
+            # memory, so this is cheap enough to do for every message.
+            last_values = writer.sensor_values.setdefault(data_table, {})
             sensor_change = check_for_sensor_changes(conn,
                                                      data_table,
-                                                     insert_data)
+                                                     insert_data,
+                                                     last_values)
             if sensor_change:
                 insert_record_status = create_database_record(conn,
                                                               data_table,
-                                                              table_fields_dict[table_idx],
+                                                              fields_dict,
                                                               insert_data,
-                                                              msg_time)
+                                                              msg_time,
+                                                              sql_insert)
+                if insert_record_status:
+                    last_values[insert_data[0]] = tuple(insert_data)
                 logger.info(f"Record written to table {data_table}...")
             else:
-                logger.info(f"Sensor ID data hasn't changed, so not saved "
-                            f"(table {data_table})...")
-
-    # Close the database connection if it is open
-    if conn:
-        conn.close()
+                logger.debug(f"Sensor ID data hasn't changed, so not saved "
+                             f"(table {data_table})...")
 
     if insert_record_status:
         return True
@@ -945,23 +1169,29 @@ def construct_insert_table_sql(db_table, db_fields):
     return db_insert_sql_str
 
 
-def create_database_record(conn, db_table, values_dict, field_values, msg_time):
+def create_database_record(conn, db_table, values_dict, field_values, msg_time, sql_insert=None):
     """
         This routine will attempt to write a record to the passed table with the passed
         list of record names / values.  If successful, the routine will return True, else False.
             Written by DK Fowler ... 10-Jun-2020
+
+        Modified to accept an already-constructed INSERT statement, and to leave the commit
+        to the caller (so that records can be committed in batches).
+            Modified ... 19-Oct-2026
     :param conn:            database connection (may exist already, or be set to None)
     :param db_table:        table name to which a record write is attempted
     :param values_dict:     dictionary of field names: datatypes for the record
     :param field_values:    list of field values for the record
     :param msg_time:        datetime when MQTT message received, in UTC
+    :param sql_insert:      INSERT statement for the table (constructed if not passed)
     :return:                True if table created successfully; otherwise, False
     """
 
     global database_records_written
 
     # First create a SQL string for INSERTing the record into the passed table
-    sql_insert = construct_insert_table_sql(db_table, values_dict.keys())
+    if sql_insert is None:
+        sql_insert = construct_insert_table_sql(db_table, values_dict.keys())
 
     # Get the current date/time in UTC for the record INSERT
     recordWrittenUTC = msg_time
@@ -1024,39 +1254,52 @@ def create_database_record(conn, db_table, values_dict, field_values, msg_time):
         print(F"No database connection detected while attempting to write new record, table {db_table}")
         sys.exit(1)
 
-    conn.commit()
     cur.close()
     return True
 
 
-def check_for_sensor_changes(conn, db_table, compare_values):
+def check_for_sensor_changes(conn, db_table, compare_values, last_values=None):
     """
     Query the last sensor data written for this sensor and compare the
     current values to see if a change has occurred.  If so, return true,
     else, return false.
             Written by DK Fowler ... 19-Dec-2020
 
+    Modified to use a parameterized query, and to compare against the passed
+    dictionary of last values recorded for each sensor (if any); the database
+    is only queried the first time a sensor is seen.
+            Modified ... 19-Oct-2026
+
     :param conn:            the database connection object
     :param db_table:        the SQLite3 database table to be queried
     :param compare_values:  list of values to compare against last record in db
+    :param last_values:     dictionary of sensor name: last values recorded for the sensor
+                            (updated with the values read from the database, if queried)
     :return:                True, if change detected; else, False
     """
 
+    sensor_name = compare_values[0]
+
+    if last_values is not None and sensor_name in last_values:
+        return tuple(compare_values) != last_values[sensor_name]
+
     cur = conn.cursor()
 
     # Order of values for the sensor data passed to the routine should be:
     #   ID, MAC, location, software version
     # Build SQL query string
     #   Note:   The Python SQLite API does not support parameterizing the table name, so we need to build
-    #           the SQL SELECT statement with the passed table name.
+    #           the SQL SELECT statement with the passed table name.  The sensor name is passed as a
+    #           parameter.  The table's primary key (sensorName, recordWrittenUTC) serves as the index
+    #           for this query, so it reads only the one row.
     last_written_sql = "SELECT * FROM " + \
                        db_table + \
-                       f" WHERE sensorName = '{compare_values[0]}' " \
-                       f"ORDER BY recordWrittenUTC DESC LIMIT 1"
+                       " WHERE sensorName = ? " \
+                       "ORDER BY recordWrittenUTC DESC LIMIT 1"
     logger.debug(F"SQL for last record written to database table {db_table}:  ")
     logger.debug(F"{last_written_sql}")
     try:
-        cur.execute(last_written_sql)
+        cur.execute(last_written_sql, (sensor_name,))
     except sqlite3.Error as e:
         logger.debug(F"Error occurred while attempting to retrieve last sensor ID data from table {db_table}...")
         logger.debug(F"...error occurred was: {e}")
@@ -1075,14 +1318,8 @@ def check_for_sensor_changes(conn, db_table, compare_values):
             cur.close()
             sys.exit(1)
 
-    rows = cur.fetchall()
-
-    row_cnt = 0
-    for row in rows:
-        row_cnt = row_cnt + 1
-        logger.debug(F"Last sensor data for table {db_table}: {row[0]}")
-        logger.debug(row)
-        compare_fields = row  # save the data for further comparison
+    row = cur.fetchone()
+    cur.close()
 
     """
         If no rows are returned for this sensor, then there were previously no entries written in
@@ -1090,21 +1327,20 @@ def check_for_sensor_changes(conn, db_table, compare_values):
         ID data for this sensor.  Return True to indicate that "changes" were found, meaning this
         is a new record that needs to be recorded.
     """
-    if row_cnt == 0:
+    if row is None:
         logger.debug(F"No records found for table {db_table} while retrieving last sensor ID data")
-        cur.close()
         return True
 
+    logger.debug(F"Last sensor data for table {db_table}: {row[0]}")
+    logger.debug(row)
+
     # Found a record with same sensor name; now compare the key values
-    change_detected = False
-    for field_idx, field in enumerate(compare_values):
-        # skip the first column in the db record (dateWrittenUTC)
-        if field != compare_fields[field_idx + 1]:
-            change_detected = True
-            break
+    # (skip the first column in the db record (dateWrittenUTC))
+    recorded_values = tuple(row[1:len(compare_values) + 1])
+    if last_values is not None:
+        last_values[sensor_name] = recorded_values
 
-    cur.close()
-    return change_detected
+    return tuple(compare_values) != recorded_values
 
 
 def get_credentials():
@@ -1179,73 +1415,185 @@ def get_email_credentials():
         sys.exit(1)
 
 
-def check_database_size():
+def partition_month(msg_time):
     """
-    This routine will check the existing database size and compare it against the designated
-    threshold size.  If it exceeds it, a routine to archive the exiting database will be called.
-            Written by DK Fowler ... 13-Jun-2020
+    This routine returns the month, as a (year, month) tuple, of the database partition
+    a message received at msg_time (UTC) is written to.
     """
 
-    global max_db_file_size_bytes
+    return msg_time.year, msg_time.month
 
-    # Check if the database file currently exists; if not, simply return without further
-    # checking, as the database will be created at first connection if it doesn't exist
-    #       Added by DK Fowler ... 09-Aug-2020
-    db_exists = os.path.exists(ECCMQTTIoT_database)
-    if not db_exists:
-        return
 
-    db_size_bytes = os.path.getsize(ECCMQTTIoT_database)
+def partition_db_path(db_file, month):
+    """
+    This routine returns the filename of the database partition for the passed (year, month)
+    month.  The partition filename is in the form {db filename}-YYYY-MM.{db extension}, in
+    the same directory as the (base) database filename.
+    """
+
+    db_root, db_ext = os.path.splitext(db_file)
+    return F"{db_root}-{month[0]:04d}-{month[1]:02d}{db_ext}"
 
-    if db_size_bytes >= max_db_file_size_bytes:
-        logger.info(F"Database size of {db_size_bytes} exceeds maximum ({max_db_file_size_bytes}), "
-                    F"archiving file...")
-        print(F"Database size of {db_size_bytes} exceeds maximum ({max_db_file_size_bytes}), "
-              F"archiving file...")
-        archive_db()
 
+def list_partitions(db_file, directories):
+    """
+    This routine will find the database partitions for the passed (base) database filename
+    in each of the passed directories.
+    :param db_file:         (base) database filename
+    :param directories:     list of directories to search
+    :return:                list of ((year, month), partition filename), oldest first
+    """
+
+    db_root, db_ext = os.path.splitext(os.path.basename(db_file))
+    partition_re = re.compile(re.escape(db_root) + r"-(\d{4})-(\d{2})" + re.escape(db_ext) + "$")
+
+    partitions = []
+    for directory in directories:
+        for path in glob.glob(os.path.join(glob.escape(directory), F"{glob.escape(db_root)}-*{db_ext}")):
+            match = partition_re.match(os.path.basename(path))
+            if match:
+                partitions.append(((int(match.group(1)), int(match.group(2))), path))
 
-def archive_db():
+    partitions.sort()
+    return partitions
+
+
+def archive_old_partitions(db_file, current_month):
     """
-        This routine will "archive" the existing database file by renaming it, such that the next
-        program iteration will re-create a new one.  The archival file name will be in the form:
-        {db filename}-{create-date/time}-{mod-date/time}.{db extension}, where
-        create-date/time is the database creation date/time in the form "YYYYMMDDHHMM", and
-        mod-date/time is the database last-modified date/time in the form "YYYYMMDDHHMM".
-                Written by DK Fowler ... 24-Feb-2020
+    This routine will move database partitions older than the number of months to keep
+    (counting the current month) to the database archive directory.  It is run in the
+    background by the database writer thread when it starts writing to a new partition;
+    since the writer only writes to the current month's partition, the partitions moved
+    here are not in use by the listener.
+    :param db_file:         (base) database filename
+    :param current_month:   (year, month) of the partition being written
+    :return:                list of archived partition filenames
+    """
+
+    oldest_kept = current_month[0] * 12 + current_month[1] - ECCMQTTIoT_db_keep_months
+
+    archived = []
+    for month, partition in list_partitions(db_file, [os.path.dirname(db_file) or "."]):
+        if month[0] * 12 + month[1] > oldest_kept:
+            continue
+
+        # Leave a partition that is still open somewhere (e.g., being read) until the
+        # next time
+        if partition_in_use(partition):
+            logger.info(F"Database partition {partition} is in use; not archiving it yet")
+            continue
+
+        os.makedirs(ECCMQTTIoT_db_archive_dir, exist_ok=True)
+        archival_db_name = os.path.join(ECCMQTTIoT_db_archive_dir, os.path.basename(partition))
+
+        # Move it under a temporary name first, so that an interrupted copy (when the
+        # archive directory is on another drive) is never mistaken for a partition
+        shutil.move(partition, archival_db_name + ".tmp")
+        os.replace(archival_db_name + ".tmp", archival_db_name)
+        logger.info(F"Archived database partition {partition} to {archival_db_name}")
+        print(F"Archived database partition {partition} to {archival_db_name}")
+        archived.append(archival_db_name)
+
+    return archived
+
+
+def partition_in_use(partition):
+    """
+    This routine will check whether the passed database partition is open by any other
+    connection, by locking it and switching it out of WAL mode (which SQLite only allows for
+    the only connection to a database).  If it is not in use, this also checkpoints any
+    write-ahead log into the partition and removes the -wal / -shm files (e.g., left behind
+    by a read-only query), so that the partition is a single, self-contained file.
+    :param partition:   database partition filename
+    :return:            True if the partition is in use, else False
     """
 
-    logger.info(F"Beginning database archival...")
-    print(F"Beginning database archival...")
-
-    # Get the creation / last modified date/time of the existing file for use in constructing the archival file name...
-    db_modified_time = os.path.getmtime(ECCMQTTIoT_database)
-    db_create_time = os.path.getctime(ECCMQTTIoT_database)
-    # Convert timestamps to strings in proper form
-    db_create_string = datetime.fromtimestamp(db_create_time).strftime('%Y%m%d%H%M')
-    db_modified_string = datetime.fromtimestamp(db_modified_time).strftime('%Y%m%d%H%M')
-    # Get the filename/ext string of the existing database
-    db_basename = os.path.basename(ECCMQTTIoT_database)
-    # Split the filename into name/extension components
-    fn = os.path.splitext(db_basename)
-    db_filename = fn[0]
-    db_ext = fn[1]
-    # Construct the new archival filename
-    archival_db_name = db_filename + "-" + db_create_string + "-" + db_modified_string + db_ext
-    print(F"Archival database name:  {archival_db_name}.")
-
-    # Attempt to rename the existing database
     try:
-        os.rename(ECCMQTTIoT_database, archival_db_name)
-        logger.info(F"Renamed database to: {archival_db_name}.")
-        print(F"Renamed database to:  {archival_db_name}.")
-    except Error as e:
-        logger.error(F"Error attempting to archive (rename) database file: {e}...")
-        logger.error(F"...original database name:  {ECCMQTTIoT_database}")
-        logger.error(F"...archival database name:  {archival_db_name}")
-        print(F"Error attempting to archive (rename) database file: {e}...")
-        print(F"...original database name:  {ECCMQTTIoT_database}")
-        print(F"...archival database name:  {archival_db_name}")
+        conn = sqlite3.connect(partition, timeout=0, isolation_level=None)
+    except sqlite3.Error as e:
+        logger.info(F"Unable to open database partition {partition} to check if in use, {e}")
+        return True
+
+    try:
+        conn.execute("BEGIN EXCLUSIVE")
+        conn.execute("ROLLBACK")
+        journal_mode = conn.execute("PRAGMA journal_mode=DELETE").fetchone()[0]
+    except sqlite3.OperationalError as e:
+        logger.debug(F"Database partition {partition} is locked, {e}")
+        return True
+    finally:
+        conn.close()
+
+    return journal_mode.lower() != "delete" or os.path.exists(partition + "-wal")
+
+
+def archive_done(fn):
+    error = fn.exception()
+    if error:
+        logger.error(F"Error occurred while archiving old database partitions, {error}")
+        logger.error(F"...partitions left in place will be archived on the next attempt")
+        print(F"Error occurred while archiving old database partitions, {error}")
+
+
+def query_partitions(sql, params=(), start=None, end=None):
+    """
+    This routine will run the passed SELECT statement against each of the monthly database
+    partitions (current and archived) whose month falls between the start and end dates,
+    and return the rows from each, oldest partition first.  The start and end dates only
+    select which partitions are queried; the SELECT statement should also select the range
+    of recordWrittenUTC it wants.  Partitions that do not contain the table queried are
+    skipped.  Partitions are opened read-only, and so can be queried while the listener is
+    running.  Archived partitions, and older partitions that are no longer being written,
+    are opened as immutable, so that querying them does not create a write-ahead log.
+
+    For example:
+
+        for row in query_partitions("SELECT * FROM ECCTempHum WHERE sensorName = ? "
+                                    "AND recordWrittenUTC >= ? ORDER BY recordWrittenUTC",
+                                    ("ECCTH01", "2026-06-01"), start=datetime(2026, 6, 1)):
+            ...
+
+    :param sql:         SELECT statement to run against each partition
+    :param params:      parameters for the SELECT statement
+    :param start:       earliest date (UTC) to query, or None for no limit
+    :param end:         latest date (UTC) to query, or None for no limit
+    :return:            generator of the rows returned
+    """
+
+    partitions = list_partitions(ECCMQTTIoT_database,
+                                 [os.path.dirname(ECCMQTTIoT_database) or ".",
+                                  ECCMQTTIoT_db_archive_dir])
+
+    # The writer may still be finishing last month's partition just after the month changes
+    current_month = partition_month(datetime.utcnow())
+    oldest_written = current_month[0] * 12 + current_month[1] - 1
+    archive_dir = os.path.abspath(ECCMQTTIoT_db_archive_dir)
+
+    for month, partition in partitions:
+        if start is not None and month < partition_month(start):
+            continue
+        if end is not None and month > partition_month(end):
+            continue
+
+        partition_path = os.path.abspath(partition)
+        if os.path.dirname(partition_path) == archive_dir or \
+                (month[0] * 12 + month[1] < oldest_written and
+                 not os.path.exists(partition + "-wal")):
+            uri_options = "immutable=1"
+        else:
+            uri_options = "mode=ro"
+
+        conn = sqlite3.connect(F"file:{pathname2url(partition_path)}?{uri_options}", uri=True)
+        try:
+            cur = conn.execute(sql, params)
+            for row in cur:
+                yield row
+        except sqlite3.OperationalError as e:
+            if 'no such table' not in str(e):
+                raise
+            logger.debug(F"Database partition {partition} skipped in query, {e}")
+        finally:
+            conn.close()
 
 
 def cleanup_mqtt(mqttc):
@@ -1280,10 +1628,17 @@ def print_exit_summary(mqttc):
     if mqttc:
         mqttc.loop_stop()
 
+    # Write any messages still queued for the database, and close it
+    if db_writer is not None and db_writer.is_alive():
+        db_writer.stop()
+
     print(F"Total MQTT messages received:  {recvd_message_cnt}")
     logger.info(F"Total MQTT messages received:  {recvd_message_cnt}")
     print(F"Total database records written:  {database_records_written}")
     logger.info(F"Total database records written:  {database_records_written}")
+    if db_writer is not None and db_writer.messages_dropped:
+        print(F"Total messages dropped (database backlog full):  {db_writer.messages_dropped}")
+        logger.info(F"Total messages dropped (database backlog full):  {db_writer.messages_dropped}")
 
     end_time = datetime.now()
     logger.info(f'ECC MQTT IoT Listener total runtime {end_time - start_time}')
@@ -20,7 +20,14 @@ fi
 while (eval $true) do
     echo "=== `date`"
 
-    cp $orig $copy
+    # The cookie database is in WAL mode, so recently-written data
+    # may not be in the main database file yet: use sqlite3 to make a
+    # consistent copy.  Switch the copy back to rollback journal mode
+    # so that the web server doesn't need to be able to write a WAL
+    # file next to it.
+    rm -f $copy
+    sqlite3 $orig ".backup $copy"
+    sqlite3 $copy "PRAGMA journal_mode=DELETE;" > /dev/null
     echo zstd compressing...
     zstd --rm $copy
     echo scping...
@@ -26,10 +26,9 @@ $cookie = strtoupper($cookie);
 
 $db_handle  = new SQLite3($filename);
 
-# Get the URL from the most recent row in the database with the
-# correct cookie (remember: the cookie will be identical for all rows
-# with the same FID).
-$query = "SELECT url FROM COOKIES WHERE cookie=:cookie ORDER BY creation_timestamp DESC LIMIT 1";
+# Get the URL for this cookie.  There is (at most) one row per cookie,
+# and the cookie column has a unique index, so this is a quick lookup.
+$query = "SELECT url FROM COOKIES WHERE cookie=:cookie";
 $stmt = $db_handle->prepare($query);
 $stmt->bindParam(':cookie', $cookie);
 $result = $stmt->execute();
@@ -78,63 +78,40 @@ args = None
 
 exp_regex = re.compile(r"^\d+E\d+$")
 
-# Returns the redirect URL
-def insert_url_cookie(fduid, url, cookies, log):
-
-    # See if there's a cookie for this Family DUID already
-    def _get_cookie():
-        # Get just the latest entry
-        query = 'SELECT cookie FROM cookies WHERE fduid=:fduid ORDER BY creation_timestamp DESC LIMIT 1'
-        values = {
-            'fduid' : fduid,
-        }
-        results = cookies.execute(query, values)
-        cookie = None
-        row = results.fetchone()
-        if row:
-            cookie = row[0]
-
-        return cookie
-
-    # Make a cookie that is unique
-    def _generate_cookie():
-        while True:
-            raw_uuid = uuid.uuid4()
-            str_uuid = str(raw_uuid)
-            cookie = str_uuid[0:6].upper()
-
-            # Make sure that this is an acceptable cookie.
-            # These cookies are written to a CSV/Spreadsheet, and we don't want
-            # them interpreted as numbers.  So make sure we don't have any of them.
-            # Reject cookies that start with 0
-            if cookie[0] == '0':
-                continue
-
-            # Reject cookies that are all digits
-            if cookie.isdigit():
-                continue
+# Make a cookie that is not in the "used" set
+def _generate_cookie(used):
+    while True:
+        raw_uuid = uuid.uuid4()
+        str_uuid = str(raw_uuid)
+        cookie = str_uuid[0:6].upper()
+
+        # Make sure that this is an acceptable cookie.
+        # These cookies are written to a CSV/Spreadsheet, and we don't want
+        # them interpreted as numbers.  So make sure we don't have any of them.
+        # Reject cookies that start with 0
+        if cookie[0] == '0':
+            continue
 
-            # Also reject cookies of the form \d+E\d+, because Excel/Google
-            # Sheets will interpret that as a number, too.
-            match = exp_regex.match(cookie)
-            if match:
-                continue
+        # Reject cookies that are all digits
+        if cookie.isdigit():
+            continue
 
-            # Finally, reject cookies that are already in the database.
-            # Each cookie must be unique.
-            query = 'SELECT cookie FROM cookies WHERE cookie=:cookie ORDER BY creation_timestamp DESC LIMIT 1'
-            values = {
-                'cookie' : cookie,
-            }
-            results = cookies.execute(query, values)
-            row = results.fetchone()
-            if not row:
-                # Return when we found a cookie that is not yet in the
-                # database
-                return cookie
+        # Also reject cookies of the form \d+E\d+, because Excel/Google
+        # Sheets will interpret that as a number, too.
+        match = exp_regex.match(cookie)
+        if match:
+            continue
 
-    #------------------------------------------------------------
+        # Finally, reject cookies that are already in use.
+        # Each cookie must be unique.
+        if cookie not in used:
+            return cookie
 
+# Insert the URLs for a bunch of Families in the cookies database.
+# "urls" is a dictionary of FDUID -> jotform URL.
+#
+# Returns a dictionary of FDUID -> (redirect URL, cookie).
+def insert_url_cookies(urls, cookies, log):
     # We're basically basing the lookup on the Family DUID.  But the
     # Family DUIDs used by PS have a fairly dense distribution --
     # given one Family DUID, it's pretty easy to find other valid
@@ -142,34 +119,48 @@ def insert_url_cookie(fduid, url, cookies, log):
     # number to use instead of the Family DUID.  Using only 6 digits
     # means that this code can be conveyed verbally, on a printed
     # sheet (e.g., a snail mail), etc.
-    cookie = _get_cookie()
-    if cookie is not None:
-        log.debug(f"Using existing cookie: {cookie}")
-    else:
-        cookie = _generate_cookie()
-        log.debug(f"Using new cookie: {cookie}")
-
-    # Insert the URL in the cookies database
-    url_escaped = url.replace("'", "''")
-    query       = ("INSERT INTO cookies "
-                   "(cookie,fduid,url,creation_timestamp) "
-                   "VALUES (:cookie, :fduid, :url, :ts);")
-    values      = {
-        "cookie" : cookie,
-        "fduid"  : fduid,
-        "url"    : url_escaped,
-        "ts"     : int(calendar.timegm(time.gmtime())),
-    }
-    cookies.execute(query, values)
-
-    # Write the cookie to the DB immediately (in case someone is
-    # reading/copying the sqlite3 database behind the scenes).
+    #
+    # Re-use the existing cookie for any Family that already has one.
+    existing = { fduid : cookie for fduid, cookie in
+                 cookies.execute('SELECT fduid, cookie FROM cookies') }
+    used     = set(existing.values())
+
+    ts      = int(calendar.timegm(time.gmtime()))
+    out     = dict()
+    values  = list()
+    num_new = 0
+    for fduid, url in urls.items():
+        cookie = existing.get(fduid)
+        if cookie is not None:
+            log.debug(f"Using existing cookie for FDUID {fduid}: {cookie}")
+        else:
+            cookie = _generate_cookie(used)
+            used.add(cookie)
+            num_new += 1
+            log.debug(f"Using new cookie for FDUID {fduid}: {cookie}")
+
+        url_escaped = url.replace("'", "''")
+        values.append({
+            "cookie" : cookie,
+            "fduid"  : fduid,
+            "url"    : url_escaped,
+            "ts"     : ts,
+        })
+        out[fduid] = (f'{api_base_url}{cookie}', cookie)
+
+    # Insert / update the URLs in the cookies database, all in one
+    # transaction
+    query = ("INSERT INTO cookies "
+             "(cookie,fduid,url,creation_timestamp) "
+             "VALUES (:cookie, :fduid, :url, :ts) "
+             "ON CONFLICT(fduid) DO UPDATE SET "
+             "url=excluded.url, creation_timestamp=excluded.creation_timestamp")
+    cookies.executemany(query, values)
     cookies.connection.commit()
 
-    if log:
-        log.debug(f"SQL query: {query} / {values}")
+    log.info(f"Wrote {len(values)} URLs to the cookie database ({num_new} new cookies)")
 
-    return f'{api_base_url}{cookie}', cookie
+    return out
 
 ##############################################################################
 
@@ -290,12 +281,14 @@ def send_family_email(message_body, family, submissions, cookies, log):
     if args.do_not_send:
         log.info("NOT SENDING EMAIL (--do-not-send)")
     else:
-        ECC.send_email(to_addr=smtp_to,
-                       subject=smtp_subject,
-                       body=message_body,
-                       content_type='text/html',
-                       from_addr=smtp_from,
-                       log=log)
+        # If we're queueing the emails, remember which queue entry is
+        # this Family's so that we can check whether it was actually sent
+        data['queue key'] = ECC.send_email(to_addr=smtp_to,
+                                           subject=smtp_subject,
+                                           body=message_body,
+                                           content_type='text/html',
+                                           from_addr=smtp_from,
+                                           log=log)
 
     return len(data['to_addresses'])
 
@@ -310,6 +303,11 @@ def _send_family_emails(message_body, families, member_workgroups, submissions,
     email_sent = list()
     email_not_sent = list()
 
+    # First make the jotform URL for each Family (FDUID -> URL).  Then
+    # write them all to the cookie database in one transaction before
+    # we send any emails.
+    urls = dict()
+
     # Iterate through all the family emails that we need to send
     sorted_fduids = sorted(families)
     for i, fduid in enumerate(sorted_fduids):
@@ -390,9 +388,15 @@ def _send_family_emails(message_body, families, member_workgroups, submissions,
             jotform_url += make_ministries_url_portion(member,
                                                         member_number, log)
 
-        # Now that we have the entire ministry jotform URL,
-        # make a bounce URL for it
-        bounce_url, cookie  = insert_url_cookie(fduid, jotform_url, cookies, log=log)
+        urls[fduid] = jotform_url
+
+    # Now that we have the entire ministry jotform URL for each
+    # Family, make bounce URLs for them all at once
+    bounce_urls = insert_url_cookies(urls, cookies, log=log)
+
+    for fduid in sorted(urls):
+        family = families[fduid]
+        bounce_url, cookie = bounce_urls[fduid]
         family['stewardship']['bounce_url'] = bounce_url
         family['stewardship']['code'] = cookie
 
@@ -566,16 +570,17 @@ def send_some_family_emails(args, families, member_workgroups, family_workgroups
 
 ###########################################################################
 
-def cookiedb_create(filename, log=None):
-    cur = cookiedb_open(filename)
-    query = ('CREATE TABLE cookies ('
-             'cookie text not null,'
-             'fduid not null,'
-             'url text not null,'
-             'creation_timestamp integer not null'
-             ')')
+# The cookie database has one row per Family: the Family's code (the
+# "cookie") and the Family's latest jotform URL.  The cookie and the
+# FDUID each have a unique index, so finding a Family's cookie,
+# checking that a new cookie is unique, and the lookup in
+# docroot/stewardship-2026/index.php all stay fast as the table grows.
+#
+# The database is in WAL mode so that it can be read (e.g., by
+# copy-while-running.sh) while this script is writing to it.
 
-    cur.execute(query)
+def cookiedb_create(filename, log=None):
+    cur = cookiedb_open(filename, log)
 
     if log:
         log.debug(f"Initialized cookie db: {filename}")
@@ -584,8 +589,32 @@ def cookiedb_create(filename, log=None):
 
 def cookiedb_open(filename, log=None):
     conn = sqlite3.connect(filename)
+    conn.execute('PRAGMA journal_mode=WAL')
     cur = conn.cursor()
 
+    cur.execute('CREATE TABLE IF NOT EXISTS cookies ('
+                'cookie text not null,'
+                'fduid not null,'
+                'url text not null,'
+                'creation_timestamp integer not null'
+                ')')
+
+    # Older databases have a row for every time that a URL was
+    # written for a Family (all with the same cookie).  Only keep the
+    # latest one for each Family so that we can make the unique
+    # indexes.
+    cur.execute("SELECT name FROM sqlite_master "
+                "WHERE type='index' AND name='cookies_fduid'")
+    if cur.fetchone() is None:
+        cur.execute('DELETE FROM cookies WHERE rowid NOT IN '
+                    '(SELECT MAX(rowid) FROM cookies GROUP BY fduid)')
+        if log and cur.rowcount > 0:
+            log.info(f"Removed {cur.rowcount} old URLs from cookie db: {filename}")
+
+    cur.execute('CREATE UNIQUE INDEX IF NOT EXISTS cookies_cookie ON cookies (cookie)')
+    cur.execute('CREATE UNIQUE INDEX IF NOT EXISTS cookies_fduid ON cookies (fduid)')
+    conn.commit()
+
     if log:
         log.debug(f"Opened cookie db: {filename}")
 
@@ -893,6 +922,17 @@ def setup_args():
                                 required=True,
                                 help='File containing the templated content of the email to be sent')
 
+    tools.argparser.add_argument('--email-queue',
+                                 help='If specified, queue all emails in this SQLite3 database and then send them in parallel.  If a prior run was interrupted, re-running with the same queue will not re-send emails that were already sent.')
+    tools.argparser.add_argument('--email-workers',
+                                 type=int,
+                                 default=4,
+                                 help='Number of parallel SMTP connections to use with --email-queue')
+    tools.argparser.add_argument('--email-rate',
+                                 type=float,
+                                 default=None,
+                                 help='Maximum number of emails to send per second with --email-queue')
+
     tools.argparser.add_argument('--service-account-json',
                                  default='ecc-emailer-service-account.json',
                                  help='File containing the Google service account JSON key')
@@ -1036,6 +1076,8 @@ def main():
     ECC.setup_email(service_account_json=args.service_account_json,
                    impersonated_user=args.impersonated_user,
                    log=log)
+    if args.email_queue:
+        ECC.setup_email_queue(args.email_queue, log=log)
 
     # Send the desired emails
     if args.all:
@@ -1052,6 +1094,27 @@ def main():
     sent, not_sent = func(args, families, member_workgroups, family_workgroups,
                           submissions, cookies, log)
 
+    # If we queued the emails, now actually send them
+    if args.email_queue:
+        counts = ECC.send_queued_emails(log, workers=args.email_workers,
+                                        rate=args.email_rate)
+        if counts.get('failed', 0) > 0:
+            log.error(f"Failed to send {counts['failed']} emails; see the email queue {args.email_queue} for details")
+
+        # Only report the Families whose emails actually went out as
+        # sent
+        statuses = ECC.email_queue_statuses()
+        queued = sent
+        sent = list()
+        for family in queued:
+            key = family['stewardship'].get('queue key')
+            status, error = statuses.get(key, ('sent', None))
+            if status == 'sent':
+                sent.append(family)
+            else:
+                family['stewardship']['reason not sent'] = f'Email {status}: {error}'
+                not_sent.append(family)
+
     # Record who/what we sent
     ts = datetime.datetime.now().strftime('%Y-%m-%d-%H%M%S')
     write_email_csv(sent,     f'emails-sent-{ts}.csv',     extra=True, log=log)
@@ -7,7 +7,12 @@ import sys
 import collections
 import traceback
 import datetime
+import json
+import queue
+import threading
+import concurrent.futures
 import csv
+import io
 import os
 import re
 
@@ -32,8 +37,11 @@ sys.path.insert(0, moddir)
 
 import ECC
 import Google
+import ECCUploader
+import ECCXlsxWriter
 import ParishSoftv2 as ParishSoft
 import GoogleAuth
+from google.api_core import retry
 
 import helpers
 
@@ -42,7 +50,6 @@ from datetime import datetime
 from datetime import timedelta
 
 from oauth2client import tools
-from googleapiclient.http import MediaFileUpload
 
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
@@ -89,9 +96,12 @@ family_participation_email_to = f'mary{ecc},jeff@squyres.com'
 pledge_email_to = family_participation_email_to
 pledge_email_subject = 'Pledge PS CSV import file'
 
-# Use this field name in the PS member dictionary to store some
-# jotform results
-member_extras_key = 'jotform extras'
+# Directory where the parsed Jotform Google Sheet is cached (see
+# read_jotform_gsheet())
+jotform_cache_dir = 'jotform-cache'
+
+# Number of reports to run at the same time
+report_workers = 4
 
 # We accidentally included some test data in the final spreadsheet.
 # So set the earliest date of actual data that we care about.
@@ -109,19 +119,12 @@ pledge_email_to = statistics_email_to
 def _upload_to_gsheet(google, google_folder_id, google_filename, mime_type, local_filename, remove_local, log):
     try:
         log.info(f'Uploading file to google "{local_filename}" -> "{google_filename}"')
-        metadata = {
-            'name'     : google_filename,
-            'mimeType' : Google.mime_types['sheet'],
-            'parents'  : [ google_folder_id ],
-            'supportsTeamDrives' : True,
-            }
-        media = MediaFileUpload(local_filename,
-                                mimetype=Google.mime_types[mime_type],
-                                resumable=True)
-        file = google.files().create(body=metadata,
-                                     media_body=media,
-                                     supportsTeamDrives=True,
-                                     fields='id').execute()
+        file = ECCUploader.upload_file(google, local_filename,
+                                       mimetype=Google.mime_types[mime_type],
+                                       google_mimetype=Google.mime_types['sheet'],
+                                       folder_id=google_folder_id,
+                                       name=google_filename,
+                                       log=log)
         log.debug(f'Successfully uploaded file: "{google_filename}" (ID: {file["id"]})')
 
     except:
@@ -194,7 +197,9 @@ def upload_csv_to_gsheet(google, google_folder_id, filename, fieldnames, csv_row
         writer.writerow(row)
     csvfile.close()
 
-    # Now upload that file to Google Drive
+    # Now upload that file to Google Drive (if the report has not
+    # changed since it was last uploaded, ECCUploader skips the upload
+    # and just returns the existing Google Sheet)
     id = _upload_to_gsheet(google,
                         google_folder_id=google_folder_id,
                         google_filename=google_filename,
@@ -460,11 +465,18 @@ def statistics_graph(ps_members, ps_families, jotform, log):
 
     #------------------------------------------------------------------------
 
-    def _compute(start, end, ps_members, ps_families, jotform, log):
-        # Compute these values just in the date range:
-        # - How many unique family submissions total?
-
-        family_submitted = dict()
+    # Compute the number of unique family submissions on each day, and
+    # the cumulative number of unique family submissions through each
+    # day.  Day 0 is "earliest".
+    #
+    # Make a single pass over the submissions: put each family in a
+    # bucket for every day that they submitted, and note the first day
+    # that they submitted.  The cumulative count is then just a running
+    # total of how many families submitted for the first time on each
+    # day.
+    def _compute(earliest, num_days, ps_families, jotform, log):
+        families_per_day = [ set() for _ in range(num_days) ]
+        first_day        = dict()
 
         # Check electronic submissions
         for row in jotform:
@@ -472,8 +484,9 @@ def statistics_graph(ps_members, ps_families, jotform, log):
                 continue # Skip title row
 
             # Is this row in our date range?
-            dt = helpers.jotform_date_to_datetime(row['SubmitDate'])
-            if dt < start or dt > end:
+            dt  = helpers.jotform_date_to_datetime(row['SubmitDate'])
+            day = (dt - earliest).days
+            if day < 0 or day >= num_days:
                 continue
 
             fduid = int(row['fduid'])
@@ -483,9 +496,22 @@ def statistics_graph(ps_members, ps_families, jotform, log):
             if fduid not in ps_families:
                 continue
 
-            family_submitted[fduid] = True
+            families_per_day[day].add(fduid)
+            if fduid not in first_day or day < first_day[fduid]:
+                first_day[fduid] = day
+
+        new_per_day = [ 0 ] * num_days
+        for day in first_day.values():
+            new_per_day[day] += 1
 
-        return len(family_submitted)
+        per_day    = [ len(families) for families in families_per_day ]
+        cumulative = list()
+        total      = 0
+        for count in new_per_day:
+            total += count
+            cumulative.append(total)
+
+        return per_day, cumulative
 
     #------------------------------------------------------------------------
 
@@ -501,30 +527,15 @@ def statistics_graph(ps_members, ps_families, jotform, log):
     log.info(f"Earliest: {earliest}")
     log.info(f"Latest:   {latest}")
 
-    day             = earliest
-    dates           = list()
-    data_per_day    = list()
-    data_cumulative = list()
-
     # Make lists that we can give to matplotlib for plotting
-    while day <= latest:
-        log.debug(f"Get per-day stats for {day.date()}")
-        per_day    = _compute(day, day + one_day,
-                              ps_members, ps_families,
-                              jotform, log)
-        log.debug(f"Get cumulative stats for {earliest} - {day + one_day}")
-        cumulative = _compute(earliest, day + one_day,
-                              ps_members, ps_families,
-                              jotform, log)
+    num_days = max(0, (latest - earliest).days + 1)
+    dates    = [ (earliest + i * one_day).date() for i in range(num_days) ]
+    data_per_day, data_cumulative = _compute(earliest, num_days,
+                                             ps_families, jotform, log)
 
+    for day, per_day, cumulative in zip(dates, data_per_day, data_cumulative):
         log.debug(f"Date: {day}: per day {per_day}, cumulative {cumulative}")
 
-        dates.append(day.date())
-        data_per_day.append(per_day)
-        data_cumulative.append(cumulative)
-
-        day += one_day
-
     # Make the plot
     fig, ax = plt.subplots()
 
@@ -1259,14 +1270,18 @@ def _status_to_str(status):
 
 ##############################################################################
 
-# Generic helper function that traverses each Family in the jotform,
-# and each Member's submission in that Family.  Callback hook
-# functions to process each.
-def traverse_jotform_members(ps_families, ps_members,
-                             jotform_list,
-                             per_family_func, per_family_state,
-                             per_member_func, per_member_state,
-                             log):
+# Find the PS Family and Members for each Family's submission in the
+# jotform.  This is done once per jotform list (see the report
+# registry in main()), and the result is shared by all the reports
+# that call traverse_jotform_members().
+#
+# Returns a list of dictionaries, one for each Family submission:
+# - jrow: the jotform row
+# - family: the PS Family
+# - members: list of (jotform member number, PS Member) tuples
+def resolve_jotform_members(ps_families, ps_members, jotform_list, log):
+    submissions = list()
+
     # Each row is a family
     for jrow in jotform_list:
         fduid = int(jrow['fduid'])
@@ -1279,10 +1294,8 @@ def traverse_jotform_members(ps_families, ps_members,
         family = ps_families[fduid]
         log.info(f"Processing Jotform Family submission: {family['firstName']} {family['lastName']} (FDUID {fduid})")
 
-        if per_family_func:
-            per_family_func(jrow, family, per_family_state, log)
-
         # Check the members in this row
+        members = list()
         for member_num in range(MAX_PS_FAMILY_MEMBER_NUM):
             column_names = jotform_gsheet_columns['members'][member_num]
             # The 0th entry in each Member is the MDUID
@@ -1302,8 +1315,31 @@ def traverse_jotform_members(ps_families, ps_members,
 
             member = ps_members[mduid]
             log.info(f"  Processing Jotform member {member['emailAddress']} (MDUID {mduid})")
+            members.append((member_num, member))
+
+        submissions.append({
+            'jrow'    : jrow,
+            'family'  : family,
+            'members' : members,
+        })
+
+    return submissions
 
-            if per_member_func:
+# Generic helper function that traverses each Family in the jotform
+# (as returned by resolve_jotform_members()), and each Member's
+# submission in that Family.  Callback hook functions to process each.
+def traverse_jotform_members(jotform_members,
+                             per_family_func, per_family_state,
+                             per_member_func, per_member_state,
+                             log):
+    for submission in jotform_members:
+        jrow = submission['jrow']
+
+        if per_family_func:
+            per_family_func(jrow, submission['family'], per_family_state, log)
+
+        if per_member_func:
+            for member_num, member in submission['members']:
                 per_member_func(jrow, member_num, member,
                                 per_member_state, log)
 
@@ -1335,8 +1371,7 @@ def traverse_jotform_members(ps_families, ps_members,
 #   - interested: list of members
 #   - no_longer_interested: list of members
 #   - needs_human: list of members
-def analyze_member_ministry_submissions(ps_members, ps_families, ps_ministries,
-                                        jotform_csv, log):
+def analyze_member_ministry_submissions(ps_ministries, jotform_members, log):
     def _get_ps_member_ministry_status(member, ministry_names):
         ministry = None
         for m_duid, m_data in ps_ministries.items():
@@ -1459,8 +1494,7 @@ def analyze_member_ministry_submissions(ps_members, ps_families, ps_ministries,
         'num_members_needs_human' : 0,
     }
 
-    traverse_jotform_members(ps_families, ps_members,
-                             jotform_csv,
+    traverse_jotform_members(jotform_members,
                              None, None,
                              _analyze_member, state,
                              log)
@@ -1474,8 +1508,7 @@ def analyze_member_ministry_submissions(ps_members, ps_families, ps_ministries,
 #-----------------------------------------------------------------------------
 
 def member_ministry_csv_report(args, google, start, end, time_period,
-                               ps_members, ps_families, ps_ministries,
-                               jotform_csv, log):
+                               ps_ministries, jotform_members, log):
     def _find_all_phones(member):
         found = list()
 
@@ -1509,55 +1542,30 @@ def member_ministry_csv_report(args, google, start, end, time_period,
     #--------------------------------------------------------------------
 
     today  = date.today()
-    output = analyze_member_ministry_submissions(ps_members, ps_families,
-                                                 ps_ministries,
-                                                 jotform_csv, log)
+    output = analyze_member_ministry_submissions(ps_ministries,
+                                                 jotform_members, log)
 
     #--------------------------------------------------------------------
 
-    title_font  = Font(color='FFFF00')
-    title_fill  = PatternFill(fgColor='0000FF', fill_type='solid')
-    title_align = Alignment(horizontal='center', wrap_text=True)
-
-    wrap_align  = Alignment(horizontal='general', wrap_text=True)
+    styles = {
+        'title' : {
+            'font'      : Font(color='FFFF00'),
+            'fill'      : PatternFill(fgColor='0000FF', fill_type='solid'),
+            'alignment' : Alignment(horizontal='center', wrap_text=True),
+        },
+        'wrap' : {
+            'alignment' : Alignment(horizontal='general', wrap_text=True),
+        },
+    }
 
     #--------------------------------------------------------------------
 
     def _doit(output, filename_suffix, category_match, log):
 
-        def _setup_new_workbook(xlsx_cols):
-            workbook    = Workbook()
-            sheet       = workbook.active
-
-            for data in xlsx_cols.values():
-                col            = data['column']
-                cell           = sheet.cell(row=1, column=col, value=data['name'])
-                cell.fill      = title_fill
-                cell.font      = title_font
-                cell.alignment = title_align
-
-                col_char = chr(ord('A') - 1 + col)
-                sheet.column_dimensions[col_char].width = data['width']
-
-            sheet.freeze_panes = sheet['A2']
-
-            return workbook
-
-        #--------------------------------------------------------------------
-
-        def _fill(col_name, value, align=None, format=None):
-            col_data = xlsx_cols[col_name]
-            cell     = sheet.cell(row=xlsx_row, column=col_data['column'], value=value)
-            if align:
-                cell.alignment = align
-            if format:
-                cell.number_format = format
-
-        #--------------------------------------------------------------------
-
-        def _add_col(name, width=10):
+        def _add_col(name, width=10, style=None):
             col             = len(xlsx_cols) + 1
-            xlsx_cols[name] = {'name' : name, 'column' : col, 'width' : width }
+            xlsx_cols[name] = {'name' : name, 'column' : col, 'width' : width,
+                               'style' : style }
 
         #--------------------------------------------------------------------
 
@@ -1568,52 +1576,59 @@ def member_ministry_csv_report(args, google, start, end, time_period,
         _add_col('Age')
         _add_col('Mem DUID')
         _add_col('Email', width=30)
-        _add_col('Member phones', width=20)
+        _add_col('Member phones', width=20, style='wrap')
         _add_col('Family home phone', width=20)
-        _add_col('Category', width=25)
-        _add_col('Current ministry status', width=20)
+        _add_col('Category', width=25, style='wrap')
+        _add_col('Current ministry status', width=20, style='wrap')
         _add_col('PS ministry name', width=50)
 
-        for ministry_name in sorted(output.keys()):
-            workbook = _setup_new_workbook(xlsx_cols)
-            sheet    = workbook.active
+        widths     = [ data['width'] for data in xlsx_cols.values() ]
+        col_styles = [ data['style'] for data in xlsx_cols.values() ]
 
+        for ministry_name in sorted(output.keys()):
             data = output[ministry_name]
-            xlsx_row = 2
+            rows = list()
             for category in sorted(data.keys()):
                 match = re.search(category_match, category)
                 if match is None:
                     continue
 
                 for member in data[category]:
-                    family = member['py family']
-
-                    _fill('Full Name', member['py friendly name FL'])
-                    _fill('First', member['firstName'])
-                    _fill('Last', member['lastName'])
+                    age = None
                     if member['birthdate']:
-                        age = today - member['birthdate']
-                        _fill('Age', int(age.days / 365))
-                    _fill('Mem DUID', member['memberDUID'])
-                    _fill('Email', member['emailAddress'])
-                    _fill('Member phones', _find_all_phones(member), align=wrap_align)
-                    _fill('Family home phone', _find_family_home_phone(member))
-                    _fill('Category', category.capitalize(), align=wrap_align)
-                    _fill('Current ministry status', member['jotform'][ministry_name],
-                          align=wrap_align)
-                    _fill('PS ministry name', ministry_name)
-
-                    xlsx_row += 1
+                        age = int((today - member['birthdate']).days / 365)
+
+                    rows.append([
+                        member['py friendly name FL'],
+                        member['firstName'],
+                        member['lastName'],
+                        age,
+                        member['memberDUID'],
+                        member['emailAddress'],
+                        _find_all_phones(member),
+                        _find_family_home_phone(member),
+                        category.capitalize(),
+                        member['jotform'][ministry_name],
+                        ministry_name,
+                    ])
 
             # If there was no data here, don't bother writing out the XLSX
-            if xlsx_row <= 2:
+            if len(rows) == 0:
                 continue
 
             # Write out the XLSX with the results
             filename = f'{ministry_name} {filename_suffix}.xlsx'.replace('/', '-')
             if os.path.exists(filename):
                 os.unlink(filename)
-            workbook.save(filename)
+
+            xlsx  = ECCXlsxWriter.XlsxWriter(filename, styles)
+            sheet = xlsx.add_sheet(column_widths=widths, freeze_panes='A2')
+            sheet.append([ data['name'] for data in xlsx_cols.values() ],
+                         style='title')
+            for row in rows:
+                sheet.append(row, styles=col_styles)
+            xlsx.save()
+
             log.info(f"Wrote to filename: {filename}")
 
     _doit(output, "interested", 'Interested', log)
@@ -1628,7 +1643,14 @@ def member_ministry_csv_report(args, google, start, end, time_period,
 #   - prayer group
 #   - small prayer group (yes/no)
 #   - protect (dishwasher, recycle helper)
-def extract_member_extras(ps_families, ps_members, jotform_list, log):
+#
+# Returns a dictionary of MDUID -> that Member's extras.  This is kept
+# separate from the PS Member dictionaries (rather than being stored
+# in them) because other reports may be reading those at the same
+# time.
+def extract_member_extras(jotform_members, log):
+    extras = dict()
+
     def _extract(jotform_row, member_jotform_num, member, state, log):
         item = dict()
         for name in jotform_gsheet_columns['per-member epilog']:
@@ -1637,24 +1659,24 @@ def extract_member_extras(ps_families, ps_members, jotform_list, log):
             if value and len(value) > 0:
                 item[name] = value.split('\n')
 
-        member[member_extras_key] = item
+        extras[member['memberDUID']] = item
 
-    traverse_jotform_members(ps_families, ps_members, jotform_list,
+    traverse_jotform_members(jotform_members,
                              None, None,
                              _extract, None,
                              log)
 
+    return extras
+
 #-----------------------------------------------------------------------------
 
-def _member_extras_csv(ps_members, google, key, filename, log):
+def _member_extras_csv(ps_members, member_extras, google, key, filename, log):
     # Find all the possible values of this field
     values = dict()
-    for mduid, member in ps_members.items():
-        if member_extras_key not in member:
-            continue
-        if key not in member[member_extras_key]:
+    for mduid, extras in member_extras.items():
+        if key not in extras:
             continue
-        for value in member[member_extras_key][key]:
+        for value in extras[key]:
             values[value] = True
 
     # Write these all out into a file
@@ -1665,39 +1687,38 @@ def _member_extras_csv(ps_members, google, key, filename, log):
         writer = csv.DictWriter(fp, fieldnames=fields)
         writer.writeheader()
 
-        for mduid, member in ps_members.items():
-            if member_extras_key not in member:
-                continue
-            if key not in member[member_extras_key]:
+        for mduid, extras in member_extras.items():
+            if key not in extras:
                 continue
 
+            member = ps_members[mduid]
             item = {
                 'Member' : member['py friendly name FL'],
                 'MDUID' : mduid,
             }
-            for value in member[member_extras_key][key]:
+            for value in extras[key]:
                 item[value] = 'Yes'
             writer.writerow(item)
 
     log.info(f"Wrote {filename}")
 
-def member_group_prayer_events_csv_report(ps_members, google, log):
+def member_group_prayer_events_csv_report(ps_members, member_extras, google, log):
     # This key field is defined in constants.py
     key = 'member group prayer events'
     filename = 'member-group-prayer-events.csv'
-    _member_extras_csv(ps_members, google, key, filename, log)
+    _member_extras_csv(ps_members, member_extras, google, key, filename, log)
 
-def member_small_group_prayer_csv_report(ps_members, google, log):
+def member_small_group_prayer_csv_report(ps_members, member_extras, google, log):
     # This key field is defined in constants.py
     key = 'member small prayer group'
     filename = 'member-small-prayer-group.csv'
-    _member_extras_csv(ps_members, google, key, filename, log)
+    _member_extras_csv(ps_members, member_extras, google, key, filename, log)
 
-def member_protect_csv_report(ps_members, google, log):
+def member_protect_csv_report(ps_members, member_extras, google, log):
     # This key field is defined in constants.py
     key = 'member protect'
     filename = 'member-protect.csv'
-    _member_extras_csv(ps_members, google, key, filename, log)
+    _member_extras_csv(ps_members, member_extras, google, key, filename, log)
 
 ##############################################################################
 
@@ -1749,85 +1770,148 @@ def count_ministry_participation(members, families, log):
 
 ##############################################################################
 
-def _export_gsheet_to_csv(service, start, end, google_sheet_id, fieldnames, log):
+# The Jotform Google Sheet is exported and parsed (at most) once per
+# run, and all the reports use the same parsed rows:
+#
+# - In memory, the parsed rows are saved in _jotform_rows (indexed by
+#   Google file ID).
+# - On disk, the parsed rows are saved in a JSON file in the cache
+#   directory, along with the Google Drive version number of the sheet
+#   that they came from.  Google increments the version number every
+#   time the sheet changes, so if the version is the same the next
+#   time we run, we use the cached rows and don't export the sheet at
+#   all.
+
+_jotform_rows = dict()
+
+# csv.DictReader puts the values of any columns beyond the end of the
+# fieldnames in the "None" key of the row.  JSON can't have "None" as
+# a key, so use this key in the cache file instead.
+_cache_restkey = '(extra columns)'
+
+@retry.Retry(predicate=Google.retry_errors)
+def _get_gsheet_version(service, google_sheet_id):
+    gfile = service.files().get(fileId=google_sheet_id,
+                                fields='version,modifiedTime',
+                                supportsAllDrives=True).execute()
+    return gfile['version']
+
+def _read_gsheet_cache(filename, version, fieldnames, log):
+    if not os.path.exists(filename):
+        return None
+
+    try:
+        with open(filename) as fp:
+            cache = json.load(fp)
+    except ValueError as e:
+        log.warning(f"Ignoring corrupt Jotform cache {filename}: {e}")
+        return None
+
+    if cache.get('version') != version or cache.get('fieldnames') != fieldnames:
+        return None
+
+    rows = cache['rows']
+    for row in rows:
+        if _cache_restkey in row:
+            row[None] = row.pop(_cache_restkey)
+
+    return rows
+
+def _write_gsheet_cache(filename, version, fieldnames, rows):
+    out = list()
+    for row in rows:
+        if None in row:
+            row = row.copy()
+            row[_cache_restkey] = row.pop(None)
+        out.append(row)
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmp_filename = f'{filename}.tmp'
+    with open(tmp_filename, 'w') as fp:
+        json.dump({
+            'version'    : version,
+            'fieldnames' : fieldnames,
+            'rows'       : out,
+        }, fp)
+    os.replace(tmp_filename, filename)
+
+def _export_gsheet_to_csv(service, google_sheet_id, fieldnames, log):
     response = service.files().export(fileId=google_sheet_id,
                                       mimeType=Google.mime_types['csv']).execute()
 
-    # Write the result into a temp file so that csv can re-read the file and
-    # parse newlines in fields correctly.
-    filename = 'tempfile-google-data.csv'
-    if os.path.exists(filename):
-        os.unlink(filename)
-    with open(filename, 'w') as fp:
-        raw_data = response.decode('utf-8')
-        fp.write(raw_data)
-
-    # Second pass: rewrite the file with the desired column names
-    with open(filename, newline='') as fp:
-        csvreader = csv.DictReader(fp,
-                                   fieldnames=fieldnames)
-
-        rows = list()
-        for i, row in enumerate(csvreader):
-            # Skip title row
-            if i == 0:
-                # This debug output is exceedingly helpful in determining
-                # whether the constants.py fieldnames match the actual
-                # Jotform-exported column names.
-                col = 1
-                log.debug("Column comparison: actual Jotform columns vs. python hard-coded columns from constants.py")
-                for fieldname in fieldnames:
-                    actual = row[fieldname]
-                    desired = fieldname
-                    log.debug(f"Column {col}: actual='{actual}' desired='{desired}'")
-                    col += 1
+    # Parse the export in memory (newline='' so that csv parses
+    # newlines in fields correctly), with the desired column names
+    fp = io.StringIO(response.decode('utf-8'), newline='')
+    csvreader = csv.DictReader(fp,
+                               fieldnames=fieldnames)
+
+    rows = list()
+    for i, row in enumerate(csvreader):
+        # Skip title row
+        if i == 0:
+            # This debug output is exceedingly helpful in determining
+            # whether the constants.py fieldnames match the actual
+            # Jotform-exported column names.
+            col = 1
+            log.debug("Column comparison: actual Jotform columns vs. python hard-coded columns from constants.py")
+            for fieldname in fieldnames:
+                actual = row[fieldname]
+                desired = fieldname
+                log.debug(f"Column {col}: actual='{actual}' desired='{desired}'")
+                col += 1
 
-                continue
+            continue
 
-            #----------------------------------
+        #----------------------------------
 
-            # Some Jotform submissions just have a blank FUID.
-            # Shrug.  Skip them.
-            if row['fduid'] == '':
-                continue
+        # Some Jotform submissions just have a blank FUID.
+        # Shrug.  Skip them.
+        if row['fduid'] == '':
+            continue
 
-            # As of Sep 2021, Google Sheets CSV export sucks. :-(
-            # The value of the "Edit Submission" field from Jotform is something
-            # like:
-            #
-            # =HYPERLINK("https://www.jotform.com/edit/50719736733810","Edit Submission")
-            #
-            # Google Sheet CSV export splits this into 2 fields.  The first one
-            # has a column heading of "Edit Submission" (which is what the
-            # Jotform-created sheet column heading it) and contains the long number
-            # in the URL.  The 2nd one has no column heading, and is just the words
-            # "Edit Submission".  :-(  CSV.DictReader therefore puts a value of
-            # "Edit Submission" in a dict entry of "None" (because it has no column
-            # heading).
-            #
-            # For our purposes here, just delete the "None" entry from the
-            # DictReader.
-            if None in row and row[None] == ['Edit Submission']:
-                del row[None]
-
-            # Is this submission between start and end?
-            if start is not None and end is not None:
-                submit_date = helpers.jotform_date_to_datetime(row['SubmitDate'])
-                if submit_date < start or submit_date > end:
-                    continue
+        # As of Sep 2021, Google Sheets CSV export sucks. :-(
+        # The value of the "Edit Submission" field from Jotform is something
+        # like:
+        #
+        # =HYPERLINK("https://www.jotform.com/edit/50719736733810","Edit Submission")
+        #
+        # Google Sheet CSV export splits this into 2 fields.  The first one
+        # has a column heading of "Edit Submission" (which is what the
+        # Jotform-created sheet column heading it) and contains the long number
+        # in the URL.  The 2nd one has no column heading, and is just the words
+        # "Edit Submission".  :-(  CSV.DictReader therefore puts a value of
+        # "Edit Submission" in a dict entry of "None" (because it has no column
+        # heading).
+        #
+        # For our purposes here, just delete the "None" entry from the
+        # DictReader.
+        if None in row and row[None] == ['Edit Submission']:
+            del row[None]
 
-            rows.append(row)
+        rows.append(row)
 
-    # Remove the temporary file used to store the google results
-    os.unlink(filename)
+    return rows
 
+def _load_jotform_rows(service, google_sheet_id, fieldnames, log):
+    if google_sheet_id in _jotform_rows:
+        return _jotform_rows[google_sheet_id]
+
+    version  = _get_gsheet_version(service, google_sheet_id)
+    filename = os.path.join(jotform_cache_dir, f'{google_sheet_id}.json')
+    rows     = _read_gsheet_cache(filename, version, fieldnames, log)
+    if rows is not None:
+        log.info(f"Jotform data unchanged since last run (version {version}); using cached data")
+    else:
+        log.info(f"Downloading Jotform raw data ({google_sheet_id}, version {version})...")
+        rows = _export_gsheet_to_csv(service, google_sheet_id, fieldnames, log)
+        _write_gsheet_cache(filename, version, fieldnames, rows)
+
+    _jotform_rows[google_sheet_id] = rows
     return rows
 
 #-----------------------------------------------------------------------------
 
 def read_jotform_gsheet(google, start, end, fieldnames, gfile_id, log):
-    log.info(f"Downloading Jotform raw data ({gfile_id})...")
-
     # Some of the field names will be lists.  In those cases, use the first
     # field name in the list.
     final_fieldnames = list()
@@ -1837,8 +1921,7 @@ def read_jotform_gsheet(google, start, end, fieldnames, gfile_id, log):
     final_fieldnames.extend(fieldnames['family'])
     final_fieldnames.extend(fieldnames['epilog'])
 
-    csv_data = _export_gsheet_to_csv(google, start, end, gfile_id,
-                                      final_fieldnames, log)
+    csv_data = _load_jotform_rows(google, gfile_id, final_fieldnames, log)
 
     # Deduplicate: save the last row number for any given FDUID
     # (we only really care about the *last* entry that someone makes)
@@ -1850,6 +1933,12 @@ def read_jotform_gsheet(google, start, end, fieldnames, gfile_id, log):
         if fduid == 'Family DUID':
             continue
 
+        # Is this submission between start and end?
+        if start is not None and end is not None:
+            submit_date = helpers.jotform_date_to_datetime(row['SubmitDate'])
+            if submit_date < start or submit_date > end:
+                continue
+
         out_dict[fduid] = row
 
     # Turn this dictionary into a list of rows
@@ -1859,6 +1948,110 @@ def read_jotform_gsheet(google, start, end, fieldnames, gfile_id, log):
 
 ##############################################################################
 
+# Reports are run from a registry (see main()).  Each report is a
+# dictionary:
+#
+# - name: unique name of the report
+# - enabled: whether to run the report
+# - inputs: list of names of the inputs that the report needs.  An
+#   input is either a value computed by one of the input providers, or
+#   the return value of another report (in which case that report is
+#   run first).
+# - serial: (optional) if True, don't run this report at the same
+#   time as any other serial report (e.g., reports that use matplotlib,
+#   which is not thread safe)
+# - func: function(google, inputs) that runs the report.  "inputs" is
+#   a dictionary of all the input values.
+#
+# Input providers are a dictionary of name -> (list of input names,
+# function(inputs)).  Only the inputs that an enabled report needs are
+# computed, and each one is computed only once (in the main thread),
+# no matter how many reports use it.
+#
+# Reports whose inputs are ready are run in parallel in a pool of
+# threads.  Google API service objects are not thread safe, so
+# "services" is a queue of Google Drive service objects: each report
+# takes one while it runs.
+
+def _compute_input(name, providers, values, log):
+    if name in values:
+        return values[name]
+
+    if name not in providers:
+        log.critical(f"Unknown report input: {name}")
+        exit(1)
+
+    needs, func = providers[name]
+    for need in needs:
+        _compute_input(need, providers, values, log)
+
+    log.info(f"Computing report input: {name}")
+    values[name] = func(values)
+    return values[name]
+
+def run_reports(reports, providers, values, services, workers, log):
+    by_name = { report['name'] : report for report in reports }
+
+    # Figure out which reports we need to run: the enabled reports,
+    # and any reports that they need as inputs
+    todo = dict()
+    def _need(report):
+        if report['name'] in todo:
+            return
+        todo[report['name']] = report
+        for name in report['inputs']:
+            if name in by_name:
+                _need(by_name[name])
+
+    for report in reports:
+        if report['enabled']:
+            _need(report)
+
+    # Compute all the inputs that these reports need
+    for report in todo.values():
+        for name in report['inputs']:
+            if name not in by_name:
+                _compute_input(name, providers, values, log)
+
+    serial_lock = threading.Lock()
+
+    def _run(report):
+        google = services.get()
+        try:
+            log.info(f"Running report: {report['name']}")
+            inputs = { name : values[name] for name in report['inputs'] }
+            if report.get('serial', False):
+                with serial_lock:
+                    return report['func'](google, inputs)
+            else:
+                return report['func'](google, inputs)
+        finally:
+            services.put(google)
+
+    # Run each report as soon as all the reports it needs are done
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        running = dict()
+        while len(todo) > 0 or len(running) > 0:
+            for name, report in list(todo.items()):
+                waiting = [ need for need in report['inputs']
+                            if need in by_name and need not in values ]
+                if len(waiting) == 0:
+                    running[executor.submit(_run, report)] = name
+                    del todo[name]
+
+            if len(running) == 0:
+                log.critical(f"Reports have circular inputs: {', '.join(todo)}")
+                exit(1)
+
+            done, _ = concurrent.futures.wait(running,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                values[name] = future.result()
+                log.info(f"Finished report: {name}")
+
+##############################################################################
+
 def setup_args():
     tools.argparser.add_argument('--gdrive-folder-id',
                                  help='If specified, upload a Google Sheet containing the results to this Team Drive folder')
@@ -1892,11 +2085,23 @@ def setup_args():
                                  default='ps-data',
                                  help='Directory to cache the ParishSoft data')
 
+    tools.argparser.add_argument('--report-workers',
+                                 type=int,
+                                 default=report_workers,
+                                 help=f'Number of reports to run at the same time (default: {report_workers})')
+
+    global jotform_cache_dir
+    tools.argparser.add_argument('--jotform-cache-dir',
+                                 default=jotform_cache_dir,
+                                 help='Directory to cache the parsed Jotform Google Sheet data')
+
     tools.argparser.add_argument('--debug', action='store_true',
                                  help='Enable additional debug logging')
 
     args = tools.argparser.parse_args()
 
+    jotform_cache_dir = args.jotform_cache_dir
+
     # Read the PS API key
     if not os.path.exists(args.ps_api_keyfile):
         print(f"ERROR: ParishSoft API keyfile does not exist: {args.ps_api_keyfile}")
@@ -1972,25 +2177,16 @@ def main():
                                               log=log)
     google = services['drive']
 
-    #---------------------------------------------------------------
-
-    # Load all the results
-    log.info(f"Reading Jotform {stewardship_year} data...")
-    jotform_all_list, jotform_all_dict = read_jotform_gsheet(google,
-                                    start=None, end=None,
-                                    fieldnames=jotform_gsheet_columns,
-                                    gfile_id=jotform_gsheet_gfile_id,
-                                    log=log)
-
-    # Load a range of results
-    if start is None:
-        jotform_range_list = jotform_all_list.copy()
-    else:
-        jotform_range_list, jotform_range_dict = read_jotform_gsheet(google,
-                                    start=start, end=end,
-                                    fieldnames=jotform_gsheet_columns,
-                                    gfile_id=jotform_gsheet_gfile_id,
-                                    log=log)
+    # Google API service objects are not thread safe, so make one
+    # Drive service object for each report worker thread.
+    drive_services = queue.Queue()
+    drive_services.put(google)
+    for _ in range(args.report_workers - 1):
+        s = GoogleAuth.service_oauth_login(apis,
+                                           app_json=args.app_id,
+                                           user_json=args.user_credentials,
+                                           log=log)
+        drive_services.put(s['drive'])
 
     #---------------------------------------------------------------
 
@@ -2000,78 +2196,169 @@ def main():
 
     #---------------------------------------------------------------
 
-    # These are periodic reports that are run during the campaign
-    # JMS Ran the final one of these for Doug/Don
-    if False:
-        # Stats of how many families have submitted, etc.
-        statistics_report(args, time_period, members, families,
-                          member_workgroups,
-                          jotform_all_list, log)
-
-    # Get a list of who has not submitted yet
-    if False:
-        unsubmitted_report(args, families, member_workgroups,
-                           jotform_all_dict, log)
-
-    # JMS Ran this for Doug
-    comments_gfile = None
-    if True:
-        # A collection of all the random text comments that people
-        # submitted (so that staff members can act on them).
-        comments_gfile = comments_report(args, google, start, end, time_period,
-                                         jotform_range_list, log)
-
-    # JMS: Ran this for Mary and Angie
-    if False:
-        # A comparison of this year's pledges vs. last year's pledges.
-        pledge_gfile = None
-        # Looks like we don't really need to load the Jotform from the
-        # prior year -- we have the 1 field we need in this year's
-        # jotform.
-        jotform_last_year = None
-
-        pledge_gfile = pledge_comparison_report(google, jotform_all_dict,
-                                                jotform_last_year, log)
-
-        #send_reports_email(time_period, comments_gfile, pledge_gfile, args, log)
+    # Inputs that the reports can use.  See run_reports().
+    values = {
+        'families'          : families,
+        'members'           : members,
+        'family workgroups' : family_workgroups,
+        'member workgroups' : member_workgroups,
+        'ministries'        : ministries,
+    }
 
-    if False:
-        # Compare who submitted census vs. stewardship
-        family_comparison_reports(args, google, families,
-                                  family_workgroups,
-                                  jotform_all_list, log)
+    def _read_jotform(start, end):
+        return read_jotform_gsheet(google,
+                                   start=start, end=end,
+                                   fieldnames=jotform_gsheet_columns,
+                                   gfile_id=jotform_gsheet_gfile_id,
+                                   log=log)
+
+    providers = {
+        # All the Jotform results: (list, dict)
+        'jotform all' : ([],
+            lambda i: _read_jotform(None, None)),
+
+        # The Jotform Families / Members in PS, shared by all the
+        # reports that traverse the Jotform Members
+        'jotform all members' : (['families', 'members', 'jotform all'],
+            lambda i: resolve_jotform_members(i['families'], i['members'],
+                                              i['jotform all'][0], log)),
+    }
 
-    ##########################################################
+    # The results in our time range: (list, dict)
+    if start is None:
+        providers['jotform range'] = (['jotform all'],
+            lambda i: i['jotform all'])
+        providers['jotform range members'] = (['jotform all members'],
+            lambda i: i['jotform all members'])
+    else:
+        providers['jotform range'] = ([],
+            lambda i: _read_jotform(start, end))
+        providers['jotform range members'] = (['families', 'members', 'jotform range'],
+            lambda i: resolve_jotform_members(i['families'], i['members'],
+                                              i['jotform range'][0], log))
+
+    reports = [
+        # These are periodic reports that are run during the campaign
+        {
+            # Stats of how many families have submitted, etc.
+            # JMS Ran the final one of these for Doug/Don
+            'name'    : 'statistics',
+            'enabled' : False,
+            'serial'  : True,
+            'inputs'  : ['members', 'families', 'member workgroups',
+                         'jotform all'],
+            'func'    : lambda google, i: \
+                statistics_report(args, time_period, i['members'],
+                                  i['families'], i['member workgroups'],
+                                  i['jotform all'][0], log),
+        },
+        {
+            # Get a list of who has not submitted yet
+            'name'    : 'unsubmitted',
+            'enabled' : False,
+            'inputs'  : ['families', 'member workgroups', 'jotform all'],
+            'func'    : lambda google, i: \
+                unsubmitted_report(args, i['families'], i['member workgroups'],
+                                   i['jotform all'][1], log),
+        },
+        {
+            # A collection of all the random text comments that people
+            # submitted (so that staff members can act on them).
+            # JMS Ran this for Doug
+            'name'    : 'comments',
+            'enabled' : True,
+            'inputs'  : ['jotform range'],
+            'func'    : lambda google, i: \
+                comments_report(args, google, start, end, time_period,
+                                i['jotform range'][0], log),
+        },
+        {
+            # A comparison of this year's pledges vs. last year's pledges.
+            # JMS: Ran this for Mary and Angie
+            #
+            # Looks like we don't really need to load the Jotform from
+            # the prior year -- we have the 1 field we need in this
+            # year's jotform.
+            'name'    : 'pledge comparison',
+            'enabled' : False,
+            'inputs'  : ['jotform all'],
+            'func'    : lambda google, i: \
+                pledge_comparison_report(google, i['jotform all'][1],
+                                         None, log),
+        },
+        {
+            'name'    : 'reports email',
+            'enabled' : False,
+            'inputs'  : ['comments', 'pledge comparison'],
+            'func'    : lambda google, i: \
+                send_reports_email(time_period, i['comments'],
+                                   i['pledge comparison'], args, log),
+        },
+        {
+            # Compare who submitted census vs. stewardship
+            'name'    : 'family comparison',
+            'enabled' : False,
+            'inputs'  : ['families', 'family workgroups', 'jotform all'],
+            'func'    : lambda google, i: \
+                family_comparison_reports(args, google, i['families'],
+                                          i['family workgroups'],
+                                          i['jotform all'][0], log),
+        },
 
-    # These reports are generally run after the campaign
-    # JMS: Ran this for Doug
-    if False:
-        # Raw list of pledges (I think this is importable to PS...?)
-        family_pledge_csv_report(args, google, families, jotform_all_list, log)
+        # These reports are generally run after the campaign
+        {
+            # Raw list of pledges (I think this is importable to PS...?)
+            # JMS: Ran this for Doug
+            'name'    : 'family pledge csv',
+            'enabled' : False,
+            'inputs'  : ['families', 'jotform all'],
+            'func'    : lambda google, i: \
+                family_pledge_csv_report(args, google, i['families'],
+                                         i['jotform all'][0], log),
+        },
+        {
+            # Per-ministry CSVs showing member status changes (given
+            # to staff members to review, and ultimately to make phone
+            # calls to followup).
+            # JMS Sent these to Doug
+            'name'    : 'member ministry csv',
+            'enabled' : False,
+            'inputs'  : ['ministries', 'jotform range members'],
+            'func'    : lambda google, i: \
+                member_ministry_csv_report(args, google, start, end,
+                                           time_period, i['ministries'],
+                                           i['jotform range members'], log),
+        },
+        {
+            # JMS We did not ask these questions / they were not
+            # included in 2026 eStewardship.  So there's no data to
+            # process.
+            'name'    : 'member extras',
+            'enabled' : False,
+            'inputs'  : ['jotform all members'],
+            'func'    : lambda google, i: \
+                extract_member_extras(i['jotform all members'], log),
+        },
+        {
+            'name'    : 'member extras csv',
+            'enabled' : False,
+            'inputs'  : ['members', 'member extras'],
+            'func'    : lambda google, i: \
+                (member_group_prayer_events_csv_report(i['members'], i['member extras'], google, log),
+                 member_small_group_prayer_csv_report(i['members'], i['member extras'], google, log),
+                 member_protect_csv_report(i['members'], i['member extras'], google, log)),
+        },
+        {
+            # JMS Sent these to Doug
+            'name'    : 'ministry participation',
+            'enabled' : True,
+            'inputs'  : ['members', 'families'],
+            'func'    : lambda google, i: \
+                count_ministry_participation(i['members'], i['families'], log),
+        },
+    ]
 
-    # JMS Sent these to Doug
-    if False:
-        # Per-ministry CSVs showing member status changes (given to
-        # staff members to review, and ultimately to make phone calls
-        # to followup).
-        member_ministry_csv_report(args, google, start, end, time_period,
-                                   members, families, ministries,
-                                   jotform_range_list, log)
-
-    # JMS We did not ask these questions / they were not included in
-    # 2026 eStewardship.  So there's no data to process.
-    if False:
-        # Per-ministry CSVs showing member status changes (given to
-        # staff members to review, and ultimately to make phone calls
-        # to followup).
-        extract_member_extras(families, members, jotform_all_list, log)
-
-        member_group_prayer_events_csv_report(members, google, log)
-        member_small_group_prayer_csv_report(members, google, log)
-        member_protect_csv_report(members, google, log)
-
-    # JMS Sent these to Doug
-    if True:
-        count_ministry_participation(members, families, log)
+    run_reports(reports, providers, values, drive_services,
+                args.report_workers, log)
 
 main()
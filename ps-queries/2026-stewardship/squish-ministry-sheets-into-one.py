@@ -18,10 +18,10 @@ sys.path.insert(0, moddir)
 
 import ECC
 import Google
+import ECCUploader
 import GoogleAuth
 
 from oauth2client import tools
-from googleapiclient.http import MediaFileUpload
 
 from google.api_core import retry
 
@@ -41,22 +41,14 @@ source_google_drive_folder = '12Y78o6g9Zilfr0XIJvTlAjKQUHDFwQSk'
 ##############################################################################
 
 def _upload_to_gsheet(google, google_folder_id, google_filename, mime_type, local_filename, remove_local, log):
-    @retry.Retry(predicate=Google.retry_errors)
     def _upload():
         log.info(f'Uploading file to google "{local_filename}" -> "{google_filename}"')
-        metadata = {
-            'name'     : google_filename,
-            'mimeType' : Google.mime_types['sheet'],
-            'parents'  : [ google_folder_id ],
-            'supportsTeamDrives' : True,
-            }
-        media = MediaFileUpload(local_filename,
-                                mimetype=Google.mime_types[mime_type],
-                                resumable=True)
-        file = google.files().create(body=metadata,
-                                     media_body=media,
-                                     supportsTeamDrives=True,
-                                     fields='id').execute()
+        file = ECCUploader.upload_file(google, local_filename,
+                                       mimetype=Google.mime_types[mime_type],
+                                       google_mimetype=Google.mime_types['sheet'],
+                                       folder_id=google_folder_id,
+                                       name=google_filename,
+                                       log=log)
         log.debug(f'Successfully uploaded file: "{google_filename}" (ID: {file["id"]})')
 
         return file
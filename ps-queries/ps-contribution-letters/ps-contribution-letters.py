@@ -8,13 +8,12 @@ import re
 import argparse
 import shutil
 import glob
+import concurrent.futures
 from pathlib import Path
 from email.utils import parseaddr, formataddr
 from pypdf import PdfReader, PdfWriter
 import pdfplumber
 
-import gmail_oauth_smtp
-
 # We assume that there is a "ecc-python-modules" sym link in this
 # directory that points to the directory with ECC.py and friends.
 moddir = os.path.join(os.getcwd(), 'ecc-python-modules')
@@ -27,35 +26,34 @@ sys.path.insert(0, moddir)
 
 import ECC
 import ParishSoftv2 as ParishSoft
+import ECCEmailQueue
+import gmail_oauth_smtp
 
-def extract_info(pdf_path):
+def parse_letter_info(text):
     """
-    Extract the Family Envelope Number and Name from the first page of a PDF letter.
+    Extract the Family Envelope Number and Name from the text of the first
+    page of a letter.
     Returns a tuple (envelope_number, name).
     """
-    with pdfplumber.open(pdf_path) as pdf:
-        first_page = pdf.pages[0]
-        text = first_page.extract_text()
+    # Split text into lines
+    lines = text.split('\n')
 
-        # Split text into lines
-        lines = text.split('\n')
+    envelope_num = None
+    name = None
 
-        envelope_num = None
-        name = None
+    # Find the line before the address (which should contain the envelope number)
+    for i, line in enumerate(lines):
+        stripped = line.strip()
 
-        # Find the line before the address (which should contain the envelope number)
-        for i, line in enumerate(lines):
-            stripped = line.strip()
+        # Check for envelope number line
+        match = re.match(r'^(\d+)\s+Date Printed:', stripped)
+        if match:
+            envelope_num = int(match.group(1))
 
-            # Check for envelope number line
-            match = re.match(r'^(\d+)\s+Date Printed:', stripped)
-            if match:
-                envelope_num = int(match.group(1))
-
-                # The name should be on the next line
-                if i + 1 < len(lines):
-                    name = lines[i+1].strip()
-                break
+            # The name should be on the next line
+            if i + 1 < len(lines):
+                name = lines[i+1].strip()
+            break
 
     return envelope_num, name
 
@@ -67,159 +65,198 @@ def sanitize_filename(name):
     s = s.replace(' ', '_')
     return s
 
-def split_pdf_into_letters(input_pdf_path, output_folder, log):
+def _scan_pages(input_pdf_path, first, last):
     """
-    Split a master PDF into individual letter PDFs.
+    Find the letter metadata on pages [first, last) (0-based) of a PDF.
+    This runs in a worker process.
+
+    Returns a list of (page_num, total_pages, envelope_num, name) tuples,
+    one for each page.  page_num and total_pages are from the "Page x of y"
+    footer in the page's pypdf text (or None if there is no footer).
+    envelope_num and name are only looked for on the first page of a
+    letter, in its pdfplumber text.
+    """
+    out = []
+    first_pages = []
+    reader = PdfReader(input_pdf_path)
+    for page_index in range(first, last):
+        text = reader.pages[page_index].extract_text() or ""
 
-    Uses "Page x of y" footer to determine letter boundaries.
+        # Look for "Page X of Y" pattern
+        # It usually appears at the bottom
+        page_num = total_pages = None
+        page_match = re.search(r'Page\s+(\d+)\s+of\s+(\d+)', text)
+        if page_match:
+            page_num = int(page_match.group(1))
+            total_pages = int(page_match.group(2))
+            if page_num == 1:
+                first_pages.append(len(out))
 
-    Returns a dictionary mapping Family Envelope Number to filename.
-    """
-    # Create output folder if it doesn't exist
-    output_path = Path(output_folder)
-    output_path.mkdir(parents=True, exist_ok=True)
+        out.append((page_num, total_pages, None, None))
 
-    # Read the input PDF
-    reader = PdfReader(input_pdf_path)
+    # Only parse the first pages of letters with pdfplumber
+    if first_pages:
+        with pdfplumber.open(input_pdf_path,
+                             pages=[ first + i + 1 for i in first_pages ]) as pdf:
+            for i, page in zip(first_pages, pdf.pages):
+                envelope_num, name = parse_letter_info(page.extract_text() or "")
+                out[i] = out[i][:2] + (envelope_num, name)
 
-    # Dictionary to store the mapping
-    family_mapping = {}
+                # Don't keep all the parsed page objects in memory
+                page.close()
 
-    # Track pages for current letter
-    current_letter_pages = []
-    current_page_count = 0
-    total_pages_in_letter = 0
+    return out
 
-    def save_letter(pages):
-        """Helper to save a list of pages as a PDF."""
-        # Create a temporary writer to extract info
-        temp_writer = PdfWriter()
-        temp_writer.add_page(pages[0])
+def _write_letters(input_pdf_path, letters):
+    """
+    Write letters from the pages of a PDF.  This runs in a worker process.
+    letters is a list of (filepath, list of 0-based page numbers).
+    """
+    reader = PdfReader(input_pdf_path)
+    for filepath, page_nums in letters:
+        writer = PdfWriter()
+        for page_num in page_nums:
+            writer.add_page(reader.pages[page_num])
 
-        # We need to save to a temp file to use pdfplumber for extraction
-        # or we could try to extract text directly from pypdf page object
-        # Let's use a temp file approach for consistency with existing extraction logic
-        temp_filename = output_path / "temp_extract.pdf"
-        with open(temp_filename, 'wb') as f:
-            temp_writer.write(f)
+        with open(filepath, 'wb') as f:
+            writer.write(f)
 
-        envelope_num, name = extract_info(temp_filename)
+def _chunks(items, num_chunks):
+    """Split a list into (at most) num_chunks contiguous lists."""
+    size = max(1, -(-len(items) // num_chunks))
+    return [ items[i:i + size] for i in range(0, len(items), size) ]
 
-        # Clean up temp file
-        if temp_filename.exists():
-            os.remove(temp_filename)
+def split_pdf_into_letters(input_pdf_path, output_folder, log, workers=None):
+    """
+    Split a master PDF into individual letter PDFs.
 
-        if name:
-            safe_name = sanitize_filename(name)
-            # Include envelope number to help ensure uniqueness
-            if envelope_num:
-                filename = f"{envelope_num}_{safe_name}.pdf"
-            else:
-                filename = f"{safe_name}.pdf"
-        else:
-            # Fallback if name not found
-            filename = f"letter_unknown_{len(family_mapping)}.pdf"
+    Uses "Page x of y" footer to determine letter boundaries.
 
-        filepath = output_path / filename
+    This is done in three steps:
 
-        # Ensure filename is unique - add counter if file exists
-        counter = 1
-        while filepath.exists():
-            if name:
-                safe_name = sanitize_filename(name)
-                if envelope_num:
-                    filename = f"{envelope_num}_{safe_name}_{counter}.pdf"
-                else:
-                    filename = f"{safe_name}_{counter}.pdf"
-            else:
-                filename = f"letter_unknown_{len(family_mapping)}_{counter}.pdf"
-            filepath = output_path / filename
-            counter += 1
+    1. Extract the text (and from that, the footer and Family data) of each
+       page exactly once, in a pool of processes (each handling a range of
+       pages).
+    2. Group the pages into letters and pick each letter's filename.
+    3. Write the letters, in a pool of processes (each handling a range of
+       letters, and reading the input PDF once).
 
-        # Write the full letter
-        writer = PdfWriter()
-        for p in pages:
-            writer.add_page(p)
+    Returns a dictionary mapping Family Envelope Number to filename.
+    """
+    # Create output folder if it doesn't exist
+    output_path = Path(output_folder)
+    output_path.mkdir(parents=True, exist_ok=True)
 
-        with open(filepath, 'wb') as f:
-            writer.write(f)
+    if workers is None:
+        workers = os.cpu_count() or 1
 
-        if envelope_num:
-            log.info(f"Parsed letter for envelope {envelope_num}: {filename}")
-        else:
-            log.warning(f"Parsed letter but could not extract envelope number: {filename}")
+    num_pages = len(PdfReader(input_pdf_path).pages)
+    log.info(f"Reading {num_pages} pages with {workers} processes...")
 
-        return filename, envelope_num, name
+    # Hand out more chunks than workers so that the work evens out
+    page_nums = list(range(num_pages))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [ executor.submit(_scan_pages, input_pdf_path,
+                                    chunk[0], chunk[-1] + 1)
+                    for chunk in _chunks(page_nums, workers * 4) ]
+        pages = list()
+        for future in futures:
+            pages.extend(future.result())
 
-    # Process each page
-    for page_num, page in enumerate(reader.pages):
-        text = page.extract_text() or ""
+    #--------------------------------------------------------------------
 
-        # Look for "Page X of Y" pattern
-        # It usually appears at the bottom
-        page_match = re.search(r'Page\s+(\d+)\s+of\s+(\d+)', text)
+    # Group the pages into letters: a list of (list of page numbers,
+    # envelope number, name)
+    letters = []
 
-        if page_match:
-            current_page_num = int(page_match.group(1))
-            total_pages = int(page_match.group(2))
+    # Track pages for current letter
+    current_letter_pages = []
+    current_letter_info = (None, None)
+
+    def save_letter(page_nums, info):
+        letters.append((page_nums, info[0], info[1]))
 
+    for page_index, (current_page_num, total_pages, envelope_num, name) in enumerate(pages):
+        if current_page_num is not None:
             if current_page_num == 1:
                 # Start of a new letter
-                # If we have a previous letter pending (which shouldn't happen if logic is correct,
-                # but good for safety), save it
-                if current_letter_pages:
-                    # This case implies we missed the end of the previous letter
-                    # or the previous letter didn't have a proper "Page X of Y" on its last page
-                    # For now, let's just reset and start fresh, assuming the previous one was saved
-                    # or this is a recovery.
-                    # But actually, if we hit Page 1, we should definitely start a new accumulation
-                    current_letter_pages = []
-
-                current_letter_pages.append(page)
-                total_pages_in_letter = total_pages
+                # If we have a previous letter pending, it means that we
+                # missed the end of the previous letter (or the previous
+                # letter didn't have a proper "Page X of Y" on its last
+                # page).  Drop it and start a new accumulation.
+                current_letter_pages = [page_index]
+                current_letter_info = (envelope_num, name)
 
                 # If it's a 1-page letter, save immediately
                 if total_pages == 1:
-                    filename, envelope_num, name = save_letter(current_letter_pages)
-                    if envelope_num:
-                        family_mapping[envelope_num] = {
-                            'filename': filename,
-                            'salutation': name
-                        }
+                    save_letter(current_letter_pages, current_letter_info)
                     current_letter_pages = []
-                    total_pages_in_letter = 0
             else:
                 # Continuation of current letter
-                current_letter_pages.append(page)
+                current_letter_pages.append(page_index)
 
                 # Check if we've reached the last page
                 if current_page_num == total_pages:
-                    filename, envelope_num, name = save_letter(current_letter_pages)
-                    if envelope_num:
-                        family_mapping[envelope_num] = {
-                            'filename': filename,
-                            'salutation': name
-                        }
+                    save_letter(current_letter_pages, current_letter_info)
                     current_letter_pages = []
-                    total_pages_in_letter = 0
         else:
             # Fallback: if we can't find the page number, but we have pages accumulating
             # This might happen if the footer is missing or unreadable.
             # We'll assume it belongs to the current letter if we are in one.
             if current_letter_pages:
-                current_letter_pages.append(page)
-                # If we don't know the total pages, we might be in trouble.
-                # But usually the "Page X of Y" is reliable.
-                pass
+                current_letter_pages.append(page_index)
 
     # Handle any remaining pages (if last letter didn't end properly)
     if current_letter_pages:
-        filename, envelope_num, name = save_letter(current_letter_pages)
+        save_letter(current_letter_pages, current_letter_info)
+
+    #--------------------------------------------------------------------
+
+    # Pick a unique filename for each letter
+    family_mapping = {}
+    used_filenames = set()
+    to_write = []
+    for page_nums, envelope_num, name in letters:
+        if name:
+            safe_name = sanitize_filename(name)
+            # Include envelope number to help ensure uniqueness
+            if envelope_num:
+                base = f"{envelope_num}_{safe_name}"
+            else:
+                base = safe_name
+        else:
+            # Fallback if name not found
+            base = f"letter_unknown_{len(family_mapping)}"
+
+        filename = f"{base}.pdf"
+
+        # Ensure filename is unique - add counter if file exists
+        counter = 1
+        while filename in used_filenames or (output_path / filename).exists():
+            filename = f"{base}_{counter}.pdf"
+            counter += 1
+        used_filenames.add(filename)
+
+        to_write.append((str(output_path / filename), page_nums))
+
         if envelope_num:
+            log.info(f"Parsed letter for envelope {envelope_num}: {filename}")
             family_mapping[envelope_num] = {
                 'filename': filename,
                 'salutation': name
             }
+        else:
+            log.warning(f"Parsed letter but could not extract envelope number: {filename}")
+
+    #--------------------------------------------------------------------
+
+    # Write all the letters
+    log.info(f"Writing {len(to_write)} letters...")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [ executor.submit(_write_letters, input_pdf_path, chunk)
+                    for chunk in _chunks(to_write, workers * 4) ]
+        for future in futures:
+            future.result()
 
     return family_mapping
 
@@ -306,22 +343,159 @@ def enrich_family_mapping(family_mapping, families, member_workgroups, log):
 
     return enriched_mapping, families_by_envelope
 
+#-------------------------------------------------------------------
+# Delivery state
+#
+# The send state of every family is kept in a JSON state file, keyed
+# by envelope number.  Each entry has a "status":
+#
+#   snail mail -> no email addresses; the letter must be mailed
+#   not sent   -> --do-not-send was specified
+#   queued     -> the email is in the on-disk email queue
+#   sent       -> the email was sent
+#   failed     -> the email could not be sent (see "error")
+#
+# The emails themselves go through an on-disk email queue (see
+# ECCEmailQueue.py), which is what makes re-running this script safe:
+# every family's email is queued with a unique key, so if the script
+# is interrupted (or some emails fail), just run it again.  Families
+# whose letters were already sent are not sent again; everything else
+# picks up where it left off.
+
+def load_delivery_state(filename, log):
+    """Load the per-family delivery state (if any) from a previous run."""
+    if not os.path.exists(filename):
+        return {}
+
+    with open(filename) as fp:
+        state = json.load(fp)
+
+    log.info(f"Loaded delivery state for {len(state)} families from '{filename}'")
+    return state
+
+def save_delivery_state(state, filename):
+    """Atomically write the per-family delivery state."""
+    tmp = f'{filename}.tmp'
+    with open(tmp, 'w') as fp:
+        json.dump(state, fp, indent=2, sort_keys=True)
+    os.replace(tmp, filename)
+
+def _snail_mail_info(env_num, data, families_by_envelope):
+    """Return the family data needed to snail mail a letter."""
+    family_info = {
+        'envelope_number': env_num,
+        'salutation': data['salutation'],
+        'filename': data['filename'],
+    }
+
+    # Add family data from ParishSoft if available
+    ps_family = families_by_envelope.get(env_num, {})
+    family_info.update({
+        'fduid': ps_family.get('familyDUID', ''),
+        'family_name': f"{ps_family.get('firstName', '')} {ps_family.get('lastName', '')}".strip(),
+        'last_name': ps_family.get('lastName', ''),
+        'first_name': ps_family.get('firstName', ''),
+        'mailing_name': ps_family.get('mailingName', ''),
+        'address1': ps_family.get('primaryAddress1', ''),
+        'address2': ps_family.get('primaryAddress2', ''),
+        'address3': ps_family.get('primaryAddress3', ''),
+        'city': ps_family.get('primaryCity', ''),
+        'state': ps_family.get('primaryState', ''),
+        'zip': ps_family.get('primaryPostalCode', ''),
+        'zip_plus': ps_family.get('primaryZipPlus', ''),
+    })
+
+    return family_info
+
+def _letter_email(data, pdf_path, args, who, log):
+    """Build the email for one family's letter.
+    Returns a tuple (message, formatted To: addresses)."""
+    salutation = data['salutation']
+    email_display_names = data.get('email_display_names', {})
+    to_display_name = data.get('to_display_name', salutation)
+
+    target_emails = list(data['emails'])
+    actual_recipients = ', '.join(target_emails)
+    smtp_subject = f'{args.year} Contribution Letter from Epiphany Catholic Church'
+
+    # Build email body
+    # JMS This is a hard-coded message.
+    # Perhaps it should be read from a template file instead?
+    body_parts = [
+        f"Dear {salutation},",
+        "",
+        "Father Toan and the Epiphany Ministerial team thank you for your support of the Epiphany Community during 2025.  Our parish had a very successful year in 2025.  We supported many needy causes through our parish stewardship 10% committee and St. Vincent DePaul Society in addition to upgrading the Worship Center HVAC and many other upgrades and improvements across the parish campus.  We could not have accomplished these tasks without the support of our members.  Attached is your individual family contribution record for the year January 1, 2025 thru December 31, 2025.  Thank you once again for your support.",
+        "",
+        "Gratefully,",
+        "Doug Wolz",
+        "Parish Business Manager",
+    ]
+
+    # Handle test run mode
+    if args.test_run:
+        body_parts.insert(0, "*** THIS EMAIL WAS SENT TO A TEST RUN OVERRIDE ADDRESS ***")
+        body_parts.insert(1, f"*** Intended recipients: {actual_recipients} ***")
+        body_parts.insert(2, "")
+        target_emails = [args.test_run_email]
+        log.info(f"{who} TEST RUN: Sending to override address: {args.test_run_email} (intended: {actual_recipients})")
+
+    smtp_to_formatted = []
+    for email in target_emails:
+        display = email_display_names.get(email)
+
+        # If this is a test-run override email, we'll likely have no direct
+        # match in email_display_names. Use a sensible default derived from
+        # member records.
+        if not display:
+            display = to_display_name or salutation
+
+        smtp_to_formatted.append(formataddr((display, email)))
+
+    smtp_to = ', '.join(smtp_to_formatted)
+
+    # Prepare attachment
+    attachments = {
+        1: {
+            'filename': str(pdf_path),
+            'type': 'pdf'
+        }
+    }
+
+    msg = gmail_oauth_smtp.build_email_message(
+        message_body='\n'.join(body_parts),
+        content_type='text/plain',
+        smtp_to=smtp_to,
+        smtp_subject=smtp_subject,
+        smtp_from=args.smtp_from,
+        attachments=attachments,
+        log=log,
+    )
+
+    return msg, smtp_to
+
+def _email_key(env_num, args):
+    """Return the email queue key for a family's letter.  Test runs get
+    their own keys so that they never mark real families as sent."""
+    key = f'{args.year}-{env_num}'
+    if args.test_run:
+        key += f'-test-{args.test_run_email}'
+    return key
+
 def send_contribution_letters(enriched_mapping, families_by_envelope, args,
                               output_folder, emailed_folder, snail_mail_folder,
-                              smtp, log):
-    """Send contribution letters via email or move to snail mail folder."""
-    emails_sent = 0
-    no_email_count = 0
-    snail_mail_families = []
-    test_run_sent_count = 0
+                              queue, session_factory, state, log):
+    """Send contribution letters via email or move to snail mail folder.
+
+    Updates (and saves) the per-family delivery state in "state".  If
+    "queue" is None (i.e., --do-not-send), nothing is sent."""
+    test_run_queued_count = 0
+    queued = list()
 
     for env_num, data in enriched_mapping.items():
         filename = data['filename']
         salutation = data['salutation']
-        emails = data['emails']
-        email_display_names = data.get('email_display_names', {})
-        to_display_name = data.get('to_display_name', salutation)
         pdf_path = Path(output_folder) / filename
+        env_key = str(env_num)
 
         fduid = ''
         if env_num in families_by_envelope:
@@ -332,146 +506,115 @@ def send_contribution_letters(enriched_mapping, families_by_envelope, args,
             log.warning(f"{who} PDF file not found: {pdf_path}")
             continue
 
-        if len(emails) == 0:
+        if len(data['emails']) == 0:
             log.info(f"{who} No email addresses for {salutation} - will need snail mail")
 
-            # Collect family data for CSV
-            family_info = {
-                'envelope_number': env_num,
-                'salutation': salutation,
-                'filename': filename,
-            }
-
-            # Add family data from ParishSoft if available
-            if env_num in families_by_envelope:
-                ps_family = families_by_envelope[env_num]
-                family_info.update({
-                    'fduid': ps_family.get('familyDUID', ''),
-                    'family_name': f"{ps_family.get('firstName', '')} {ps_family.get('lastName', '')}".strip(),
-                    'last_name': ps_family.get('lastName', ''),
-                    'first_name': ps_family.get('firstName', ''),
-                    'mailing_name': ps_family.get('mailingName', ''),
-                    'address1': ps_family.get('primaryAddress1', ''),
-                    'address2': ps_family.get('primaryAddress2', ''),
-                    'address3': ps_family.get('primaryAddress3', ''),
-                    'city': ps_family.get('primaryCity', ''),
-                    'state': ps_family.get('primaryState', ''),
-                    'zip': ps_family.get('primaryPostalCode', ''),
-                    'zip_plus': ps_family.get('primaryZipPlus', ''),
-                })
-            else:
-                family_info.update({
-                    'fduid': '',
-                    'family_name': '',
-                    'last_name': '',
-                    'first_name': '',
-                    'mailing_name': '',
-                    'address1': '',
-                    'address2': '',
-                    'address3': '',
-                    'city': '',
-                    'state': '',
-                    'zip': '',
-                    'zip_plus': '',
-                })
-
-            snail_mail_families.append(family_info)
+            state[env_key] = _snail_mail_info(env_num, data, families_by_envelope)
+            state[env_key]['status'] = 'snail mail'
 
             # Move to snail mail folder
             dest_path = snail_mail_folder / filename
             shutil.move(str(pdf_path), str(dest_path))
-            no_email_count += 1
             continue
 
-        # Prepare email
-        target_emails = list(emails)
-        actual_recipients = ', '.join(target_emails)
-        smtp_subject = f'{args.year} Contribution Letter from Epiphany Catholic Church'
-
-        # Build email body
-        # JMS This is a hard-coded message.
-        # Perhaps it should be read from a template file instead?
-        body_parts = [
-            f"Dear {salutation},",
-            "",
-            "Father Toan and the Epiphany Ministerial team thank you for your support of the Epiphany Community during 2025.  Our parish had a very successful year in 2025.  We supported many needy causes through our parish stewardship 10% committee and St. Vincent DePaul Society in addition to upgrading the Worship Center HVAC and many other upgrades and improvements across the parish campus.  We could not have accomplished these tasks without the support of our members.  Attached is your individual family contribution record for the year January 1, 2025 thru December 31, 2025.  Thank you once again for your support.",
-            "",
-            "Gratefully,",
-            "Doug Wolz",
-            "Parish Business Manager",
-        ]
-
-        # Handle test run mode
-        if args.test_run:
-            # Check if we've reached the test run limit
-            if test_run_sent_count >= args.test_run_count:
-                log.info(f"TEST RUN: Reached limit ({args.test_run_count}); stopping early")
-                break
-
-            body_parts.insert(0, "*** THIS EMAIL WAS SENT TO A TEST RUN OVERRIDE ADDRESS ***")
-            body_parts.insert(1, f"*** Intended recipients: {actual_recipients} ***")
-            body_parts.insert(2, "")
-            target_emails = [args.test_run_email]
-            log.info(f"{who} TEST RUN: Sending to override address: {args.test_run_email} (intended: {actual_recipients})")
-            test_run_sent_count += 1
-
-        smtp_to_formatted = []
-        for email in target_emails:
-            display = email_display_names.get(email)
-
-            # If this is a test-run override email, we'll likely have no direct
-            # match in email_display_names. Use a sensible default derived from
-            # member records.
-            if not display:
-                display = to_display_name or salutation
-
-            smtp_to_formatted.append(formataddr((display, email)))
-
-        smtp_to = ', '.join(smtp_to_formatted)
+        # Check if we've reached the test run limit
+        if args.test_run and test_run_queued_count >= args.test_run_count:
+            log.info(f"TEST RUN: Reached limit ({args.test_run_count}); stopping early")
+            break
 
-        if not args.test_run:
-            log.info(f"{who} Sending to {smtp_to}")
-
-        body = '\n'.join(body_parts)
+        key = _email_key(env_num, args)
+        prev = state.get(env_key, {})
+        if prev.get('status') == 'sent' and prev.get('key') == key:
+            log.info(f"{who} Already sent to {prev.get('to')} in a previous run; not sending again")
+            dest_path = emailed_folder / filename
+            shutil.move(str(pdf_path), str(dest_path))
+            continue
 
-        # Prepare attachment
-        attachments = {
-            1: {
-                'filename': str(pdf_path),
-                'type': 'pdf'
-            }
-        }
+        msg, smtp_to = _letter_email(data, pdf_path, args, who, log)
 
         # Send email (unless do-not-send)
-        if args.do_not_send:
+        if queue is None:
             log.info(f"{who} NOT SENDING: Would send email to {smtp_to}")
+            test_run_queued_count += 1
+            state[env_key] = {
+                'status': 'not sent',
+                'filename': filename,
+                'to': smtp_to,
+            }
             # Move to emailed folder even though we didn't send
             dest_path = emailed_folder / filename
             shutil.move(str(pdf_path), str(dest_path))
-        else:
-            try:
-                gmail_oauth_smtp.send_email_existing_smtp(
-                    body, 'text/plain',
-                    smtp_to, smtp_subject, args.smtp_from,
-                    smtp, log,
-                    attachments=attachments
-                )
-                emails_sent += 1
-
-                # Move to emailed folder
-                dest_path = emailed_folder / filename
-                shutil.move(str(pdf_path), str(dest_path))
-                log.info(f"{who} Successfully sent and moved to {dest_path}")
-            except Exception as e:
-                log.error(f"{who} Failed to send email to {smtp_to}: {e}")
+            continue
+
+        if not args.test_run:
+            log.info(f"{who} Queueing email to {smtp_to}")
+
+        # If this key was already sent (e.g., by a run that was interrupted
+        # before it saved the delivery state), this does nothing: the
+        # message will not be sent twice.  If it is in the queue but was
+        # not sent yet, this message replaces it.
+        if not queue.enqueue(msg, key=key):
+            log.info(f"{who} Already sent in a previous run; not sending again")
+            state[env_key] = {
+                'status': 'sent',
+                'filename': filename,
+                'to': prev.get('to', smtp_to) if prev.get('key') == key else smtp_to,
+                'key': key,
+            }
+            dest_path = emailed_folder / filename
+            shutil.move(str(pdf_path), str(dest_path))
+            continue
+
+        # Only the families that are actually sent count towards the
+        # test run limit
+        test_run_queued_count += 1
+        state[env_key] = {
+            'status': 'queued',
+            'filename': filename,
+            'to': smtp_to,
+            'key': key,
+        }
+        queued.append((env_key, who, pdf_path))
+
+    save_delivery_state(state, args.state_file)
+    if queue is None:
+        return state
+
+    # Send everything in the queue
+    queue.retry_failed()
+    log.info(f"Sending {len(queued)} emails with {args.smtp_workers} SMTP sessions...")
+    queue.run(session_factory, workers=args.smtp_workers,
+              rate=args.smtp_rate, max_attempts=args.smtp_max_attempts)
+
+    statuses = queue.statuses()
+    for env_key, who, pdf_path in queued:
+        entry = state[env_key]
+        status, error = statuses.get(entry['key'], ('queued', None))
+        if status == 'sent':
+            entry['status'] = 'sent'
+            entry.pop('error', None)
+
+            # Move to emailed folder
+            dest_path = emailed_folder / pdf_path.name
+            shutil.move(str(pdf_path), str(dest_path))
+            log.info(f"{who} Successfully sent and moved to {dest_path}")
+        elif status == 'failed':
+            entry['status'] = 'failed'
+            entry['error'] = error
+            log.error(f"{who} Failed to send email to {entry['to']}: {error}")
 
-    return emails_sent, no_email_count, snail_mail_families
+    save_delivery_state(state, args.state_file)
+    return state
 
-def write_snail_mail_csv(snail_mail_families, snail_mail_folder, log):
+def write_snail_mail_csv(state, snail_mail_folder, log):
     """Write CSV file for families requiring snail mail."""
+    snail_mail_families = [ info for info in state.values()
+                            if info['status'] == 'snail mail' ]
     if not snail_mail_families:
         return
 
+    snail_mail_families.sort(key=lambda info: info['envelope_number'])
+
     csv_filename = snail_mail_folder / 'snail-mail-families.csv'
     csv_fieldnames = [
         'envelope_number',
@@ -492,23 +635,34 @@ def write_snail_mail_csv(snail_mail_families, snail_mail_folder, log):
     ]
 
     with open(csv_filename, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=csv_fieldnames)
+        writer = csv.DictWriter(csvfile, fieldnames=csv_fieldnames,
+                                extrasaction='ignore')
         writer.writeheader()
         for family_info in snail_mail_families:
             writer.writerow(family_info)
 
     log.info(f"Wrote snail mail family data to '{csv_filename}'")
 
-def print_summary(enriched_mapping, emails_sent, no_email_count, args, log):
+def print_summary(enriched_mapping, state, args, log):
     """Print summary of processing."""
+    counts = {}
+    for info in state.values():
+        counts[info['status']] = counts.get(info['status'], 0) + 1
+    emails_sent = counts.get('sent', 0)
+    no_email_count = counts.get('snail mail', 0)
+
     log.info("")
     log.info("=== Summary ===")
     log.info(f"Total families processed: {len(enriched_mapping)}")
     if args.do_not_send:
-        log.info(f"NOT SENDING: Would have sent {len([d for d in enriched_mapping.values() if len(d['emails']) > 0])} emails")
+        log.info(f"NOT SENDING: Would have sent {counts.get('not sent', 0)} emails")
         log.info(f"NOT SENDING: Would have {no_email_count} families requiring snail mail")
     else:
         log.info(f"Emails sent: {emails_sent}")
+        if counts.get('failed', 0) > 0:
+            log.info(f"Emails that failed (re-run to retry): {counts['failed']}")
+        if counts.get('queued', 0) > 0:
+            log.info(f"Emails not yet sent (re-run to resume): {counts['queued']}")
         log.info(f"Families requiring snail mail: {no_email_count}")
         log.info(f"Letters moved to '{args.emailed_dir}': {emails_sent}")
         log.info(f"Letters moved to '{args.snail_mail_dir}': {no_email_count}")
@@ -539,6 +693,10 @@ def setup_cli():
     parser.add_argument('--input',
                         required=True,
                         help='Input PDF file to process')
+    parser.add_argument('--split-workers',
+                        type=int,
+                        default=os.cpu_count() or 1,
+                        help='Number of processes to use to split the input PDF (default: number of CPUs)')
     parser.add_argument('--tmpdir',
                         default='individual-letters',
                         help='Temporary directory for individual letters')
@@ -564,6 +722,26 @@ def setup_cli():
     parser.add_argument('--smtp-from',
                         default='no-reply@epiphanycatholicchurch.org',
                         help='From address. May be an email or "Name <email>" (could be an alias of the impersonated mailbox)')
+    parser.add_argument('--smtp-workers',
+                        type=int,
+                        default=4,
+                        help='Number of SMTP sessions to send emails with in parallel (default: 4)')
+    parser.add_argument('--smtp-rate',
+                        type=float,
+                        default=1.0,
+                        help='Maximum number of emails to send per second, across all SMTP sessions (default: 1.0)')
+    parser.add_argument('--smtp-max-per-connection',
+                        type=int,
+                        default=100,
+                        help='Reconnect each SMTP session after sending this many emails (default: 100)')
+    parser.add_argument('--smtp-max-attempts',
+                        type=int,
+                        default=5,
+                        help='Number of times to try sending each email before giving up (default: 5)')
+    parser.add_argument('--state-file',
+                        help='JSON file holding the per-family delivery state (default: contribution-letters-YEAR-state.json)')
+    parser.add_argument('--email-queue',
+                        help='SQLite3 file holding the outgoing email queue (default: contribution-letters-YEAR-email-queue.sqlite3)')
     parser.add_argument('--do-not-send',
                         action='store_true',
                         default=False,
@@ -594,6 +772,15 @@ def setup_cli():
     args.smtp_from = smtp_from_formatted
     args.smtp_from_email = smtp_from_email
 
+    if not args.state_file:
+        args.state_file = f'contribution-letters-{args.year}-state.json'
+    if not args.email_queue:
+        args.email_queue = f'contribution-letters-{args.year}-email-queue.sqlite3'
+    if args.smtp_workers < 1:
+        parser.error('--smtp-workers must be a positive integer')
+    if args.smtp_rate <= 0:
+        parser.error('--smtp-rate must be a positive number')
+
     # Check for mutually exclusive options
     if args.do_not_send and args.test_run:
         parser.error('--do-not-send and --test-run cannot be used together')
@@ -671,7 +858,8 @@ def main():
     log.info(f"Processing {input_pdf}...")
 
     # Split the PDF into individual letters
-    family_mapping = split_pdf_into_letters(input_pdf, output_folder, log)
+    family_mapping = split_pdf_into_letters(input_pdf, output_folder, log,
+                                            workers=args.split_workers)
     log.info(f"Created {len(family_mapping)} individual letters in '{output_folder}' folder")
 
     # Enrich the mapping with email addresses
@@ -690,51 +878,61 @@ def main():
     emailed_folder.mkdir(exist_ok=True)
     snail_mail_folder.mkdir(exist_ok=True)
 
+    # Pick up the delivery state from any previous (interrupted) run
+    state = load_delivery_state(args.state_file, log)
+
     # Send emails
     log.info("Sending contribution letters via email...")
 
     if args.do_not_send:
         log.info("--do-not-send specified; will not open SMTP connection.")
-        smtp = None
-        emails_sent, no_email_count, snail_mail_families = send_contribution_letters(
+        state = send_contribution_letters(
             enriched_mapping, families_by_envelope, args,
             output_folder, emailed_folder, snail_mail_folder,
-            smtp, log)
+            None, None, state, log)
     else:
-        log.info("Setting up Gmail OAuth2 access token...")
+        log.info("Setting up Gmail OAuth2 credentials...")
         auth = gmail_oauth_smtp.GmailServiceAccountAuth(
             service_account_keyfile=args.gmail_service_account_keyfile,
             impersonate_user=args.gmail_impersonate_user,
         )
-        token = gmail_oauth_smtp.get_access_token_via_service_account(auth)
+        credentials = gmail_oauth_smtp.get_credentials_via_service_account(auth)
 
         use_ssl = not args.smtp_starttls
         use_starttls = args.smtp_starttls
         debuglevel = 2 if args.smtp_debug else 0
 
-        log.debug("Opening SMTP connection from main (OAuth2)...")
-        with gmail_oauth_smtp.open_gmail_smtp_connection_oauth2(
-            smtp_server=args.smtp_server,
-            smtp_port=args.smtp_port,
-            smtp_user=args.gmail_impersonate_user,
-            access_token=token,
-            use_ssl=use_ssl,
-            use_starttls=use_starttls,
-            local_hostname=None,
-            debuglevel=debuglevel,
-            log=log,
-        ) as smtp:
-            log.debug("SMTP connection established")
-            emails_sent, no_email_count, snail_mail_families = send_contribution_letters(
+        # Each sending thread gets its own session.  A session connects
+        # on its first message, and transparently reconnects if Gmail
+        # drops the connection or the token expires.
+        def _session_factory():
+            return gmail_oauth_smtp.GmailSMTPSession(
+                credentials=credentials,
+                smtp_server=args.smtp_server,
+                smtp_port=args.smtp_port,
+                smtp_user=args.gmail_impersonate_user,
+                use_ssl=use_ssl,
+                use_starttls=use_starttls,
+                local_hostname=None,
+                debuglevel=debuglevel,
+                max_messages=args.smtp_max_per_connection,
+                log=log,
+            )
+
+        queue = ECCEmailQueue.EmailQueue(args.email_queue, log)
+        try:
+            state = send_contribution_letters(
                 enriched_mapping, families_by_envelope, args,
                 output_folder, emailed_folder, snail_mail_folder,
-                smtp, log)
+                queue, _session_factory, state, log)
+        finally:
+            queue.close()
 
     # Write CSV file for snail mail families
-    write_snail_mail_csv(snail_mail_families, snail_mail_folder, log)
+    write_snail_mail_csv(state, snail_mail_folder, log)
 
     # Print summary
-    print_summary(enriched_mapping, emails_sent, no_email_count, args, log)
+    print_summary(enriched_mapping, state, args, log)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -5,13 +5,19 @@
 
 import os
 import sys
+import time
+import queue
+import atexit
 import base64
 import smtplib
+import threading
 import pytz
 import Google
 import logging
 import platform
 import logging.handlers
+import ECCEmailQueue
+import gmail_oauth_smtp
 
 from google.oauth2 import service_account
 from google.auth.transport.requests import Request as GoogleAuthRequest
@@ -31,10 +37,25 @@ def diediedie(msg):
 
 #-------------------------------------------------------------------
 
+# Log handler that posts log messages to a Slack channel.
+#
+# Posting to Slack is a network round trip (and Slack rate limits
+# posts to about 1 per second per channel), so emit() never talks to
+# Slack directly: it just puts the formatted message in a queue.  A
+# background thread takes messages from the queue and posts them,
+# batching together all the messages that arrive within batch_interval
+# seconds into a single post, and coalescing consecutive duplicate
+# messages into a single line.  Remaining messages are flushed when
+# the handler is closed (which the logging module does at exit).
 class ECCSlackLogHandler(logging.StreamHandler):
-    def __init__(self, token_filename, channel="#bot-errors"):
+    # Slack truncates messages longer than this
+    max_post_len = 3900
+
+    def __init__(self, token_filename, channel="#bot-errors",
+                 batch_interval=2):
         logging.StreamHandler.__init__(self)
         self.channel = channel
+        self.batch_interval = batch_interval
 
         if not os.path.exists(token_filename):
             print(f"ERROR: Slack token filename {token_filename} does not exist")
@@ -49,7 +70,29 @@ class ECCSlackLogHandler(logging.StreamHandler):
         # login to Slack unless log.critical() is invoked.
         self.client  = None
 
+        # Likewise, the queue-draining thread is only started the
+        # first time a message is emitted.
+        self.queue   = queue.Queue()
+        self.thread  = None
+        self.thread_lock = threading.Lock()
+
     def emit(self, record):
+        try:
+            msg = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        with self.thread_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run,
+                                               name='slack-log-handler',
+                                               daemon=True)
+                self.thread.start()
+
+        self.queue.put(msg)
+
+    def _run(self):
         # If this is the first time we're emitting a message, then initialize
         # the Slack client object.  This allows apps who don't use the Slack
         # handler to not have the slack_sdk module installed/available.
@@ -57,9 +100,96 @@ class ECCSlackLogHandler(logging.StreamHandler):
         if not self.client:
             self.client = slack_sdk.WebClient(token=self.token)
 
-        msg      = self.format(record)
-        response = self.client.chat_postMessage(channel=self.channel,
-                                                text=msg)
+        done = False
+        while not done:
+            # Wait for a message, and then collect everything else that
+            # arrives in the next batch_interval seconds.
+            msgs = [ self.queue.get() ]
+            deadline = time.monotonic() + self.batch_interval
+            while msgs[-1] is not None:
+                timeout = deadline - time.monotonic()
+                try:
+                    if timeout > 0:
+                        msgs.append(self.queue.get(timeout=timeout))
+                    else:
+                        msgs.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # None is the "shut down" sentinel from close()
+            if msgs[-1] is None:
+                msgs.pop()
+                done = True
+
+            for text in self._coalesce(msgs):
+                self._post(text)
+
+    # Merge consecutive duplicate messages, and join the messages into
+    # as few posts as possible.  A single message that is too long for
+    # one post is split across several posts.
+    def _coalesce(self, msgs):
+        lines = list()
+        for msg in msgs:
+            if lines and lines[-1][0] == msg:
+                lines[-1][1] += 1
+            else:
+                lines.append([msg, 1])
+
+        pieces = list()
+        for msg, count in lines:
+            if count > 1:
+                msg = f'{msg} (repeated {count} times)'
+            for i in range(0, max(1, len(msg)), self.max_post_len):
+                pieces.append(msg[i:i + self.max_post_len])
+
+        posts = list()
+        text = ''
+        for msg in pieces:
+            if text and len(text) + len(msg) + 1 > self.max_post_len:
+                posts.append(text)
+                text = ''
+            text = f'{text}\n{msg}' if text else msg
+        if text:
+            posts.append(text)
+
+        return posts
+
+    def _post(self, text):
+        import slack_sdk.errors
+
+        for attempt in range(5):
+            try:
+                self.client.chat_postMessage(channel=self.channel,
+                                             text=text)
+                return
+            except slack_sdk.errors.SlackApiError as e:
+                # Slack tells us how long to back off for
+                if e.response.status_code == 429:
+                    delay = int(e.response.headers.get('Retry-After', 1))
+                    time.sleep(delay)
+                    continue
+                print(f"ERROR: Failed to post log message to Slack: {e}",
+                      file=sys.stderr)
+                return
+            except Exception as e:
+                print(f"ERROR: Failed to post log message to Slack: {e}",
+                      file=sys.stderr)
+                return
+
+        print(f"ERROR: Slack is still rate limiting us after 5 attempts; dropped log message: {text}",
+              file=sys.stderr)
+
+    def close(self):
+        # Wait (a bounded amount of time) for any pending messages to
+        # be posted.
+        with self.thread_lock:
+            thread = self.thread
+            self.thread = None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join(timeout=30)
+
+        logging.StreamHandler.close(self)
 
 #-------------------------------------------------------------------
 
@@ -180,6 +310,25 @@ def setup_logging(name=sys.argv[0], info=True, debug=False, logfile=None,
 #   ECC.setup_email(delegated_credentials=creds,
 #                   impersonated_user='no-reply@…',
 #                   log=log)
+#
+# send_email() keeps a single authenticated SMTP session open (see
+# gmail_oauth_smtp.GmailSMTPSession) and reuses it for every message,
+# so scripts that send many emails only connect and authenticate once.
+# The session reconnects by itself if the connection drops or the
+# access token expires, and is closed at exit (or by close_email()).
+#
+# Bulk senders can instead queue their emails in an on-disk queue (see
+# ECCEmailQueue.py), and then send them all with several SMTP sessions
+# in parallel:
+#
+#   ECC.setup_email(...)
+#   ECC.setup_email_queue('email-queue.sqlite3', log=log)
+#   for family in families:
+#       ECC.send_email(...)       # <-- just adds to the queue
+#   ECC.send_queued_emails(log, workers=4)
+#
+# If the script is interrupted and re-run, emails that were already
+# sent are not sent again.
 #===================================================================
 
 # Delegated service-account credentials, initialised by setup_email().
@@ -199,6 +348,16 @@ _smtp_server          = 'smtp.gmail.com'
 _smtp_port            = 465
 _smtp_debug           = False
 
+# Persistent SMTP session used by send_email(); created on first use.
+# send_email() may be called from several threads, but they all share
+# this one session, so only one thread can use it at a time.
+_smtp_session         = None
+_smtp_lock            = threading.Lock()
+
+# Outbound email queue, initialised by setup_email_queue().  When set,
+# send_email() adds to the queue instead of sending.
+_email_queue          = None
+
 #-------------------------------------------------------------------
 
 def setup_email(service_account_json=None, impersonated_user=None,
@@ -279,6 +438,9 @@ def setup_email(service_account_json=None, impersonated_user=None,
     global _smtp_credentials, _smtp_impersonated_user, _gmail_from_addr
     global _smtp_server, _smtp_port, _smtp_debug
 
+    # Any session from a prior setup_email() used the old settings
+    close_email()
+
     _gmail_from_addr = from_addr
 
     if smtp_server is not None:
@@ -436,7 +598,9 @@ def send_email_via_smtp_xoauth2(message_body, content_type, smtp_to,
     This is the low-level counterpart to the high-level :func:`send_email`
     helper.  Call this directly when the calling script manages its own
     credentials and wants to send a message without the module-level
-    singleton set up by :func:`setup_email`.
+    singleton set up by :func:`setup_email`.  It opens (and closes) a new
+    connection for each message; to send many messages, use a
+    :class:`gmail_oauth_smtp.GmailSMTPSession` instead.
 
     The XOAUTH2 mechanism works as follows:
 
@@ -510,11 +674,13 @@ def send_email_via_smtp_xoauth2(message_body, content_type, smtp_to,
 #-------------------------------------------------------------------
 
 def send_email(to_addr, subject, body, log, content_type='text/plain',
-               from_addr=None, attachments=None):
+               from_addr=None, attachments=None, key=None):
     """High-level helper that sends an email via Gmail SMTP + XOAUTH2.
 
     :func:`setup_email` must be called before this function to initialise
-    the module-level service-account credentials.
+    the module-level service-account credentials.  All calls share one
+    persistent SMTP session (see :func:`close_email`); it is safe to call
+    this from several threads, but their messages are sent one at a time.
 
     Parameters
     ----------
@@ -534,6 +700,16 @@ def send_email(to_addr, subject, body, log, content_type='text/plain',
         to :func:`setup_email` via its ``from_addr`` parameter is used.
     attachments : dict or None
         Optional attachments (see :func:`_build_mime_message` for format).
+    key : str or None
+        Idempotency key used when :func:`setup_email_queue` has been
+        called (ignored otherwise).  Default: a hash of the recipients,
+        sender, subject, and content.
+
+    Returns
+    -------
+    str or None
+        The idempotency key the message was queued under, if
+        :func:`setup_email_queue` has been called; otherwise ``None``.
     """
     global _smtp_credentials, _smtp_impersonated_user, _gmail_from_addr
     global _smtp_server, _smtp_port, _smtp_debug
@@ -541,8 +717,6 @@ def send_email(to_addr, subject, body, log, content_type='text/plain',
     # Fall back to the module-level default sender if none supplied here.
     effective_from = from_addr if from_addr is not None else _gmail_from_addr
 
-    log.info(f'Sending email to {to_addr}, subject "{subject}"')
-
     if _smtp_credentials is None:
         import traceback
         lines = ''.join(traceback.format_stack()[:-1])
@@ -551,14 +725,127 @@ def send_email(to_addr, subject, body, log, content_type='text/plain',
         log.critical(msg)
         exit(1)
 
-    send_email_via_smtp_xoauth2(body, content_type,
-                                smtp_to=to_addr,
-                                smtp_subject=subject,
-                                smtp_from=effective_from,
-                                credentials=_smtp_credentials,
-                                impersonated_user=_smtp_impersonated_user,
-                                log=log,
-                                attachments=attachments,
-                                smtp_server=_smtp_server,
-                                smtp_port=_smtp_port,
-                                smtp_debug=_smtp_debug)
+    msg = _build_mime_message(body, content_type, to_addr, subject,
+                              effective_from, log, attachments)
+
+    if _email_queue is not None:
+        if key is None:
+            key = ECCEmailQueue.message_key(msg)
+        log.info(f'Queueing email to {to_addr}, subject "{subject}"')
+        _email_queue.enqueue(msg, key=key)
+        return key
+
+    log.info(f'Sending email to {to_addr}, subject "{subject}"')
+    with _smtp_lock:
+        _get_smtp_session(log).send_message(msg)
+
+    log.debug(f'Mail sent to {to_addr}, subject "{subject}"')
+
+#-------------------------------------------------------------------
+
+def _new_smtp_session(log):
+    """Return a new (not yet connected) SMTP session using the settings
+    given to :func:`setup_email`."""
+    return gmail_oauth_smtp.GmailSMTPSession(
+        credentials=_smtp_credentials,
+        smtp_user=_smtp_impersonated_user,
+        smtp_server=_smtp_server,
+        smtp_port=_smtp_port,
+        use_ssl=(_smtp_port == 465),
+        use_starttls=(_smtp_port != 465),
+        debuglevel=2 if _smtp_debug else 0,
+        log=log)
+
+def _get_smtp_session(log):
+    """Return the module-level persistent SMTP session, creating it if
+    needed from the settings given to :func:`setup_email`."""
+    global _smtp_session
+
+    if _smtp_session is None:
+        _smtp_session = _new_smtp_session(log)
+
+    return _smtp_session
+
+def close_email():
+    """Close the persistent SMTP session used by :func:`send_email`.
+
+    This is called automatically at exit; scripts only need to call it
+    if they want to drop the connection early.  The next
+    :func:`send_email` will open a new session.
+    """
+    global _smtp_session
+
+    with _smtp_lock:
+        if _smtp_session is not None:
+            _smtp_session.close()
+            _smtp_session = None
+
+atexit.register(close_email)
+
+#-------------------------------------------------------------------
+
+def setup_email_queue(filename, log):
+    """Send all subsequent :func:`send_email` messages to a durable
+    on-disk queue (created if it does not already exist) instead of
+    sending them immediately.  Use :func:`send_queued_emails` to send
+    them.
+
+    Parameters
+    ----------
+    filename : str
+        SQLite3 database file holding the queue.
+    log : logging.Logger
+        Logger for debug/info messages.
+    """
+    global _email_queue
+
+    _email_queue = ECCEmailQueue.EmailQueue(filename, log)
+
+def send_queued_emails(log, workers=4, rate=None, max_attempts=5):
+    """Send everything in the queue set up by :func:`setup_email_queue`.
+
+    :func:`setup_email` must have been called first.
+
+    Parameters
+    ----------
+    log : logging.Logger
+        Logger for debug/info messages.
+    workers : int
+        Number of SMTP sessions to send with in parallel.  Default: 4.
+    rate : float or None
+        Maximum number of messages per second (across all workers), to
+        stay under the SMTP provider's limits.  Default: no limit.
+    max_attempts : int
+        Number of times to try each message before marking it as
+        failed.  Default: 5.
+
+    Returns
+    -------
+    dict
+        Number of messages in the queue in each status (``'sent'``,
+        ``'failed'``, ...).
+    """
+    if _email_queue is None:
+        diediedie("send_queued_emails: setup_email_queue() has not been called")
+    if _smtp_credentials is None:
+        diediedie("send_queued_emails: setup_email() has not been called")
+
+    return _email_queue.run(lambda: _new_smtp_session(log),
+                            workers=workers, rate=rate,
+                            max_attempts=max_attempts)
+
+def email_queue_statuses():
+    """Return the status of every message in the queue set up by
+    :func:`setup_email_queue`.
+
+    Returns
+    -------
+    dict
+        Idempotency key (as returned by :func:`send_email`) ->
+        ``(status, last error)``, where status is ``'sent'``,
+        ``'failed'``, ...
+    """
+    if _email_queue is None:
+        diediedie("email_queue_statuses: setup_email_queue() has not been called")
+
+    return _email_queue.statuses()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+#
+# A durable, on-disk (SQLite) outbound email queue.
+#
+# Bulk senders enqueue fully-built messages, and then a small pool of
+# worker threads drains the queue.  Each worker has its own SMTP
+# session (see gmail_oauth_smtp.GmailSMTPSession).  Every message has
+# a status in the database:
+#
+#   queued  -> waiting to be sent (possibly waiting to be retried)
+#   sending -> claimed by a worker
+#   sent    -> done
+#   failed  -> gave up after max_attempts tries
+#
+# Each message also has a unique idempotency key: enqueueing a message
+# with a key that has already been sent does nothing.  So if a bulk
+# sending script crashes (or is throttled and killed) part way through,
+# just run it again: everything is re-enqueued, but only the messages
+# that were not yet sent will actually be sent.  Enqueueing a message
+# with the key of a message that has not been sent yet (i.e., is still
+# queued, or failed) replaces that message, so a re-run sends the
+# newly-built message (e.g., with a corrected recipient address), not
+# the one that was stored by the earlier run.
+#
+# NOTE: If the script dies while a worker is in the middle of sending a
+# message, that message is left in the "sending" state.  We can't know
+# whether the SMTP server accepted it or not, so it is re-queued the
+# next time the queue is opened (i.e., at most one message per worker
+# may be sent twice after a crash).
+#
+# Only one process should drain a given queue file at a time.
+#
+
+import time
+import email
+import email.policy
+import sqlite3
+import hashlib
+import threading
+
+_schema = [
+    ('CREATE TABLE IF NOT EXISTS emails ('
+     'id INTEGER PRIMARY KEY,'
+     'key TEXT NOT NULL UNIQUE,'
+     'to_addr TEXT NOT NULL,'
+     'subject TEXT NOT NULL,'
+     'message BLOB NOT NULL,'
+     "status TEXT NOT NULL DEFAULT 'queued',"
+     'attempts INTEGER NOT NULL DEFAULT 0,'
+     'last_error TEXT,'
+     'not_before REAL NOT NULL DEFAULT 0,'
+     'created REAL NOT NULL,'
+     'updated REAL NOT NULL'
+     ')'),
+    'CREATE INDEX IF NOT EXISTS emails_status ON emails (status, not_before, id)',
+]
+
+#-------------------------------------------------------------------
+
+# Compute a default idempotency key for a message from its recipients,
+# sender, subject, and content.
+def message_key(msg):
+    h = hashlib.sha256()
+    for header in ['To', 'Cc', 'Bcc', 'From', 'Subject']:
+        h.update(f'{header}: {msg.get(header, "")}\n'.encode('utf-8'))
+    for part in msg.walk():
+        if part.is_multipart():
+            continue
+        h.update(part.get_content_type().encode('utf-8'))
+        h.update(part.get_filename('').encode('utf-8'))
+        h.update(part.get_payload(decode=True) or b'')
+
+    return h.hexdigest()
+
+#-------------------------------------------------------------------
+
+class EmailQueue:
+    def __init__(self, filename, log):
+        self.filename = filename
+        self.log      = log
+
+        # SQLite connections can't be shared between threads, so each
+        # thread gets its own.
+        self._local   = threading.local()
+        self._lock    = threading.Lock()
+
+        conn = self._conn()
+        with conn:
+            for sql in _schema:
+                conn.execute(sql)
+
+            # See the note at the top of this file
+            cur = conn.execute("UPDATE emails SET status='queued' "
+                               "WHERE status='sending'")
+            if cur.rowcount > 0:
+                log.warning(f"Re-queued {cur.rowcount} emails that were being sent when the last run was interrupted")
+
+        log.debug(f"Opened email queue: {filename}")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.filename, timeout=60,
+                                   isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+
+        return conn
+
+    #---------------------------------------------------------------
+
+    # Add an email.message.EmailMessage to the queue.  Returns True if
+    # it was added (or replaced an unsent message with the same key),
+    # or False if a message with the same key was already sent.
+    def enqueue(self, msg, key=None):
+        if key is None:
+            key = message_key(msg)
+
+        now  = time.time()
+        conn = self._conn()
+        cur  = conn.execute('INSERT INTO emails '
+                            '(key, to_addr, subject, message, created, updated) '
+                            'VALUES (?, ?, ?, ?, ?, ?) '
+                            'ON CONFLICT (key) DO UPDATE SET '
+                            'to_addr=excluded.to_addr, '
+                            'subject=excluded.subject, '
+                            'message=excluded.message, '
+                            "status='queued', attempts=0, last_error=NULL, "
+                            'not_before=0, updated=excluded.updated '
+                            "WHERE status IN ('queued', 'failed')",
+                            (key, msg.get('To', ''), msg.get('Subject', ''),
+                             msg.as_bytes(), now, now))
+        if cur.rowcount == 0:
+            self.log.debug(f"Email to {msg.get('To')} was already sent; not sending it again")
+            return False
+
+        self.log.debug(f"Queued email to {msg.get('To')}, subject \"{msg.get('Subject')}\"")
+        return True
+
+    def counts(self):
+        rows = self._conn().execute('SELECT status, COUNT(*) FROM emails '
+                                    'GROUP BY status').fetchall()
+        return { status : count for status, count in rows }
+
+    # Returns a dictionary of key -> (status, last error) for every
+    # message in the queue.
+    def statuses(self):
+        rows = self._conn().execute('SELECT key, status, last_error '
+                                    'FROM emails').fetchall()
+        return { key : (status, error) for key, status, error in rows }
+
+    # Give messages that previously failed (i.e., used up all their
+    # attempts) another set of attempts the next time the queue is run.
+    # Returns the number of messages that were re-queued.
+    def retry_failed(self):
+        cur = self._conn().execute("UPDATE emails SET status='queued', "
+                                   "attempts=0, not_before=0, updated=? "
+                                   "WHERE status='failed'", (time.time(),))
+        if cur.rowcount > 0:
+            self.log.info(f"Re-queued {cur.rowcount} emails that previously failed")
+        return cur.rowcount
+
+    #---------------------------------------------------------------
+
+    # Atomically find the next message that is ready to send and mark
+    # it as "sending".  Returns None if there is nothing ready to send
+    # right now, or the sentinel 'wait' if there are messages waiting
+    # to be retried later.
+    def _claim(self):
+        conn = self._conn()
+        now  = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT id, key, to_addr, message, attempts "
+                               "FROM emails "
+                               "WHERE status='queued' AND not_before <= ? "
+                               "ORDER BY id LIMIT 1", (now,)).fetchone()
+            if row is None:
+                waiting = conn.execute("SELECT COUNT(*) FROM emails "
+                                       "WHERE status='queued'").fetchone()[0]
+                conn.execute('COMMIT')
+                return 'wait' if waiting > 0 else None
+
+            conn.execute("UPDATE emails SET status='sending', updated=? "
+                         "WHERE id=?", (now, row[0]))
+            conn.execute('COMMIT')
+        except Exception:
+            # If COMMIT failed, SQLite may have already rolled back
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+
+        return row
+
+    # Call func(), retrying a few times if the database is busy (or
+    # otherwise fails).  "what" describes func for the log messages.
+    def _retry_db(self, func, what, attempts=5, delay=1):
+        for attempt in range(1, attempts + 1):
+            try:
+                return func()
+            except sqlite3.Error as e:
+                if attempt == attempts:
+                    raise
+                self.log.warning(f"Failed to {what} (attempt {attempt} of {attempts}): {e}; trying again")
+                time.sleep(delay)
+
+    def _mark_sent(self, id):
+        self._conn().execute("UPDATE emails SET status='sent', "
+                             "attempts=attempts+1, last_error=NULL, updated=? "
+                             "WHERE id=?", (time.time(), id))
+
+    def _mark_failed(self, id, attempts, error, max_attempts, retry_delay):
+        now      = time.time()
+        attempts = attempts + 1
+        if attempts >= max_attempts:
+            status     = 'failed'
+            not_before = 0
+        else:
+            status     = 'queued'
+            # Exponential backoff
+            not_before = now + retry_delay * (2 ** (attempts - 1))
+
+        self._conn().execute('UPDATE emails SET status=?, attempts=?, '
+                             'last_error=?, not_before=?, updated=? '
+                             'WHERE id=?',
+                             (status, attempts, str(error), not_before,
+                              now, id))
+        return status
+
+    #---------------------------------------------------------------
+
+    # Send all queued messages.
+    #
+    # - session_factory: function that returns a new (unconnected)
+    #   gmail_oauth_smtp.GmailSMTPSession (or anything else with
+    #   send_message() and close() methods).  Each worker makes its own.
+    # - workers: number of concurrent SMTP sessions
+    # - rate: maximum number of messages per second across all workers
+    #   (None = no limit)
+    # - max_attempts: number of times to try each message before
+    #   marking it as failed
+    # - retry_delay: seconds to wait before the first retry of a
+    #   message (doubled for each subsequent retry)
+    #
+    # Returns a dictionary of the number of messages in each status.
+    def run(self, session_factory, workers=4, rate=None,
+            max_attempts=5, retry_delay=30):
+        interval  = 1.0 / rate if rate else 0
+        next_send = [ time.monotonic() ]
+
+        def _throttle():
+            if not interval:
+                return
+            with self._lock:
+                now = time.monotonic()
+                wait = next_send[0] - now
+                next_send[0] = max(now, next_send[0]) + interval
+            if wait > 0:
+                time.sleep(wait)
+
+        def _worker():
+            session = session_factory()
+            try:
+                while True:
+                    try:
+                        row = self._retry_db(self._claim,
+                                             'get the next email from the queue')
+                    except sqlite3.Error as e:
+                        self.log.error(f"Failed to get the next email from the queue ({e}); stopping this worker")
+                        return
+                    if row is None:
+                        return
+                    if row == 'wait':
+                        time.sleep(1)
+                        continue
+
+                    id, key, to_addr, data, attempts = row
+                    msg = email.message_from_bytes(data,
+                                                   policy=email.policy.default)
+                    _throttle()
+                    try:
+                        session.send_message(msg)
+                    except Exception as e:
+                        status = self._mark_failed(id, attempts, e,
+                                                   max_attempts, retry_delay)
+                        self.log.error(f"Failed to send email to {to_addr} (attempt {attempts + 1} of {max_attempts}; now {status}): {e}")
+                        # Start over with a fresh connection
+                        session.close()
+                        continue
+
+                    # The message has been sent: whatever happens now,
+                    # it must not be marked as failed (and sent again).
+                    self.log.info(f'Mail sent to {to_addr}, subject "{msg["Subject"]}"')
+                    try:
+                        self._retry_db(lambda: self._mark_sent(id),
+                                       f'mark the email to {to_addr} as sent')
+                    except sqlite3.Error as e:
+                        self.log.error(f"Email to {to_addr} was sent, but could not be marked as sent in the queue ({e}); stopping this worker.  It will be sent again the next time the queue is run.")
+                        return
+            finally:
+                session.close()
+                self.close()
+
+        threads = [ threading.Thread(target=_worker, name=f'email-worker-{i}')
+                    for i in range(workers) ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        counts = self.counts()
+        self.log.info(f"Email queue {self.filename}: {counts.get('sent', 0)} sent, {counts.get('failed', 0)} failed")
+        return counts
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
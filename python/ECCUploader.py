@@ -3,17 +3,48 @@
 #
 # Upload a file to Google Drive based on provided information
 #
+# upload_file() is the common upload routine for ECC scripts:
+#
+# - It computes the MD5 of the local file and compares it to the
+#   Google Drive file that would be overwritten / duplicated.  If the
+#   content is the same, the upload is skipped.  Files that Google
+#   converts on upload (e.g., XLSX -> Google Sheet) do not have a
+#   Drive md5Checksum, so the local MD5 is also saved in the Drive
+#   file's appProperties and compared against that.
+#
+# - Small files are sent with a single request.  Large files are sent
+#   with chunked resumable uploads.  If a chunk fails, the upload
+#   resumes from the last byte that Google received.  If a state_dir
+#   is given, the resumable session URI is saved there so that an
+#   upload interrupted by the script dying can be resumed by the next
+#   run.
+#
+# Scripts that use PyDrive2 can get a Google Drive v3 service object
+# to pass to upload_file() from pydrive_service().
+#
 
 import os
 import sys
+import json
+import hashlib
 
 import ECC
 import Google
 import GoogleAuth
 
 from apiclient.http import MediaFileUpload
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from google.api_core import retry
 
+# Files at least this big are uploaded in chunks of this size
+chunksize = 8 * 1024 * 1024
+
+# Name of the Drive appProperty used to store the local MD5
+md5_property = 'eccMd5'
+
+_file_fields = 'id,name,mimeType,webViewLink,md5Checksum,appProperties'
+
 ###########################################################
 
 def setup_services(app_json, user_json, log):
@@ -36,6 +67,14 @@ def setup_services(app_json, user_json, log):
 
 ###########################################################
 
+# Make a Google Drive v3 service object from a PyDrive2 GoogleDrive
+# object (PyDrive2 itself uses the Drive v2 API).
+def pydrive_service(drive):
+    return build('drive', 'v3', http=drive.auth.Get_Http_Object(),
+                 cache_discovery=False)
+
+###########################################################
+
 def verify_target_google_folder(service, folder_id, log):
     http = service.files().get(fileId=folder_id,
                                fields='id,mimeType,name,webViewLink,parents',
@@ -51,36 +90,219 @@ def verify_target_google_folder(service, folder_id, log):
 
 ###########################################################
 
+def file_md5(filename):
+    md5 = hashlib.md5()
+    with open(filename, 'rb') as fp:
+        for block in iter(lambda: fp.read(chunksize), b''):
+            md5.update(block)
+
+    return md5.hexdigest()
+
+def _same_content(gfile, md5):
+    if gfile.get('md5Checksum') == md5:
+        return True
+    props = gfile.get('appProperties', {})
+    return props.get(md5_property) == md5
+
+@retry.Retry(predicate=Google.retry_errors)
+def _get_file(service, file_id):
+    return service.files().get(fileId=file_id,
+                               fields=_file_fields,
+                               supportsAllDrives=True).execute()
+
+@retry.Retry(predicate=Google.retry_errors)
+def _find_same_file(service, folder_id, name, md5):
+    escaped = name.replace('\\', '\\\\').replace("'", "\\'")
+    q = f"name = '{escaped}' and '{folder_id}' in parents and trashed = false"
+    response = service.files().list(q=q,
+                                    fields=f'files({_file_fields})',
+                                    corpora='allDrives',
+                                    includeItemsFromAllDrives=True,
+                                    supportsAllDrives=True).execute()
+    for gfile in response.get('files', []):
+        if _same_content(gfile, md5):
+            return gfile
+
+    return None
+
+@retry.Retry(predicate=Google.retry_errors)
+def _execute(request):
+    return request.execute()
+
+@retry.Retry(predicate=Google.retry_errors)
+def _next_chunk(request):
+    # If a chunk fails, the request object remembers that, and the
+    # next call to next_chunk() asks Google how many bytes it actually
+    # received before continuing.
+    return request.next_chunk()
+
+def _state_filename(state_dir, md5, target):
+    key = hashlib.md5(f'{md5}:{target}'.encode('utf-8')).hexdigest()
+    return os.path.join(state_dir, f'upload-{key}.json')
+
+# Ask Google how much of the file it has received in the resumable
+# upload session at uri.  Returns (number of bytes received, None), or
+# (None, Google Drive file) if the upload already completed, or (None,
+# None) if Google no longer knows about the session.
+def _query_session(http, uri, size):
+    headers = { 'Content-Range'  : f'bytes */{size}',
+                'Content-Length' : '0' }
+    resp, content = http.request(uri, method='PUT', headers=headers)
+
+    if resp.status in [200, 201]:
+        return None, json.loads(content)
+    if resp.status in [404, 410]:
+        return None, None
+    if resp.status != 308:
+        raise HttpError(resp, content, uri=uri)
+
+    # The Range header is absent if Google has not received any bytes
+    # yet; otherwise it is "bytes=0-<last byte received>".
+    received = 0
+    if 'range' in resp:
+        received = int(resp['range'].split('-')[-1]) + 1
+
+    return received, None
+
+def _resumable_upload(make_request, filename, state_filename, log):
+    request = make_request()
+
+    # See if there's an upload of this same content to this same
+    # target that was interrupted in a prior run.  If so, point a new
+    # request at that upload session, starting from the last byte that
+    # Google received.  Don't retry this: Google forgets about
+    # resumable sessions after a while.  If the session is gone, start
+    # over.
+    if state_filename and os.path.exists(state_filename):
+        with open(state_filename) as fp:
+            uri = json.load(fp)['uri']
+        received, gfile = _query_session(request.http, uri,
+                                         os.path.getsize(filename))
+        if gfile is not None:
+            log.info(f'Interrupted upload of "{filename}" had already completed')
+            os.unlink(state_filename)
+            return gfile
+        elif received is None:
+            log.warning(f'Could not resume upload of "{filename}"; starting over')
+            os.unlink(state_filename)
+        else:
+            request.resumable_uri = uri
+            request.resumable_progress = received
+            log.info(f'Resuming interrupted upload of "{filename}" at byte {received}')
+
+    response = None
+    while response is None:
+        status, response = _next_chunk(request)
+
+        if (state_filename and request.resumable_uri and
+            not os.path.exists(state_filename)):
+            os.makedirs(os.path.dirname(state_filename) or '.', exist_ok=True)
+            with open(state_filename, 'w') as fp:
+                json.dump({ 'uri' : request.resumable_uri }, fp)
+
+        if status:
+            log.debug(f'Uploaded {int(status.progress() * 100)}% of "{filename}"')
+
+    if state_filename and os.path.exists(state_filename):
+        os.unlink(state_filename)
+
+    return response
+
+# Upload a local file to Google Drive and return the Google Drive file
+# (a dictionary containing id, name, mimeType, webViewLink, ...).
+#
+# - If file_id is given, that Google Drive file is overwritten.
+# - Otherwise, a new file is created in folder_id (unless the folder
+#   already contains a file with this name and the same content).
+#
+# name is the Google Drive file name (default: the basename of the
+# local file).  mimetype is the MIME type of the local file; set
+# google_mimetype to have Google convert the file upon upload (e.g.,
+# to Google Sheet).
+def upload_file(service, filename, mimetype, log,
+                folder_id=None, file_id=None, name=None,
+                google_mimetype=None, state_dir=None):
+    if name is None:
+        name = os.path.basename(filename)
+
+    md5 = file_md5(filename)
+
+    if file_id:
+        gfile = _get_file(service, file_id)
+        if _same_content(gfile, md5):
+            if gfile['name'] == name:
+                log.info(f'Google file "{name}" (ID: {file_id}) is already up to date; not uploading')
+                return gfile
+
+            # Same content, but it needs a new name
+            log.info(f'Google file "{name}" (ID: {file_id}) content is already up to date; renaming')
+            request = service.files().update(fileId=file_id,
+                                             body={ 'name' : name },
+                                             supportsAllDrives=True,
+                                             fields=_file_fields)
+            return _execute(request)
+    else:
+        gfile = _find_same_file(service, folder_id, name, md5)
+        if gfile:
+            log.info(f'Google file "{name}" (ID: {gfile["id"]}) already has this content; not uploading')
+            return gfile
+
+    metadata = {
+        'name'          : name,
+        'appProperties' : { md5_property : md5 },
+    }
+    if google_mimetype:
+        metadata['mimeType'] = google_mimetype
+
+    def _make_request(media):
+        if file_id:
+            return service.files().update(fileId=file_id,
+                                          body=metadata,
+                                          media_body=media,
+                                          supportsAllDrives=True,
+                                          fields=_file_fields)
+        else:
+            return service.files().create(body=dict(metadata,
+                                                    parents=[ folder_id ]),
+                                          media_body=media,
+                                          supportsAllDrives=True,
+                                          fields=_file_fields)
+
+    log.info(f'Uploading file to Google: "{filename}" -> "{name}"')
+    if os.path.getsize(filename) < chunksize:
+        media = MediaFileUpload(filename, mimetype=mimetype,
+                                resumable=False)
+        gfile = _execute(_make_request(media))
+    else:
+        state_filename = None
+        if state_dir:
+            state_filename = _state_filename(state_dir, md5,
+                                             file_id or f'{folder_id}/{name}')
+
+        def _make_resumable_request():
+            media = MediaFileUpload(filename, mimetype=mimetype,
+                                    chunksize=chunksize, resumable=True)
+            return _make_request(media)
+
+        gfile = _resumable_upload(_make_resumable_request, filename,
+                                  state_filename, log)
+
+    log.info(f'Successfully uploaded file: "{name}" (ID: {gfile["id"]})')
+    return gfile
+
+###########################################################
+
 def upload_to_google(service, filename, filetype, folder_id, log):
 
     try:
-        log.info('Uploading file to google "{file}"'
-                 .format(file=filename))
-        metadata = {
-            'name'     : filename,
-            'mimeType' : Google.mime_types[filetype],
-            'parents'  : [ folder_id ],
-            'supportsTeamDrives' : True,
-        }
-        media = MediaFileUpload(filename,
-                                mimetype=Google.mime_types[filetype],
-                                resumable=True)
-        http = service.files().create(body=metadata,
-                                      media_body=media,
-                                      supportsTeamDrives=True,
-                                      fields='id')
-        response = Google.call_api(http, log)
-
-        log.info('Successfully uploaded file: "{filename}" (ID: {id})'
-                 .format(filename=filename, id=response['id']))
+        upload_file(service, filename,
+                    mimetype=Google.mime_types[filetype],
+                    folder_id=folder_id,
+                    name=filename,
+                    log=log)
         return
 
     except Exception as e:
         log.error('Google upload failed for some reason:')
         log.error(e)
         raise e
-
-    log.error("Google upload failed!")
-
-
-###########################################################
\ No newline at end of file
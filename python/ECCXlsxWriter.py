@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+#
+# Fast, streaming XLSX writer for rosters and reports.
+#
+# This is a thin layer over openpyxl's write-only mode: rows are
+# written to disk as they are appended (instead of building the whole
+# workbook in memory and then styling it cell by cell), so writing is
+# linear in the number of rows and uses a flat amount of memory.
+#
+# The catch with write-only mode is that everything about a sheet
+# that isn't a cell value (column widths, freeze panes) must be set
+# before the first row is appended, and rows can only be appended in
+# order.
+#
+# Styles are registered once per workbook as named styles, and then
+# referred to by name.  For example:
+#
+#   styles = {
+#       'title' : {
+#           'font'      : Font(color='FFFF00'),
+#           'fill'      : PatternFill(fgColor='0000FF', fill_type='solid'),
+#           'alignment' : Alignment(horizontal='center'),
+#       },
+#   }
+#   with ECCXlsxWriter.XlsxWriter('out.xlsx', styles) as xlsx:
+#       sheet = xlsx.add_sheet(column_widths=[30, 30, 50],
+#                              freeze_panes='A3')
+#       sheet.append(['Roster title'], style='title', merge_to=3)
+#       sheet.append(['Name', 'Address', 'Email'], style='title')
+#       for member in members:
+#           sheet.append([...])
+#
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.cell_range import CellRange
+
+#-------------------------------------------------------------------
+
+class XlsxSheet:
+    def __init__(self, writer, ws):
+        self.writer = writer
+        self.ws     = ws
+
+        # Number of the last row that was appended (1-based)
+        self.row    = 0
+
+    def _cell(self, value, style):
+        cell = WriteOnlyCell(self.ws, value=value)
+        if style:
+            cell.style = style
+        return cell
+
+    # Append a row of values.
+    #
+    # - style: name of the style to apply to every cell in the row
+    # - styles: per-column style names (a list, or a dictionary
+    #   indexed by 0-based column number); overrides "style"
+    # - merge_to: if not None, merge this row's cells from column A
+    #   through this (1-based) column number.  The row is padded with
+    #   (styled) empty cells out to that column.
+    #
+    # Returns the (1-based) row number of the appended row.
+    def append(self, values, style=None, styles=None, merge_to=None):
+        values = list(values)
+        if merge_to is not None and len(values) < merge_to:
+            values.extend([ None ] * (merge_to - len(values)))
+
+        if style is None and styles is None:
+            row = values
+        else:
+            row = list()
+            for i, value in enumerate(values):
+                s = style
+                if styles is not None:
+                    if isinstance(styles, dict):
+                        s = styles.get(i, style)
+                    elif i < len(styles):
+                        s = styles[i]
+                if s is None:
+                    row.append(value)
+                else:
+                    row.append(self._cell(value, s))
+
+        self.ws.append(row)
+        self.row += 1
+
+        if merge_to is not None and merge_to > 1:
+            self.ws.merged_cells.add(CellRange(min_col=1, min_row=self.row,
+                                               max_col=merge_to,
+                                               max_row=self.row))
+
+        return self.row
+
+class XlsxWriter:
+    def __init__(self, filename, styles=None):
+        self.filename = filename
+        self.wb       = Workbook(write_only=True)
+        self.sheets   = list()
+        self.saved    = False
+
+        if styles:
+            for name, attrs in styles.items():
+                self.wb.add_named_style(NamedStyle(name=name, **attrs))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Don't write out a half-written file if something went wrong
+        if exc_type is None:
+            self.save()
+
+    # Make a new sheet.
+    #
+    # - column_widths: a list of widths (for columns A, B, ...), or a
+    #   dictionary of column letter -> width
+    # - freeze_panes: the top-left cell that is not frozen (e.g., 'A2'
+    #   to freeze the first row)
+    def add_sheet(self, title=None, column_widths=None, freeze_panes=None):
+        ws = self.wb.create_sheet(title=title)
+
+        if column_widths:
+            if isinstance(column_widths, dict):
+                items = column_widths.items()
+            else:
+                items = [ (get_column_letter(i + 1), width)
+                          for i, width in enumerate(column_widths) ]
+            for letter, width in items:
+                if width is not None:
+                    ws.column_dimensions[letter].width = width
+
+        if freeze_panes:
+            ws.freeze_panes = freeze_panes
+
+        sheet = XlsxSheet(self, ws)
+        self.sheets.append(sheet)
+        return sheet
+
+    def save(self):
+        if self.saved:
+            return
+
+        # A workbook must have at least one sheet
+        if not self.sheets:
+            self.add_sheet()
+
+        self.wb.save(self.filename)
+        self.saved = True
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+
+"""Standalone helpers for sending email via Gmail SMTP using OAuth2 (XOAUTH2).
+
+This module is intentionally independent from ECC / ParishSoft code so it can be
+reused by other scripts (ECC.send_email() itself is built on top of it).
+
+Typical Google Workspace usage is via a Service Account with Domain-Wide
+Delegation enabled, impersonating a Workspace user ("subject") and requesting
+`https://mail.google.com/` scope.
+
+For sending more than one message, use `GmailSMTPSession`: it connects and
+authenticates once, sends every message over the same connection, and
+reconnects (with a fresh access token, if needed) when the server drops the
+connection or the token expires.
+"""
+
+from __future__ import annotations
+
+import base64
+import mimetypes
+import os
+import smtplib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.message import EmailMessage
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class GmailServiceAccountAuth:
+    """Parameters to obtain an OAuth2 access token for Gmail SMTP."""
+
+    service_account_keyfile: str
+    impersonate_user: str
+    scopes: Tuple[str, ...] = ("https://mail.google.com/",)
+
+
+def _require_file(path: str) -> None:
+    if not path or not os.path.exists(path):
+        raise FileNotFoundError(f"File does not exist: {path}")
+
+
+def get_credentials_via_service_account(auth: GmailServiceAccountAuth):
+    """Return (not yet refreshed) service account + domain delegation credentials."""
+
+    _require_file(auth.service_account_keyfile)
+
+    from google.oauth2 import service_account
+
+    credentials = service_account.Credentials.from_service_account_file(
+        auth.service_account_keyfile,
+        scopes=list(auth.scopes),
+    )
+
+    if auth.impersonate_user:
+        credentials = credentials.with_subject(auth.impersonate_user)
+
+    return credentials
+
+
+def get_fresh_access_token(credentials) -> str:
+    """Return the access token of `credentials`, refreshing it first if needed."""
+
+    if not credentials.token or not credentials.valid:
+        from google.auth.transport.requests import Request
+
+        credentials.refresh(Request())
+
+    if not credentials.token:
+        raise RuntimeError("Failed to obtain OAuth2 access token")
+
+    return credentials.token
+
+
+def get_access_token_via_service_account(auth: GmailServiceAccountAuth) -> str:
+    """Return an OAuth2 access token using a service account + domain delegation."""
+
+    credentials = get_credentials_via_service_account(auth)
+
+    from google.auth.transport.requests import Request
+
+    request = Request()
+    credentials.refresh(request)
+
+    if not credentials.token:
+        raise RuntimeError("Failed to obtain OAuth2 access token")
+
+    return credentials.token
+
+
+def build_xoauth2_initial_client_response(user_email: str, access_token: str) -> str:
+    """Return base64-encoded XOAUTH2 initial response."""
+
+    if not user_email:
+        raise ValueError("user_email is required")
+    if not access_token:
+        raise ValueError("access_token is required")
+
+    auth_string = f"user={user_email}\x01auth=Bearer {access_token}\x01\x01"
+    return base64.b64encode(auth_string.encode("utf-8")).decode("ascii")
+
+
+def smtp_login_xoauth2(smtp: smtplib.SMTP, user_email: str, access_token: str) -> None:
+    """Authenticate an already-connected SMTP session using XOAUTH2."""
+
+    b64 = build_xoauth2_initial_client_response(user_email, access_token)
+    code, response = smtp.docmd("AUTH", f"XOAUTH2 {b64}")
+
+    # 235 means "Authentication successful".
+    if code != 235:
+        raise RuntimeError(f"XOAUTH2 authentication failed: {code} {response!r}")
+
+
+def _connect_smtp(
+    *,
+    smtp_server: str,
+    smtp_port: int,
+    use_ssl: bool,
+    use_starttls: bool,
+    local_hostname: Optional[str],
+    debuglevel: int,
+    timeout: int,
+) -> smtplib.SMTP:
+    if use_ssl and use_starttls:
+        raise ValueError("use_ssl and use_starttls are mutually exclusive")
+
+    if use_ssl:
+        smtp = smtplib.SMTP_SSL(
+            host=smtp_server,
+            port=smtp_port,
+            local_hostname=local_hostname,
+            timeout=timeout,
+        )
+    else:
+        smtp = smtplib.SMTP(
+            host=smtp_server,
+            port=smtp_port,
+            local_hostname=local_hostname,
+            timeout=timeout,
+        )
+
+    try:
+        if debuglevel:
+            smtp.set_debuglevel(debuglevel)
+
+        smtp.ehlo()
+        if use_starttls:
+            smtp.starttls()
+            smtp.ehlo()
+    except Exception:
+        smtp.close()
+        raise
+
+    return smtp
+
+
+def _close_smtp(smtp: Optional[smtplib.SMTP]) -> None:
+    if smtp is None:
+        return
+
+    try:
+        smtp.quit()
+    except Exception:
+        try:
+            smtp.close()
+        except Exception:
+            pass
+
+
+@contextmanager
+def open_gmail_smtp_connection_oauth2(
+    *,
+    smtp_server: str,
+    smtp_user: str,
+    access_token: str,
+    smtp_port: int = 465,
+    use_ssl: bool = True,
+    use_starttls: bool = False,
+    local_hostname: Optional[str] = None,
+    debuglevel: int = 0,
+    timeout: int = 60,
+    log=None,
+) -> Iterator[smtplib.SMTP]:
+    """Context manager returning an authenticated SMTP object.
+
+    Notes:
+    - For Gmail, common endpoints are:
+      - `smtp.gmail.com:465` (SSL)
+      - `smtp.gmail.com:587` (STARTTLS)
+    - `smtp-relay.gmail.com` may not support XOAUTH2; prefer `smtp.gmail.com`.
+    """
+
+    if log:
+        log.debug(f"Connecting to SMTP server {smtp_server}:{smtp_port}...")
+
+    smtp: Optional[smtplib.SMTP] = None
+    try:
+        smtp = _connect_smtp(
+            smtp_server=smtp_server,
+            smtp_port=smtp_port,
+            use_ssl=use_ssl,
+            use_starttls=use_starttls,
+            local_hostname=local_hostname,
+            debuglevel=debuglevel,
+            timeout=timeout,
+        )
+
+        smtp_login_xoauth2(smtp, smtp_user, access_token)
+
+        yield smtp
+    finally:
+        _close_smtp(smtp)
+
+
+class GmailSMTPSession:
+    """A persistent, XOAUTH2-authenticated SMTP session.
+
+    The connection is opened (and authenticated) lazily on the first
+    `send_message()` call and then reused for every following message, so
+    bulk senders pay for the TLS handshake, EHLO and AUTH only once.
+
+    - Before each message, the credentials are checked; if the access token
+      has expired (or is about to), it is refreshed and the session
+      reconnects with the new token.
+    - If the server drops the connection (e.g., an idle timeout) or rejects
+      the session's authentication before the message's DATA command is
+      sent, the session reconnects and sends the message one more time.
+      Once DATA has been sent, the server may have accepted the message
+      even if we never saw its reply, so the error is raised instead (to
+      avoid sending the message twice).
+    - If `max_messages` is set, the session reconnects after that many
+      messages (some providers limit the number of messages per connection).
+
+    `credentials` is a google-auth credentials object (e.g., from
+    `get_credentials_via_service_account()`) scoped to
+    `https://mail.google.com/`.
+
+    Instances also work as a context manager, and can be passed anywhere an
+    `smtplib.SMTP` object is used just to `send_message()` (e.g.,
+    `send_email_existing_smtp()`).  A session is not thread safe: use one
+    session per thread.
+    """
+
+    # SMTP reply codes that mean "this connection can't be used anymore"
+    # (service not available, authentication required / expired).
+    _reconnect_codes = (421, 454, 530, 535)
+
+    def __init__(
+        self,
+        *,
+        credentials: Any,
+        smtp_user: str,
+        smtp_server: str = "smtp.gmail.com",
+        smtp_port: int = 465,
+        use_ssl: bool = True,
+        use_starttls: bool = False,
+        local_hostname: Optional[str] = None,
+        debuglevel: int = 0,
+        timeout: int = 60,
+        max_messages: Optional[int] = None,
+        log=None,
+    ) -> None:
+        if use_ssl and use_starttls:
+            raise ValueError("use_ssl and use_starttls are mutually exclusive")
+
+        self.credentials = credentials
+        self.smtp_user = smtp_user
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.use_ssl = use_ssl
+        self.use_starttls = use_starttls
+        self.local_hostname = local_hostname
+        self.debuglevel = debuglevel
+        self.timeout = timeout
+        self.max_messages = max_messages
+        self.log = log
+
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._token: Optional[str] = None
+        self._session_messages = 0
+        self._data_sent = False
+
+        # Statistics
+        self.messages_sent = 0
+        self.connections = 0
+
+    def __enter__(self) -> "GmailSMTPSession":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def connect(self) -> None:
+        """(Re)connect and authenticate with a current access token."""
+
+        self.close()
+
+        token = get_fresh_access_token(self.credentials)
+        if self.log:
+            self.log.debug(f"Connecting to SMTP server {self.smtp_server}:{self.smtp_port}...")
+
+        smtp = _connect_smtp(
+            smtp_server=self.smtp_server,
+            smtp_port=self.smtp_port,
+            use_ssl=self.use_ssl,
+            use_starttls=self.use_starttls,
+            local_hostname=self.local_hostname,
+            debuglevel=self.debuglevel,
+            timeout=self.timeout,
+        )
+        try:
+            smtp_login_xoauth2(smtp, self.smtp_user, token)
+        except Exception:
+            _close_smtp(smtp)
+            raise
+
+        # Note when each message's DATA command is sent (see send_message())
+        smtp_data = smtp.data
+
+        def _data(msg):
+            self._data_sent = True
+            return smtp_data(msg)
+
+        smtp.data = _data
+
+        self._smtp = smtp
+        self._token = token
+        self._session_messages = 0
+        self.connections += 1
+
+    def close(self) -> None:
+        """Cleanly close the connection (if it is open)."""
+
+        smtp, self._smtp = self._smtp, None
+        _close_smtp(smtp)
+
+    def _needs_connect(self) -> bool:
+        if self._smtp is None:
+            return True
+        if self.max_messages and self._session_messages >= self.max_messages:
+            return True
+        # google-auth considers a token invalid shortly *before* it actually
+        # expires, so this reconnects before the server starts refusing us.
+        if not self.credentials.valid or self.credentials.token != self._token:
+            return True
+        return False
+
+    def _is_connection_error(self, e: Exception) -> bool:
+        if isinstance(e, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)):
+            return True
+        if isinstance(e, smtplib.SMTPResponseException):
+            return e.smtp_code in self._reconnect_codes
+        return False
+
+    def send_message(self, msg: EmailMessage, from_addr=None, to_addrs=None):
+        """Send `msg` over the session, (re)connecting as needed."""
+
+        if self._needs_connect():
+            self.connect()
+
+        self._data_sent = False
+        try:
+            result = self._smtp.send_message(msg, from_addr, to_addrs)
+        except Exception as e:
+            # Once DATA has been sent, the message may have been delivered;
+            # don't risk sending it twice.
+            if self._data_sent or not self._is_connection_error(e):
+                raise
+
+            if self.log:
+                self.log.info(f"SMTP connection problem ({e}); reconnecting")
+            self.connect()
+            result = self._smtp.send_message(msg, from_addr, to_addrs)
+
+        self._session_messages += 1
+        self.messages_sent += 1
+        return result
+
+
+def build_email_message(
+    *,
+    message_body: str,
+    content_type: str,
+    smtp_to: str,
+    smtp_subject: str,
+    smtp_from: str,
+    attachments: Optional[Dict[int, Dict[str, str]]] = None,
+    log=None,
+) -> EmailMessage:
+    """Build an EmailMessage with optional attachments.
+
+    `attachments` matches the existing ECC convention:
+
+        {
+          1: {"filename": "/path/to/file.pdf", "type": "pdf"},
+          2: {"filename": "/path/to/other.png", "type": "png"},
+        }
+
+    Only `filename` is required; `type` is used as a hint.
+    """
+
+    msg = EmailMessage()
+    msg["Subject"] = smtp_subject
+    msg["From"] = smtp_from
+    msg["To"] = smtp_to
+
+    subtype = "plain"
+    if content_type and "/" in content_type:
+        subtype = content_type.split("/", 1)[1]
+
+    msg.set_content(message_body, subtype=subtype)
+
+    if attachments:
+        for attachment_id in sorted(attachments.keys()):
+            attachment = attachments[attachment_id]
+            filename = attachment.get("filename")
+            if not filename:
+                raise ValueError(f"Attachment {attachment_id} is missing filename")
+
+            ctype_hint = attachment.get("type")
+            guessed, encoding = mimetypes.guess_type(filename)
+
+            mime_type = guessed
+            if not mime_type and ctype_hint:
+                # Minimal hint mapping; expand if/when needed.
+                if ctype_hint.lower() == "pdf":
+                    mime_type = "application/pdf"
+
+            if not mime_type:
+                mime_type = "application/octet-stream"
+
+            maintype, sub = mime_type.split("/", 1)
+
+            if log:
+                log.debug(f"Attachment is: {filename} ({mime_type})")
+
+            with open(filename, "rb") as fp:
+                msg.add_attachment(
+                    fp.read(),
+                    maintype=maintype,
+                    subtype=sub,
+                    filename=os.path.basename(filename),
+                )
+
+    return msg
+
+
+def send_email_existing_smtp(
+    message_body: str,
+    content_type: str,
+    smtp_to: str,
+    smtp_subject: str,
+    smtp_from: str,
+    smtp: smtplib.SMTP,
+    log,
+    attachments: Optional[Dict[int, Dict[str, str]]] = None,
+) -> None:
+    """Send an email using an existing authenticated SMTP connection."""
+
+    msg = build_email_message(
+        message_body=message_body,
+        content_type=content_type,
+        smtp_to=smtp_to,
+        smtp_subject=smtp_subject,
+        smtp_from=smtp_from,
+        attachments=attachments,
+        log=log,
+    )
+
+    smtp.send_message(msg)
+    if log:
+        log.debug(f"Mail sent to {smtp_to}, subject {smtp_subject!r}")
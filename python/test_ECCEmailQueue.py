@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+#
+# Tests for ECCEmailQueue.  Run with:
+#
+#   python3 -m unittest test_ECCEmailQueue
+#
+# from this directory.
+#
+
+import os
+import logging
+import tempfile
+import unittest
+
+from email.message import EmailMessage
+
+import ECCEmailQueue
+
+log = logging.getLogger('test_ECCEmailQueue')
+
+def _message(to_addr, pdf):
+    msg = EmailMessage()
+    msg['Subject'] = 'Your contribution letter'
+    msg['From']    = 'office@example.com'
+    msg['To']      = to_addr
+    msg.set_content('See attached.')
+    msg.add_attachment(pdf, maintype='application', subtype='pdf',
+                       filename='letter.pdf')
+    return msg
+
+# A stand-in for gmail_oauth_smtp.GmailSMTPSession that records what
+# it sends (or fails every message).
+class _Session:
+    def __init__(self, sent, fail=False):
+        self.sent = sent
+        self.fail = fail
+
+    def send_message(self, msg):
+        if self.fail:
+            raise ConnectionError('SMTP server is down')
+        self.sent.append((msg['To'],
+                          msg.get_payload()[1].get_payload(decode=True)))
+
+    def close(self):
+        pass
+
+class TestRerun(unittest.TestCase):
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        self.sent = list()
+
+    def tearDown(self):
+        for suffix in ['', '-wal', '-shm']:
+            if os.path.exists(self.filename + suffix):
+                os.unlink(self.filename + suffix)
+
+    def _run(self, queue, fail=False):
+        return queue.run(lambda: _Session(self.sent, fail),
+                         workers=1, max_attempts=1)
+
+    def test_rerun_after_failure_sends_new_message(self):
+        queue = ECCEmailQueue.EmailQueue(self.filename, log)
+        queue.enqueue(_message('old@example.com', b'old pdf'), key='2025-1')
+        self._run(queue, fail=True)
+        self.assertEqual(queue.statuses()['2025-1'][0], 'failed')
+
+        # The re-run has a corrected address and a regenerated PDF
+        queue = ECCEmailQueue.EmailQueue(self.filename, log)
+        self.assertTrue(queue.enqueue(_message('new@example.com', b'new pdf'),
+                                      key='2025-1'))
+        queue.retry_failed()
+        self._run(queue)
+
+        self.assertEqual(self.sent, [('new@example.com', b'new pdf')])
+        self.assertEqual(queue.statuses()['2025-1'], ('sent', None))
+
+    def test_rerun_before_sending_sends_new_message(self):
+        queue = ECCEmailQueue.EmailQueue(self.filename, log)
+        queue.enqueue(_message('old@example.com', b'old pdf'), key='2025-1')
+
+        # Interrupted before the queue was run
+        queue = ECCEmailQueue.EmailQueue(self.filename, log)
+        queue.enqueue(_message('new@example.com', b'new pdf'), key='2025-1')
+        self._run(queue)
+
+        self.assertEqual(self.sent, [('new@example.com', b'new pdf')])
+
+    def test_rerun_after_sending_sends_nothing(self):
+        queue = ECCEmailQueue.EmailQueue(self.filename, log)
+        queue.enqueue(_message('old@example.com', b'old pdf'), key='2025-1')
+        self._run(queue)
+
+        queue = ECCEmailQueue.EmailQueue(self.filename, log)
+        self.assertFalse(queue.enqueue(_message('new@example.com', b'new pdf'),
+                                       key='2025-1'))
+        self._run(queue)
+
+        self.assertEqual(self.sent, [('old@example.com', b'old pdf')])
+
+if __name__ == '__main__':
+    unittest.main()